@@ -0,0 +1,658 @@
+"""
+Atlas packing for the gen_*.py scripts.
+Sprites are placed with a MaxRects bin packer on a grid of cell_size cells, so every
+sprite stays aligned to the TileSet grid the Godot side divides coordinates by.
+The smallest atlas that fits is chosen among power-of-two or arbitrary sizes up to a limit,
+keeping the corner the watermark is drawn into free. Sprites that don't fit spill into
+further atlas pages of at most that size.
+When the previous build's layout is available, sprites that survive keep their position and
+only new sprites are placed, so small content changes only touch small parts of the atlas.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from PIL import Image
+from watermark import draw_watermark, watermark_extent
+from profiling import profile_stage
+from outputs import save_atlas_pages, write_json
+from sprite_index import write_sprite_index
+
+HEURISTICS = ("best-short-side", "best-long-side", "best-area", "bottom-left", "contact-point")
+DEFAULT_HEURISTIC = "best-short-side"
+DEFAULT_MAX_ATLAS_SIZE = 2048
+NPOT_STEP = 16  # Non-power-of-two sizes are multiples of this when the cell size is smaller
+TRIM_CELL_SIZE = (1, 1)  # Trimmed sprites have arbitrary sizes, so they are packed per pixel
+# Repack from scratch when keeping the previous layout needs this much more atlas area than a fresh pack
+DEFAULT_MAX_FRAGMENTATION = 0.25
+
+class MaxRectsBin:
+    """
+    A bin that places rectangles into its remaining free space.
+    Keeps the maximal free rectangles and picks one per insert with the chosen heuristic.
+    """
+
+    def __init__(self, width, height, heuristic=DEFAULT_HEURISTIC):
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"Unknown packing heuristic: {heuristic}")
+        self.width = width
+        self.height = height
+        self.heuristic = heuristic
+        self.free_rects = [(0, 0, width, height)]
+        self.used_rects = []
+        # One byte per unit of area, set where a rectangle has been placed
+        self.occupied = bytearray(width * height)
+
+    def _contact(self, x, y, w, h):
+        """Length of the rectangle's edges touching the bin border or occupied space."""
+        occupied = self.occupied
+        stride = self.width
+        contact = 0
+        # Left and right columns, then the rows above and below
+        contact += h if x == 0 else sum(occupied[y * stride + x - 1:(y + h) * stride:stride])
+        contact += h if x + w == self.width else sum(occupied[y * stride + x + w:(y + h) * stride:stride])
+        contact += w if y == 0 else sum(occupied[(y - 1) * stride + x:(y - 1) * stride + x + w])
+        contact += w if y + h == self.height else sum(occupied[(y + h) * stride + x:(y + h) * stride + x + w])
+        return contact
+
+    def _score(self, free_rect, w, h):
+        """Score placing a w x h rectangle in the top left of a free rectangle (lower is better)."""
+        x, y, free_w, free_h = free_rect
+        short_side, long_side = sorted((free_w - w, free_h - h))
+        if self.heuristic == "best-short-side":
+            return (short_side, long_side)
+        if self.heuristic == "best-long-side":
+            return (long_side, short_side)
+        if self.heuristic == "best-area":
+            return (free_w * free_h - w * h, short_side)
+        if self.heuristic == "bottom-left":
+            return (y + h, x)
+        return (-self._contact(x, y, w, h), y + h)
+
+    def find_position(self, w, h):
+        """Return the (x, y) the heuristic picks for a w x h rectangle, or None if it doesn't fit."""
+        best = None
+        best_score = None
+        for free_rect in self.free_rects:
+            x, y, free_w, free_h = free_rect
+            if w > free_w or h > free_h:
+                continue
+            # Break ties by position so packing never depends on list order
+            score = self._score(free_rect, w, h) + (y, x)
+            if best_score is None or score < best_score:
+                best = (x, y)
+                best_score = score
+        return best
+
+    def is_free(self, x, y, w, h):
+        """Whether a w x h rectangle at (x, y) lies inside the bin without touching placed rectangles."""
+        if x < 0 or y < 0 or x + w > self.width or y + h > self.height:
+            return False
+        stride = self.width
+        return not any(any(self.occupied[row * stride + x:row * stride + x + w]) for row in range(y, y + h))
+
+    def occupy(self, rect):
+        """Mark a rectangle as used, splitting every free rectangle that overlaps it."""
+        x, y, w, h = rect
+        split_rects = []
+        for free_rect in self.free_rects:
+            fx, fy, fw, fh = free_rect
+            if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+                split_rects.append(free_rect)
+                continue
+            if x > fx:
+                split_rects.append((fx, fy, x - fx, fh))
+            if x + w < fx + fw:
+                split_rects.append((x + w, fy, fx + fw - x - w, fh))
+            if y > fy:
+                split_rects.append((fx, fy, fw, y - fy))
+            if y + h < fy + fh:
+                split_rects.append((fx, y + h, fw, fy + fh - y - h))
+
+        # Drop free rectangles that lie entirely inside another one
+        self.free_rects = []
+        for i, (ax, ay, aw, ah) in enumerate(split_rects):
+            contained = False
+            for j, (bx, by, bw, bh) in enumerate(split_rects):
+                if i == j:
+                    continue
+                if bx <= ax and by <= ay and ax + aw <= bx + bw and ay + ah <= by + bh:
+                    # Keep the first of two identical rectangles
+                    if (ax, ay, aw, ah) != (bx, by, bw, bh) or j < i:
+                        contained = True
+                        break
+            if not contained:
+                self.free_rects.append((ax, ay, aw, ah))
+        self.used_rects.append(rect)
+        for row in range(y, y + h):
+            self.occupied[row * self.width + x:row * self.width + x + w] = b'\x01' * w
+
+    def insert(self, w, h):
+        """Place a w x h rectangle. Returns its (x, y), or None if the bin is full."""
+        position = self.find_position(w, h)
+        if position is None:
+            return None
+        self.occupy((position[0], position[1], w, h))
+        return position
+
+def candidate_sizes(min_width, min_height, min_area, cell_size, power_of_two, max_size):
+    """List atlas sizes that could hold the sprites, shortest longest side first, then smallest area."""
+    cell_w, cell_h = cell_size
+    if power_of_two:
+        widths = [1 << i for i in range(max_size.bit_length()) if cell_w <= 1 << i <= max_size]
+        heights = [1 << i for i in range(max_size.bit_length()) if cell_h <= 1 << i <= max_size]
+    else:
+        step_w = cell_w * max(1, NPOT_STEP // cell_w)
+        step_h = cell_h * max(1, NPOT_STEP // cell_h)
+        widths = list(range(step_w, max_size + 1, step_w))
+        heights = list(range(step_h, max_size + 1, step_h))
+
+    sizes = [(w, h) for w in widths for h in heights
+             if w >= min_width and h >= min_height and w * h >= min_area]
+    sizes.sort(key=lambda size: (max(size), size[0] * size[1], size[1]))
+    return sizes
+
+def reserved_corner(width, height, cell_size, corner_size):
+    """Cells covered by a corner_size area in the lower right of a width x height atlas, in cells."""
+    cell_w, cell_h = cell_size
+    cols = width // cell_w
+    rows = height // cell_h
+    col = max(0, (width - corner_size[0]) // cell_w)
+    row = max(0, (height - corner_size[1]) // cell_h)
+    if col >= cols or row >= rows:
+        return None
+    return (col, row, cols - col, rows - row)
+
+def page_bin(width, height, cell_size, heuristic, corner_size=None):
+    """An empty bin for a width x height atlas page, in cells, with the watermark corner occupied."""
+    atlas_bin = MaxRectsBin(width // cell_size[0], height // cell_size[1], heuristic)
+    if corner_size is not None:
+        reserved = reserved_corner(width, height, cell_size, corner_size)
+        if reserved is not None:
+            atlas_bin.occupy(reserved)
+    return atlas_bin
+
+def sprite_cells(sizes, cell_size):
+    """Sprite sizes rounded up to whole cells."""
+    cell_w, cell_h = cell_size
+    return [(-(-w // cell_w), -(-h // cell_h)) for w, h in sizes]
+
+def placement_order(indices, cells):
+    """Indices sorted big sprites first; ties keep the index order."""
+    return sorted(indices, key=lambda i: (-max(cells[i]), -cells[i][0] * cells[i][1], i))
+
+def smallest_page_size(rects, cell_size, power_of_two, max_size, corner_size=None):
+    """
+    The smallest allowed page size that holds rects, given as (col, row, cols, rows) cells,
+    without the watermark corner overlapping any of them. Returns None if no size does.
+    """
+    cell_w, cell_h = cell_size
+    min_width = max((col + cols for col, _, cols, _ in rects), default=1) * cell_w
+    min_height = max((row + rows for _, row, _, rows in rects), default=1) * cell_h
+    sizes = candidate_sizes(min_width, min_height, 0, cell_size, power_of_two, max_size)
+    for width, height in sorted(sizes, key=lambda size: (size[0] * size[1], max(size), size[1])):
+        reserved = reserved_corner(width, height, cell_size, corner_size) if corner_size is not None else None
+        if reserved is None:
+            return width, height
+        rx, ry, rw, rh = reserved
+        if not any(col < rx + rw and rx < col + cols and row < ry + rh and ry < row + rows
+                   for col, row, cols, rows in rects):
+            return width, height
+    return None
+
+def pack_into(sizes, width, height, cell_size, heuristic, corner_size=None, skip_misfits=False):
+    """
+    Try to pack sprite sizes into one width x height atlas.
+    Returns a list of (x, y) pixel positions in the order of sizes, or None if they don't fit.
+    With skip_misfits, sprites that don't fit get None instead and the rest are still placed.
+    """
+    cell_w, cell_h = cell_size
+    atlas_bin = page_bin(width, height, cell_size, heuristic, corner_size)
+
+    # Place big sprites first; ties keep the input order so results are stable
+    cells = sprite_cells(sizes, cell_size)
+    order = placement_order(range(len(cells)), cells)
+
+    positions = [None] * len(sizes)
+    for i in order:
+        position = atlas_bin.insert(*cells[i])
+        if position is None:
+            if skip_misfits:
+                continue
+            return None
+        positions[i] = (position[0] * cell_w, position[1] * cell_h)
+    return positions
+
+def pack_sprites(sizes, cell_size, heuristic=DEFAULT_HEURISTIC, power_of_two=True,
+                 max_size=DEFAULT_MAX_ATLAS_SIZE, corner_size=None):
+    """
+    Find the smallest atlas that holds sprites of the given (width, height) sizes.
+    Sprites are placed on a grid of cell_size cells. corner_size keeps an area in the
+    lower right corner free, as far as it overlaps the atlas.
+    Returns (width, height, positions) with positions in the order of sizes.
+    Raises ValueError if the sprites don't fit within max_size x max_size.
+    """
+    cell_w, cell_h = cell_size
+    min_width = max((w for w, _ in sizes), default=cell_w)
+    min_height = max((h for _, h in sizes), default=cell_h)
+    min_area = sum((-(-w // cell_w) * cell_w) * (-(-h // cell_h) * cell_h) for w, h in sizes)
+
+    for width, height in candidate_sizes(min_width, min_height, min_area, cell_size, power_of_two, max_size):
+        positions = pack_into(sizes, width, height, cell_size, heuristic, corner_size)
+        if positions is not None:
+            return width, height, positions
+
+    raise ValueError(f"{len(sizes)} sprites don't fit in a {max_size}x{max_size} atlas")
+
+def pack_pages(sizes, cell_size, heuristic=DEFAULT_HEURISTIC, power_of_two=True,
+               max_size=DEFAULT_MAX_ATLAS_SIZE, corner_size=None):
+    """
+    Pack sprite sizes into as few atlas pages of at most max_size x max_size as possible.
+    Every page but the last is filled at the largest allowed size; the last page gets the
+    smallest size that holds the remaining sprites, so sprites that fit one atlas get exactly
+    the layout pack_sprites picks. Every page keeps the watermark corner free.
+    Returns a list of (width, height, placements) where placements maps indices into sizes
+    to (x, y) positions on that page.
+    Raises ValueError if a sprite is larger than a page.
+    """
+    cell_w, cell_h = cell_size
+    page_sizes = candidate_sizes(cell_w, cell_h, 0, cell_size, power_of_two, max_size)
+    if not page_sizes:
+        raise ValueError(f"A {max_size}x{max_size} atlas page can't hold a single {cell_w}x{cell_h} cell")
+    page_width, page_height = max(page_sizes, key=lambda size: (size[0] * size[1], size))
+    for w, h in sizes:
+        if w > page_width or h > page_height:
+            raise ValueError(f"A {w}x{h} sprite doesn't fit in a {max_size}x{max_size} atlas page")
+
+    pages = []
+    remaining = list(range(len(sizes)))
+    while True:
+        remaining_sizes = [sizes[i] for i in remaining]
+        try:
+            width, height, positions = pack_sprites(
+                remaining_sizes, cell_size, heuristic, power_of_two, max_size, corner_size)
+        except ValueError:
+            pass
+        else:
+            pages.append((width, height, dict(zip(remaining, positions))))
+            return pages
+
+        # Fill a full-size page and carry whatever didn't fit over to the next one
+        positions = pack_into(remaining_sizes, page_width, page_height, cell_size, heuristic,
+                              corner_size, skip_misfits=True)
+        placements = {i: position for i, position in zip(remaining, positions) if position is not None}
+        if not placements:
+            raise ValueError(f"{len(remaining)} sprites don't fit next to the watermark "
+                             f"in a {max_size}x{max_size} atlas page")
+        pages.append((page_width, page_height, placements))
+        remaining = [i for i in remaining if i not in placements]
+
+def pack_pages_stable(sizes, previous_positions, previous_page_sizes, cell_size, heuristic=DEFAULT_HEURISTIC,
+                      power_of_two=True, max_size=DEFAULT_MAX_ATLAS_SIZE, corner_size=None):
+    """
+    Pack sprite sizes around a previous layout, in the format pack_pages returns.
+    previous_positions holds (page, x, y) or None for every sprite, and previous_page_sizes
+    the (width, height) of every previous page. Sprites that still fit where they were keep
+    their position. Trailing pages left empty are dropped and the last page shrinks to the
+    smallest size that holds its kept sprites. The other sprites then fill the free space of
+    the existing pages, the last page grows, and whatever is left goes onto new pages.
+    Returns (pages, kept) with kept the number of sprites left in place, or None when the
+    previous pages aren't valid sizes for the current settings.
+    """
+    cell_w, cell_h = cell_size
+    allowed_sizes = candidate_sizes(cell_w, cell_h, 0, cell_size, power_of_two, max_size)
+    if not previous_page_sizes or any(size not in allowed_sizes for size in previous_page_sizes):
+        return None
+
+    cells = sprite_cells(sizes, cell_size)
+    page_sizes = list(previous_page_sizes)
+    bins = [page_bin(width, height, cell_size, heuristic, corner_size) for width, height in page_sizes]
+    placements = [{} for _ in page_sizes]
+    moved = []
+    for i, previous in enumerate(previous_positions):
+        if previous is not None:
+            page, x, y = previous
+            col, row = x // cell_w, y // cell_h
+            if (page < len(bins) and not x % cell_w and not y % cell_h
+                    and bins[page].is_free(col, row, *cells[i])):
+                bins[page].occupy((col, row) + cells[i])
+                placements[page][i] = (x, y)
+                continue
+        moved.append(i)
+    kept = len(sizes) - len(moved)
+
+    # Removed sprites may leave the last pages empty, or let the last page shrink
+    while page_sizes and not placements[-1]:
+        page_sizes.pop()
+        bins.pop()
+        placements.pop()
+    if page_sizes:
+        last_rects = [(x // cell_w, y // cell_h) + cells[i] for i, (x, y) in placements[-1].items()]
+        shrunk = smallest_page_size(last_rects, cell_size, power_of_two, max_size, corner_size)
+        if shrunk is not None and shrunk != page_sizes[-1]:
+            page_sizes[-1] = shrunk
+            bins[-1] = page_bin(*shrunk, cell_size, heuristic, corner_size)
+            for rect in last_rects:
+                bins[-1].occupy(rect)
+
+    # New and moved sprites fill the holes in the existing pages first
+    remaining = []
+    for i in placement_order(moved, cells):
+        for page, atlas_bin in enumerate(bins):
+            position = atlas_bin.insert(*cells[i])
+            if position is not None:
+                placements[page][i] = (position[0] * cell_w, position[1] * cell_h)
+                break
+        else:
+            remaining.append(i)
+
+    if remaining and page_sizes:
+        # Grow the last page; positions are measured from the top left, so its sprites stay put
+        last = len(page_sizes) - 1
+        last_width, last_height = page_sizes[last]
+        for width, height in candidate_sizes(last_width, last_height, 0, cell_size, power_of_two, max_size):
+            if (width, height) == (last_width, last_height):
+                continue
+            grown = page_bin(width, height, cell_size, heuristic, corner_size)
+            if not all(grown.is_free(x // cell_w, y // cell_h, *cells[i]) for i, (x, y) in placements[last].items()):
+                continue  # The watermark corner moved onto a sprite
+            for i, (x, y) in placements[last].items():
+                grown.occupy((x // cell_w, y // cell_h) + cells[i])
+            grown_placements = {}
+            for i in remaining:
+                position = grown.insert(*cells[i])
+                if position is not None:
+                    grown_placements[i] = (position[0] * cell_w, position[1] * cell_h)
+            # The largest size is kept even when it can't take everything
+            if len(grown_placements) == len(remaining) or (width, height) == allowed_sizes[-1]:
+                page_sizes[last] = (width, height)
+                placements[last].update(grown_placements)
+                remaining = [i for i in remaining if i not in grown_placements]
+                break
+
+    pages = [(width, height, page_placements) for (width, height), page_placements in zip(page_sizes, placements)]
+    if remaining:
+        new_pages = pack_pages([sizes[i] for i in remaining], cell_size, heuristic, power_of_two, max_size, corner_size)
+        for width, height, page_placements in new_pages:
+            pages.append((width, height, {remaining[j]: position for j, position in page_placements.items()}))
+    return pages, kept
+
+def pages_area(pages):
+    """Total area of packed pages."""
+    return sum(width * height for width, height, _ in pages)
+
+def fill_ratio(sizes, width, height):
+    """Fraction of the atlas area covered by sprites."""
+    return sum(w * h for w, h in sizes) / (width * height)
+
+def trim_to_opaque(image):
+    """
+    Crop a sprite to the bounding box of its non-transparent pixels.
+    Returns (trimmed_image, [offset_x, offset_y, width, height]) within the original sprite.
+    """
+    bbox = image.getchannel('A').getbbox()
+    if bbox is None:
+        bbox = (0, 0, image.width, image.height)
+    left, top, right, bottom = bbox
+    return image.crop(bbox), [left, top, right - left, bottom - top]
+
+def trim_sprites(sprites, trim_sprite=trim_to_opaque):
+    """
+    Trim (name, image) sprites before packing them on TRIM_CELL_SIZE.
+    Returns (trimmed_sprites, trims) where trims maps each name to the trim rect
+    trim_sprite reported, for the JSON so the game can rebuild the untrimmed rect.
+    """
+    trimmed_sprites = []
+    trims = {}
+    untrimmed_area = 0
+    trimmed_area = 0
+    for sprite_name, sprite_image in sprites:
+        trimmed_image, trims[sprite_name] = trim_sprite(sprite_image)
+        trimmed_sprites.append((sprite_name, trimmed_image))
+        untrimmed_area += sprite_image.width * sprite_image.height
+        trimmed_area += trimmed_image.width * trimmed_image.height
+
+    if untrimmed_area:
+        print(f"Trimmed sprites to {trimmed_area / untrimmed_area:.1%} of their area")
+    return trimmed_sprites, trims
+
+def trim_sprite_loaders(sprites, trim_sprite=trim_to_opaque):
+    """
+    Streaming counterpart of trim_sprites for (name, load) sprites, see compose_atlas_streamed.
+    Returns (trimmed_sprites, trims); trims is filled in as the sprites are loaded.
+    """
+    trims = {}
+
+    def trimmed_loader(sprite_name, load):
+        def load_trimmed():
+            trimmed_image, trims[sprite_name] = trim_sprite(load())
+            return trimmed_image
+        return load_trimmed
+
+    return [(sprite_name, trimmed_loader(sprite_name, load)) for sprite_name, load in sprites], trims
+
+def sprite_fingerprint(image):
+    """Key identifying an image's pixels, without keeping a copy of them around."""
+    return (image.mode, image.size, hashlib.sha256(image.tobytes()).digest())
+
+def dedupe_sprites(sprites):
+    """
+    Group (name, image) sprites by pixel content.
+    Returns (unique, slots): unique holds the first sprite of every distinct image, and
+    slots maps each sprite name to the index of its image in unique.
+    """
+    unique = []
+    slots = {}
+    slot_by_content = {}
+    for sprite_name, sprite_image in sprites:
+        content = sprite_fingerprint(sprite_image)
+        if content not in slot_by_content:
+            slot_by_content[content] = len(unique)
+            unique.append((sprite_name, sprite_image))
+        slots[sprite_name] = slot_by_content[content]
+    return unique, slots
+
+def render_atlas(images, positions, size, watermark, antialias_watermark=True):
+    """
+    Paste images at their (x, y) positions onto a transparent atlas of the given size and watermark it.
+    images may be a generator, so each image can be released as soon as it is pasted.
+    """
+    atlas = Image.new('RGBA', size, (0, 0, 0, 0))
+    for image, position in zip(images, positions):
+        atlas.paste(image, position)
+
+    # Add watermark
+    draw_watermark(atlas, watermark, antialias=antialias_watermark)
+    return atlas
+
+def read_layout(json_path, atlas_path):
+    """
+    Read the layout a previous build wrote: its coordinate JSON and the sizes of its atlas pages.
+    Returns {"sprites": {name: [x, y]}, "page": {name: page}, "page_sizes": [(width, height)]},
+    or None when the files are missing or unreadable.
+    """
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        page_paths = [Path(atlas_path).with_name(name) for name in data.get("pages", [])] or [Path(atlas_path)]
+        page_sizes = []
+        for page_path in page_paths:
+            # Only the PNG header is read
+            with Image.open(page_path) as page_image:
+                page_sizes.append(page_image.size)
+        return {"sprites": data["sprites"], "page": data.get("page", {}), "page_sizes": page_sizes}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def compose_atlas(sprites, cell_size, watermark, heuristic=DEFAULT_HEURISTIC, power_of_two=True,
+                  max_size=DEFAULT_MAX_ATLAS_SIZE, max_fragmentation=DEFAULT_MAX_FRAGMENTATION,
+                  antialias_watermark=True, previous_layout=None):
+    """
+    Pack (name, image) sprites into watermarked atlas pages of at most max_size x max_size.
+    Pixel-identical sprites are stored once and share their coordinates.
+    antialias_watermark=False draws the watermark in plain black and white for palette output.
+    With a previous_layout from read_layout, surviving sprites keep their positions unless that
+    layout needs more than max_fragmentation more area than packing from scratch.
+    Returns (pages, coordinates, sprite_pages): the page images, each name's [x, y] position
+    on its page, and each name's page index.
+    """
+    with profile_stage("dedupe"):
+        unique, slots = dedupe_sprites(sprites)
+    sizes = [sprite_image.size for _, sprite_image in unique]
+    return _compose_pages([sprite_name for sprite_name, _ in sprites], slots, sizes,
+                          lambda slot: unique[slot][1], cell_size, watermark, heuristic,
+                          power_of_two, max_size, max_fragmentation, antialias_watermark, previous_layout)
+
+def compose_atlas_streamed(sprites, cell_size, watermark, heuristic=DEFAULT_HEURISTIC, power_of_two=True,
+                           max_size=DEFAULT_MAX_ATLAS_SIZE, max_fragmentation=DEFAULT_MAX_FRAGMENTATION,
+                           antialias_watermark=True, previous_layout=None):
+    """
+    compose_atlas for (name, load) sprites, where load() creates the sprite image.
+    Every sprite is loaded once to measure and fingerprint it, the layout is packed from
+    those sizes alone, and each unique sprite is loaded again only to be pasted into its page.
+    Only one sprite image is alive at a time, so memory stays bounded by the atlas pages
+    instead of growing with the number of sprites. The result is identical to compose_atlas.
+    """
+    unique_loaders = []
+    sizes = []
+    slots = {}
+    slot_by_content = {}
+    with profile_stage("dedupe"):
+        for sprite_name, load in sprites:
+            sprite_image = load()
+            content = sprite_fingerprint(sprite_image)
+            if content not in slot_by_content:
+                slot_by_content[content] = len(unique_loaders)
+                unique_loaders.append(load)
+                sizes.append(sprite_image.size)
+            slots[sprite_name] = slot_by_content[content]
+            del sprite_image
+    return _compose_pages([sprite_name for sprite_name, _ in sprites], slots, sizes,
+                          lambda slot: unique_loaders[slot](), cell_size, watermark, heuristic,
+                          power_of_two, max_size, max_fragmentation, antialias_watermark, previous_layout)
+
+def _previous_positions(sprite_names, slots, slot_count, previous_layout):
+    """(page, x, y) of every slot in the previous layout, from the first of its names found there."""
+    positions = [None] * slot_count
+    for sprite_name in sprite_names:
+        slot = slots[sprite_name]
+        if positions[slot] is None and sprite_name in previous_layout["sprites"]:
+            x, y = previous_layout["sprites"][sprite_name]
+            positions[slot] = (previous_layout["page"].get(sprite_name, 0), x, y)
+    return positions
+
+def _pack_stable(sprite_names, slots, sizes, cell_size, heuristic, power_of_two, max_size, max_fragmentation,
+                 corner_size, previous_layout):
+    """Pack around the previous layout, falling back to a fresh pack when that wastes too much space."""
+    packed_pages = pack_pages(sizes, cell_size, heuristic, power_of_two, max_size, corner_size)
+    if previous_layout is None:
+        return packed_pages
+
+    previous_positions = _previous_positions(sprite_names, slots, len(sizes), previous_layout)
+    stable = pack_pages_stable(sizes, previous_positions, previous_layout["page_sizes"], cell_size,
+                               heuristic, power_of_two, max_size, corner_size)
+    if stable is None:
+        print("Repacking the atlas: the previous layout doesn't match the packing settings")
+        return packed_pages
+
+    stable_pages, kept = stable
+    if len(stable_pages) > len(packed_pages):
+        print(f"Repacking the atlas: keeping the previous layout would take {len(stable_pages)} pages "
+              f"instead of {len(packed_pages)}")
+        return packed_pages
+    fragmentation = pages_area(stable_pages) / pages_area(packed_pages) - 1
+    if fragmentation > max_fragmentation:
+        print(f"Repacking the atlas: keeping the previous layout would take {fragmentation:.0%} more area "
+              f"than packing from scratch (limit {max_fragmentation:.0%})")
+        return packed_pages
+    print(f"Kept {kept} of {len(sizes)} sprites in place and placed {len(sizes) - kept} anew "
+          f"(atlas area {fragmentation:+.0%} compared to packing from scratch)")
+    return stable_pages
+
+def _compose_pages(sprite_names, slots, sizes, slot_image, cell_size, watermark, heuristic,
+                   power_of_two, max_size, max_fragmentation, antialias_watermark, previous_layout):
+    """
+    Pack the unique sprite sizes into pages and render them, fetching each image through
+    slot_image(slot) right before it is pasted. Returns what compose_atlas returns.
+    """
+    if len(sizes) < len(sprite_names):
+        print(f"Deduplicated {len(sprite_names) - len(sizes)} identical sprites "
+              f"({len(sizes)} unique images)")
+
+    corner_size = watermark_extent(watermark, antialias=antialias_watermark)
+    with profile_stage("pack"):
+        packed_pages = _pack_stable(sprite_names, slots, sizes, cell_size, heuristic, power_of_two, max_size,
+                                    max_fragmentation, corner_size, previous_layout)
+
+    pages = []
+    slot_positions = {}
+    for page, (atlas_width, atlas_height, placements) in enumerate(packed_pages):
+        label = "Atlas dimensions" if len(packed_pages) == 1 else f"Atlas page {page} dimensions"
+        page_sizes = [sizes[slot] for slot in placements]
+        print(f"{label}: {atlas_width}x{atlas_height} "
+              f"({heuristic}, fill ratio {fill_ratio(page_sizes, atlas_width, atlas_height):.1%})")
+
+        with profile_stage("render"):
+            pages.append(render_atlas((slot_image(slot) for slot in placements), list(placements.values()),
+                                      (atlas_width, atlas_height), watermark, antialias_watermark))
+        for slot, position in placements.items():
+            slot_positions[slot] = (page, position)
+
+    coordinates = {}
+    sprite_pages = {}
+    for sprite_name in sprite_names:
+        page, (x, y) = slot_positions[slots[sprite_name]]
+        coordinates[sprite_name] = [x, y]
+        sprite_pages[sprite_name] = page
+    return pages, coordinates, sprite_pages
+
+def compose_atlas_files(sprites, atlas_path, json_path, cell_size, watermark, packing, indexed=False,
+                        repack=False, streamed=False):
+    """
+    Compose an atlas with the packing options and save its pages next to atlas_path.
+    Sprites keep the positions the previous build recorded in json_path, so small edits give
+    small diffs, unless repack is set. streamed sprites are (name, load) pairs for
+    compose_atlas_streamed. Returns (page_paths, coordinates, sprite_pages).
+    Raises ValueError if the sprites don't fit.
+    """
+    previous_layout = None if repack else read_layout(json_path, atlas_path)
+    compose = compose_atlas_streamed if streamed else compose_atlas
+    pages, coordinates, sprite_pages = compose(sprites, cell_size, watermark, antialias_watermark=not indexed,
+                                               previous_layout=previous_layout, **packing)
+    page_paths = save_atlas_pages(pages, atlas_path, indexed)
+    return page_paths, coordinates, sprite_pages
+
+def write_atlas_data(json_path, index_path, header, coordinates, sprite_pages, page_paths, cell_size, tile_size,
+                     trims=None, autotile=None):
+    """
+    Write an atlas's coordinate JSON, starting with the header fields, and its binary sprite index.
+    Only atlases that spilled into further pages record them, so single-page output is unchanged.
+    """
+    multi_page = len(page_paths) > 1
+    json_data = {**header, "sprites": coordinates}
+    if autotile is not None:
+        json_data["autotile"] = autotile
+    if trims is not None:
+        json_data["trim"] = trims
+    if multi_page:
+        json_data["pages"] = [Path(page_path).name for page_path in page_paths]
+        json_data["page"] = sprite_pages
+    write_json(json_data, json_path)
+    write_sprite_index(index_path, coordinates, cell_size, tile_size, trims,
+                       sprite_pages if multi_page else None, autotile)
+
+def coordinates_by_page(coordinates, sprite_pages, page_count):
+    """Split a {name: [x, y]} map into one map per atlas page, keeping the order of names."""
+    page_coordinates = [{} for _ in range(page_count)]
+    for sprite_name, position in coordinates.items():
+        page_coordinates[sprite_pages[sprite_name]][sprite_name] = position
+    return page_coordinates
+
+def packing_options(args):
+    """compose_atlas keyword arguments from the command line, also recorded in the build manifest."""
+    return {
+        "heuristic": args.packer,
+        "power_of_two": not args.npot,
+        "max_size": args.max_atlas_size,
+        "max_fragmentation": args.max_fragmentation,
+    }
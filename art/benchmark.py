@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Script to benchmark the art pipeline on synthetic DawnLike-shaped sheets.
+Generates fixture sheets with the DawnLike layout (character frame pairs, Floor/Wall 7x3
+autotile blocks, decor, doors, items), so it runs without the DawnLike pack, then times
+every pipeline stage and writes the results as JSON to track regressions between versions.
+"""
+
+import os
+import time
+import random
+import shutil
+import argparse
+import platform
+import contextlib
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+import PIL
+from PIL import Image, ImageDraw
+from sheets import load_sheet, coverage_grid, iter_tiles
+from atlas import dedupe_sprites, pack_sprites, render_atlas
+from watermark import watermark_extent
+from outputs import ENCODING_PROFILES, DEFAULT_ENCODING_PROFILE, encode_png, set_encoding_profile, write_json
+from pipeline import add_pipeline_arguments
+from tile_references import reference_files
+import gen_world
+import gen_characters
+import gen_items
+import gen_ui
+
+BENCHMARK_VERSION = 2  # Bump when results stop being comparable with earlier ones
+TILE_SIZE = 16
+TRANSPARENCY_THRESHOLD = 0.1
+WATERMARK = "DawnLike tiles by DawnBringer"
+
+# The DB32 palette DawnLike is drawn with
+DB32 = [
+    0x000000, 0x222034, 0x45283c, 0x663931, 0x8f563b, 0xdf7126, 0xd9a066, 0xeec39a,
+    0xfbf236, 0x99e550, 0x6abe30, 0x37946e, 0x4b692f, 0x524b24, 0x323c39, 0x3f3f74,
+    0x306082, 0x5b6ee1, 0x639bff, 0x5fcde4, 0xcbdbfc, 0xffffff, 0x9badb7, 0x847e87,
+    0x696a6a, 0x595652, 0x76428a, 0xac3232, 0xd95763, 0xd77bba, 0x8f974a, 0x8a6f30,
+]
+PALETTE = [((color >> 16) & 0xff, (color >> 8) & 0xff, color & 0xff, 255) for color in DB32]
+
+# Sheet sizes in tiles (columns, rows at scale 1), close to the DawnLike originals
+CHARACTER_SHEETS = {
+    "Aquatic": 4, "Avian": 7, "Cat": 2, "Demon": 4, "Dog": 3, "Elemental": 7, "Humanoid": 26,
+    "Misc": 3, "Pest": 9, "Plant": 3, "Player": 8, "Quadraped": 4, "Reptile": 15, "Rodent": 3,
+    "Slime": 3, "Undead": 6,
+}
+ITEM_SHEETS = {
+    "Ammo": 3, "Amulet": 2, "Armor": 5, "Book": 3, "Boot": 2, "Chest0": 4, "Chest1": 4, "Flesh": 5,
+    "Food": 6, "Glove": 2, "Hat": 2, "Key": 1, "Light": 2, "LongWep": 5, "MedWep": 2, "Money": 2,
+    "Music": 2, "Potion": 1, "Ring": 2, "Rock": 2, "Scroll": 2, "Shield": 2, "ShortWep": 2,
+    "Tool": 3, "Wand": 2,
+}
+OBJECT_SHEETS = {
+    "Ground0.png": (8, 7), "Decor0.png": (8, 22), "Tile.png": (8, 8),
+    "Door0.png": (8, 6), "Door1.png": (8, 6),
+}
+FLOOR_SIZE = (21, 39)
+WALL_SIZE = (20, 51)
+GUI_SIZE = (16, 19)
+
+# The project this script belongs to, whatever the working directory
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# Data files the generators read besides the sheets and the files scanned for tile references
+PROJECT_FILES = [Path("assets/data/monsters.csv"), Path("assets/data/items.csv")]
+
+def draw_sprite(draw, left, top, rng, bob=0):
+    """Draw a blob-shaped sprite with an outline into the tile at (left, top)."""
+    fill = rng.choice(PALETTE[2:])
+    outline = rng.choice(PALETTE[:3])
+    inset = rng.randrange(1, 5)
+    box = [left + inset, top + inset - bob, left + TILE_SIZE - 1 - inset, top + TILE_SIZE - 1 - bob]
+    if rng.random() < 0.5:
+        draw.ellipse(box, fill=fill, outline=outline)
+    else:
+        draw.rounded_rectangle(box, radius=3, fill=fill, outline=outline)
+    # A few details so tiles aren't flat
+    for _ in range(rng.randrange(2, 8)):
+        x = rng.randrange(box[0] + 1, box[2])
+        y = rng.randrange(box[1] + 1, box[3])
+        draw.point((x, y), fill=rng.choice(PALETTE))
+
+def draw_speck(draw, left, top, rng):
+    """Draw a few pixels, below the transparency threshold."""
+    for _ in range(rng.randrange(1, 20)):
+        draw.point((left + rng.randrange(TILE_SIZE), top + rng.randrange(TILE_SIZE)), fill=rng.choice(PALETTE))
+
+def draw_ground(draw, left, top, rng):
+    """Draw an opaque, textured floor or wall tile."""
+    base = rng.choice(PALETTE[1:])
+    draw.rectangle([left, top, left + TILE_SIZE - 1, top + TILE_SIZE - 1], fill=base)
+    for _ in range(rng.randrange(8, 24)):
+        draw.point((left + rng.randrange(TILE_SIZE), top + rng.randrange(TILE_SIZE)), fill=rng.choice(PALETTE))
+
+def make_sheet(cols, rows, seed, empty=0.15, bob=0):
+    """
+    A sheet of random sprites. The same seed gives the same sprites, so two frames of a
+    character sheet only differ by the bob offset.
+    """
+    sheet = Image.new('RGBA', (cols * TILE_SIZE, rows * TILE_SIZE), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sheet)
+    for row in range(rows):
+        for col in range(cols):
+            rng = random.Random(f"{seed}-{row}-{col}")
+            roll = rng.random()
+            if roll < empty:
+                continue
+            if roll < empty + 0.05:
+                draw_speck(draw, col * TILE_SIZE, row * TILE_SIZE, rng)
+            else:
+                draw_sprite(draw, col * TILE_SIZE, row * TILE_SIZE, rng, bob)
+    return sheet
+
+def make_autotile_sheet(size, tile_type, seed):
+    """A Floor or Wall sheet: three rows of other tiles, then 7x3 autotile blocks."""
+    cols, rows = size
+    sheet = Image.new('RGBA', (cols * TILE_SIZE, rows * TILE_SIZE), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sheet)
+    pattern_map = gen_world.get_pattern_map_for_tile_type(tile_type)
+    for row in range(rows):
+        for col in range(cols):
+            rng = random.Random(f"{seed}-{row}-{col}")
+            if row < 3:
+                draw_sprite(draw, col * TILE_SIZE, row * TILE_SIZE, rng)
+            elif ((col % 7), (row - 3) % 3) in pattern_map and col < cols - cols % 7:
+                draw_ground(draw, col * TILE_SIZE, row * TILE_SIZE, rng)
+    return sheet
+
+def write_fixture(dawnlike_dir, scale=1, seed=0):
+    """Write DawnLike-shaped sheets under dawnlike_dir. Returns the list of sheet paths."""
+    dawnlike_dir = Path(dawnlike_dir)
+    sheets = {}
+    for name, rows in CHARACTER_SHEETS.items():
+        for frame in (0, 1):
+            # Frame 1 is frame 0 bobbing up a pixel, like DawnLike's idle animation
+            sheets[f"Characters/{name}{frame}.png"] = make_sheet(8, rows * scale, f"{seed}-{name}", bob=frame)
+    for name, rows in ITEM_SHEETS.items():
+        sheets[f"Items/{name}.png"] = make_sheet(8, rows * scale, f"{seed}-{name}")
+    for filename, (cols, rows) in OBJECT_SHEETS.items():
+        sheets[f"Objects/{filename}"] = make_sheet(cols, rows * scale, f"{seed}-{filename}")
+    sheets["Objects/Floor.png"] = make_autotile_sheet(
+        (FLOOR_SIZE[0], FLOOR_SIZE[1] * scale), "floor", f"{seed}-floor")
+    sheets["Objects/Wall.png"] = make_autotile_sheet(
+        (WALL_SIZE[0], WALL_SIZE[1] * scale), "wall", f"{seed}-wall")
+    sheets["GUI/GUI0.png"] = make_sheet(*GUI_SIZE, f"{seed}-gui", empty=0.05)
+
+    paths = []
+    for relative_path, sheet in sheets.items():
+        path = dawnlike_dir / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sheet.save(path)
+        paths.append(path)
+    return paths
+
+def time_stage(results, name, function, repeat):
+    """Run function repeat times, record its timings under name and return its last result."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        runs.append(time.perf_counter() - start)
+    results[name] = {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+    return value
+
+def atlas_sprite_sets(tiles):
+    """
+    Group extracted tiles into the world, character and item atlases the generators build.
+    Character frames 0 and 1 are joined side by side into 32x16 sprites.
+    """
+    sets = {"world": [], "characters": [], "items": []}
+    for path, sheet_tiles in tiles.items():
+        if path.parent.name == "Objects":
+            sets["world"] += [(f"{path.stem}-{cell}", tile) for cell, tile in sheet_tiles]
+        elif path.parent.name == "Items":
+            sets["items"] += [(f"{path.stem}-{cell}", tile) for cell, tile in sheet_tiles]
+        elif path.parent.name == "Characters" and path.stem.endswith("0"):
+            other_frame = dict(tiles.get(path.with_name(f"{path.stem[:-1]}1.png"), []))
+            for cell, tile in sheet_tiles:
+                sprite = Image.new('RGBA', (TILE_SIZE * 2, TILE_SIZE), (0, 0, 0, 0))
+                sprite.paste(tile, (0, 0))
+                sprite.paste(other_frame.get(cell, tile), (TILE_SIZE, 0))
+                sets["characters"].append((f"{path.stem[:-1]}-{cell}", sprite))
+    return sets
+
+def benchmark_stages(paths, output_dir, repeat, max_size):
+    """Time each pipeline stage on the fixture sheets. Returns (stage timings, fixture stats)."""
+    results = {}
+    images = time_stage(results, "decode", lambda: {path: load_sheet(path) for path in paths}, repeat)
+    time_stage(results, "classification",
+               lambda: [coverage_grid(image, TILE_SIZE) for image in images.values()], repeat)
+    tiles = time_stage(
+        results, "extraction",
+        lambda: {path: list(iter_tiles(image, TILE_SIZE, TRANSPARENCY_THRESHOLD)) for path, image in images.items()},
+        repeat)
+
+    sprite_sets = {name: sprites for name, sprites in atlas_sprite_sets(tiles).items() if sprites}
+    corner_size = watermark_extent(WATERMARK)
+
+    def pack_all():
+        packed = {}
+        for name, sprites in sprite_sets.items():
+            unique, slots = dedupe_sprites(sprites)
+            sizes = [sprite_image.size for _, sprite_image in unique]
+            cell_size = sizes[0]
+            packed[name] = (unique, slots, pack_sprites(sizes, cell_size, max_size=max_size, corner_size=corner_size))
+        return packed
+
+    packed = time_stage(results, "packing", pack_all, repeat)
+
+    def compose_all():
+        atlases = {}
+        for name, (unique, _, (width, height, positions)) in packed.items():
+            atlases[name] = render_atlas([image for _, image in unique], positions, (width, height), WATERMARK)
+        return atlases
+
+    atlases = time_stage(results, "composition", compose_all, repeat)
+    encoded = time_stage(results, "encode", lambda: {name: encode_png(atlas) for name, atlas in atlases.items()},
+                         repeat)
+
+    def write_all():
+        for name, (unique, slots, (_, _, positions)) in packed.items():
+            coordinates = {sprite_name: list(positions[slot]) for sprite_name, slot in slots.items()}
+            write_json({"tileSize": TILE_SIZE, "sprites": coordinates}, output_dir / f"{name}.json")
+
+    time_stage(results, "json_write", write_all, repeat)
+
+    stats = {
+        "sheets": len(paths),
+        "sheet_pixels": sum(image.width * image.height for image in images.values()),
+        "tiles": sum(len(sheet_tiles) for sheet_tiles in tiles.values()),
+        "atlases": {name: {"sprites": len(slots), "unique": len(unique), "size": [width, height],
+                           "png_bytes": len(encoded[name])}
+                    for name, (unique, slots, (width, height, _)) in packed.items()},
+    }
+    return results, stats
+
+def project_files():
+    """
+    The project files the generators read besides the sheets, relative to the project root:
+    the data files and every file gen_world.py scans for tile references.
+    """
+    previous_dir = Path.cwd()
+    os.chdir(PROJECT_ROOT)
+    try:
+        return PROJECT_FILES + reference_files(exclude=[gen_world.OUTPUT_DIR])
+    finally:
+        os.chdir(previous_dir)
+
+def benchmark_builds(project_dir, repeat, encoding):
+    """
+    Time full generator builds inside project_dir, with --force, --no-cache and --repack
+    so every run packs from scratch instead of around the previous run's layout.
+    """
+    parser = add_pipeline_arguments(argparse.ArgumentParser())
+    args = parser.parse_args(["--force", "--repack", "--no-cache", "--encoding", encoding])
+    results = {}
+    previous_dir = Path.cwd()
+    os.chdir(project_dir)
+    try:
+        for name, generator in [("world", gen_world), ("characters", gen_characters),
+                                ("items", gen_items), ("ui", gen_ui)]:
+            def build(name=name, generator=generator):
+                # The generators' progress output would drown the summary
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    success = generator.build(args)
+                if not success:
+                    raise RuntimeError(f"{name} build failed on the fixture")
+            time_stage(results, f"build_{name}", build, repeat)
+    finally:
+        os.chdir(previous_dir)
+    return results
+
+def git_revision(project_root):
+    """The current commit of the project, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=project_root, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_summary(stages):
+    """Print the median and best time of every stage."""
+    print()
+    print("Benchmark summary")
+    print("-" * 44)
+    print(f"  {'stage':<18} {'median':>10} {'min':>10}")
+    for name, timing in stages.items():
+        print(f"  {name:<18} {timing['median'] * 1000:8.1f}ms {timing['min'] * 1000:8.1f}ms")
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Benchmark the art pipeline on synthetic DawnLike-shaped sheets.")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Multiply the number of rows of every fixture sheet (default: 1)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per stage; the JSON keeps every run, its minimum and median (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fixture sheets (default: 0)")
+    parser.add_argument("--encoding", choices=ENCODING_PROFILES, default=DEFAULT_ENCODING_PROFILE,
+                        help=f"Encoding profile for the encode stage and builds (default: {DEFAULT_ENCODING_PROFILE})")
+    parser.add_argument("--max-atlas-size", type=int, default=4096,
+                        help="Largest atlas the packing stage may use (default: 4096)")
+    parser.add_argument("--no-builds", action="store_true",
+                        help="Only time the individual stages, not the full generator builds")
+    parser.add_argument("-o", "--output", type=Path, default=Path("benchmark.json"),
+                        help="Where to write the results (default: benchmark.json)")
+    parser.add_argument("--fixture", type=Path, metavar="DIR",
+                        help="Only write the fixture sheets into DIR (for example art/DawnLike) and exit")
+    return parser.parse_args()
+
+def main():
+    """Main function to generate the fixture and run the benchmark."""
+    args = parse_args()
+
+    if args.fixture:
+        paths = write_fixture(args.fixture, args.scale, args.seed)
+        print(f"Wrote {len(paths)} fixture sheets to {args.fixture}")
+        return
+
+    print("DawnLike Pipeline Benchmark")
+    print("=" * 40)
+
+    output_path = args.output.resolve()
+    set_encoding_profile(args.encoding)
+
+    with tempfile.TemporaryDirectory(prefix="dawnlike-benchmark-") as temp_dir:
+        project_dir = Path(temp_dir)
+        start = time.perf_counter()
+        paths = write_fixture(project_dir / "art/DawnLike", args.scale, args.seed)
+        print(f"Generated {len(paths)} fixture sheets (scale {args.scale}) in {time.perf_counter() - start:.2f}s")
+
+        stages, stats = benchmark_stages(paths, project_dir / "results", args.repeat, args.max_atlas_size)
+        if not args.no_builds:
+            for relative_path in project_files():
+                (project_dir / relative_path).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy(PROJECT_ROOT / relative_path, project_dir / relative_path)
+            stages.update(benchmark_builds(project_dir, args.repeat, args.encoding))
+
+    results = {
+        "benchmark_version": BENCHMARK_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(PROJECT_ROOT),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "encoding": args.encoding,
+        "fixture": stats,
+        "stages": stages,
+    }
+    write_json(results, output_path)
+
+    print_summary(stages)
+    print()
+    print(f"Wrote results to {output_path}")
+
+if __name__ == "__main__":
+    main()
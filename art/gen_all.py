@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Script to run the asset generators in a single process.
+Builds the world, character, item and UI atlases in one go, sharing decoded sheets,
+the watermark font and debug.png between stages, and prints how long each stage took.
+"""
+
+import sys
+import time
+import argparse
+import gen_world
+import gen_characters
+import gen_items
+import gen_ui
+from sheets import keep_sheets_resident
+from pipeline import add_pipeline_arguments, change_to_project_root, watch
+from profiling import profile_stage, report_profile, start_profiling
+
+# Stages in build order
+STAGES = {
+    "world": gen_world,
+    "characters": gen_characters,
+    "items": gen_items,
+    "ui": gen_ui,
+}
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Build all DawnLike atlases in one process.")
+    parser.add_argument(
+        "stages", nargs="*", metavar="STAGE",
+        help=f"Stages to build: {', '.join(STAGES)} (default: all)")
+    add_pipeline_arguments(parser)
+    args = parser.parse_args()
+
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    return args
+
+def selected_stages(args):
+    """Return the requested stage names in build order."""
+    if not args.stages:
+        return list(STAGES)
+    return [name for name in STAGES if name in args.stages]
+
+def run_stage(name, args):
+    """Run one stage's build. Returns (success, elapsed seconds)."""
+    print()
+    print(f"== {name} ==")
+    start = time.perf_counter()
+    try:
+        with profile_stage(name):
+            success = STAGES[name].build(args)
+    except Exception as e:
+        print(f"Error building {name}: {e}")
+        success = False
+    return success, time.perf_counter() - start
+
+def print_summary(timings):
+    """Print how long each stage took."""
+    print()
+    print("Build summary")
+    print("-" * 40)
+    for name, (success, elapsed) in timings.items():
+        status = "ok" if success else "FAILED"
+        print(f"  {name:<12} {elapsed:7.2f}s  {status}")
+    total = sum(elapsed for _, elapsed in timings.values())
+    print(f"  {'total':<12} {total:7.2f}s")
+
+def main():
+    """Main function to build every selected stage."""
+    args = parse_args()
+
+    print("DawnLike Asset Builder")
+    print("=" * 40)
+
+    # Change to project root directory
+    change_to_project_root()
+    start_profiling(args)
+
+    # Stages share decoded sheets for the lifetime of the process
+    keep_sheets_resident()
+
+    stage_names = selected_stages(args)
+    timings = {}
+    for name in stage_names:
+        timings[name] = run_stage(name, args)
+
+    print_summary(timings)
+    report_profile()
+
+    if args.watch:
+        args.force = False
+        args.jobs = 1  # Extract in this process so decoded sheets stay resident
+        watch([(name, STAGES[name].get_watch_paths(), lambda name=name: STAGES[name].build(args))
+               for name in stage_names])
+    elif not all(success for success, _ in timings.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,22 @@ Each PNG contains 16x16 tiles arranged in a grid.
 Extracts non-transparent tiles and saves them as individual files.
 """
 
-import os
 import sys
-import json
-import tempfile
+import argparse
 import shutil
+from functools import partial
 from pathlib import Path
 from PIL import Image
+from sheets import sheet_size, extract_tiles, use_sheet_cache
+from sprite_cache import CACHE_DIR, open_sprite_cache
+from planner import plan_sheet_cells
+from profiling import profile_stage, report_profile, start_profiling
+from pipeline import add_pipeline_arguments, change_to_project_root, resolve_jobs, run_jobs, watch
+from manifest import generator_sources, is_up_to_date, record_stage
+from atlas import (TRIM_CELL_SIZE, compose_atlas_files, packing_options, trim_sprite_loaders, trim_sprites,
+                   write_atlas_data)
+from outputs import extra_page_paths, report_output_changes, set_encoding_profile
+from tileset_resource import grid_sources, write_tileset
 import re
 from collections import defaultdict
 import csv
@@ -20,6 +29,7 @@ import csv
 TILE_SIZE = 16
 CHARACTERS_DIR = Path("art/DawnLike/Characters")
 OUTPUT_DIR = Path("assets/generated")
+MONSTERS_CSV = Path("assets/data/monsters.csv")
 TRANSPARENCY_THRESHOLD = 0.1  # Skip tiles with less than 10% non-transparent pixels
 
 # Sprite extraction limits
@@ -33,10 +43,9 @@ WATERMARK = "DawnLike tiles by DawnBringer"
 
 def read_allowed_sprite_names_from_csv():
     """Read monsters.csv and extract sprite names from the appearance column."""
-    monsters_csv_path = Path("assets/data/monsters.csv")
     allowed_sprite_names = set()
 
-    with open(monsters_csv_path, 'r', encoding='utf-8') as csvfile:
+    with open(MONSTERS_CSV, 'r', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
             appearance = row.get('appearance', '').strip()
@@ -51,50 +60,11 @@ def read_allowed_sprite_names_from_csv():
 
     return allowed_sprite_names
 
-def find_project_root():
-    """Find the project root directory by looking for project.godot file."""
-    current_dir = Path.cwd()
-
-    # Check current directory and parent directories
-    for path in [current_dir] + list(current_dir.parents):
-        if (path / "project.godot").exists():
-            return path
-
-    # If not found, assume current directory is project root
-    print("Warning: Could not find project.godot file. Using current directory as project root.")
-    return current_dir
-
-def change_to_project_root():
-    """Change to the project root directory."""
-    project_root = find_project_root()
-    os.chdir(project_root)
-    print(f"Changed to project root: {project_root}")
-    return project_root
-
 def ensure_output_directory():
     """Create output directory if it doesn't exist."""
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     print(f"Using output directory: {OUTPUT_DIR}")
 
-def is_tile_transparent(image_tile):
-    """
-    Check if a tile is mostly transparent.
-    Returns True if the tile should be skipped.
-    """
-    # Convert to RGBA if not already
-    if image_tile.mode != 'RGBA':
-        image_tile = image_tile.convert('RGBA')
-
-    # Count non-transparent pixels
-    pixels = list(image_tile.getdata())
-    non_transparent_count = sum(1 for pixel in pixels if pixel[3] > 0)
-
-    # Calculate percentage of non-transparent pixels
-    total_pixels = len(pixels)
-    non_transparent_ratio = non_transparent_count / total_pixels
-
-    return non_transparent_ratio < TRANSPARENCY_THRESHOLD
-
 def extract_character_name(filename):
     """Extract character name from filename (everything before the number)."""
     # Remove .png extension and extract name before the number
@@ -104,84 +74,61 @@ def extract_character_name(filename):
         return match.group(1).lower(), int(match.group(2))
     return name_without_ext.lower(), 0
 
-def process_character_png(png_path, temp_dir):
-    """Process a single character PNG file."""
+def process_character_png(png_path, cells=None, cache_dir=None):
+    """
+    Process a single character PNG file.
+    If cells is given, only those cell indices are cropped; otherwise every tile is scanned.
+    With a cache_dir, tiles extracted on earlier runs are reused from the sprite cache.
+    Returns a list of (sprite_name, frame, tile_image) for every non-transparent tile.
+    """
     print(f"Processing: {png_path}")
+    extracted_tiles = []
 
     try:
-        # Load the image
-        image = Image.open(png_path)
-
         # Extract character name and frame number
         char_name, frame = extract_character_name(png_path)
 
         # Calculate grid dimensions
-        width, height = image.size
+        width, height = sheet_size(png_path)
         cols = width // TILE_SIZE
         rows = height // TILE_SIZE
+        total_count = rows * cols if cells is None else len(cells)
 
         print(f"  Character: {char_name}, Frame: {frame}")
         print(f"  Image size: {width}x{height}, Grid: {cols}x{rows}")
+        if cells is not None:
+            print(f"  Planned cells: {', '.join(str(cell) for cell in sorted(cells))}")
 
-        sprite_count = 0
-        saved_count = 0
-
-                # Extract each tile
-        for row in range(rows):
-            for col in range(cols):
-                # Calculate tile coordinates
-                left = col * TILE_SIZE
-                top = row * TILE_SIZE
-                right = left + TILE_SIZE
-                bottom = top + TILE_SIZE
-
-                # Extract tile
-                tile = image.crop((left, top, right, bottom))
+        # Keep every tile that isn't mostly transparent
+        cache = open_sprite_cache(cache_dir)
+        for sprite_index, tile in extract_tiles(png_path, TILE_SIZE, TRANSPARENCY_THRESHOLD, cells, cache):
+            extracted_tiles.append((f"{char_name}-{sprite_index}", frame, tile))
 
-                # Check if tile is transparent
-                if is_tile_transparent(tile):
-                    sprite_count += 1
-                    continue
-
-                # Save non-transparent tile
-                output_filename = f"{char_name}-{sprite_count}-{frame}.png"
-                output_path = temp_dir / output_filename
-
-                # Convert to RGBA to ensure proper transparency handling
-                if tile.mode != 'RGBA':
-                    tile = tile.convert('RGBA')
-
-                tile.save(output_path, 'PNG')
-                saved_count += 1
-                sprite_count += 1
-
-        print(f"  Saved {saved_count} tiles{limit_msg} (skipped {sprite_count - saved_count} transparent tiles)")
+        saved_count = len(extracted_tiles)
+        print(f"  Saved {saved_count} tiles (skipped {total_count - saved_count} transparent tiles)")
 
     except Exception as e:
         print(f"Error processing {png_path}: {e}")
 
-def collect_sprite_pairs(temp_dir):
-    """Collect all sprite files and group them by character and sprite number."""
-    sprite_files = list(temp_dir.glob("*.png"))
+    return extracted_tiles
+
+def process_character_sheet(task):
+    """Process one (png_path, cells, cache_dir) extraction task."""
+    png_path, cells, cache_dir = task
+    with profile_stage("extract", png_path):
+        return process_character_png(png_path, cells, cache_dir)
+
+def collect_sprite_pairs(extracted_tiles):
+    """Group extracted tiles by character and sprite number."""
     sprite_groups = defaultdict(list)
 
-    for sprite_file in sprite_files:
-        # Parse filename: character-sprite_number-frame.png
-        parts = sprite_file.stem.split('-')
-        if len(parts) >= 3:
-            char_name = parts[0]
-            sprite_num = parts[1]
-            frame = parts[2]
-            sprite_groups[f"{char_name}-{sprite_num}"].append((int(frame), sprite_file))
+    for sprite_name, frame, tile in extracted_tiles:
+        sprite_groups[sprite_name].append((frame, tile))
 
     return sprite_groups
 
-def create_double_width_sprite(frame_0_path, frame_1_path):
+def create_double_width_sprite(frame_0, frame_1):
     """Create a double-width sprite by combining two frames side by side."""
-    # Load both frames
-    frame_0 = Image.open(frame_0_path).convert('RGBA')
-    frame_1 = Image.open(frame_1_path).convert('RGBA')
-
     # Create double-width sprite
     combined = Image.new('RGBA', (SPRITE_WIDTH, SPRITE_HEIGHT), (0, 0, 0, 0))
 
@@ -191,125 +138,151 @@ def create_double_width_sprite(frame_0_path, frame_1_path):
 
     return combined
 
-def calculate_optimal_atlas_size(num_sprites):
-    """Calculate the optimal atlas size for the given number of sprites."""
-    import math
-
-    # Calculate how many sprites fit per row
-    # Start with a square-ish layout
-    sprites_per_row = math.ceil(math.sqrt(num_sprites))
-
-    # Calculate required dimensions
-    atlas_width = sprites_per_row * SPRITE_WIDTH
-    atlas_height = math.ceil(num_sprites / sprites_per_row) * SPRITE_HEIGHT
-
-    # Round up to next power of 2 for better GPU compatibility (optional)
-    def next_power_of_2(n):
-        return 1 << (n - 1).bit_length()
-
-    atlas_width = next_power_of_2(atlas_width)
-    atlas_height = next_power_of_2(atlas_height)
-
-    # Ensure minimum atlas size of 256x256
-    MIN_ATLAS_SIZE = 256
-    atlas_width = max(atlas_width, MIN_ATLAS_SIZE)
-    atlas_height = max(atlas_height, MIN_ATLAS_SIZE)
-
-    return atlas_width, atlas_height, sprites_per_row
+def trim_character_sprite(sprite):
+    """
+    Trim a double-width sprite to the opaque area of its two frames.
+    Both frames are cropped to the same box, trimmed equally on the left and right so a
+    flipped sprite stays in place, and put side by side again.
+    Returns (trimmed_sprite, [offset_x, offset_y, frame_width, height]) for a single frame.
+    """
+    frames = [sprite.crop((i * TILE_SIZE, 0, (i + 1) * TILE_SIZE, SPRITE_HEIGHT)) for i in range(2)]
+    boxes = [frame.getchannel('A').getbbox() for frame in frames]
+    boxes = [box for box in boxes if box is not None]
+    if not boxes:
+        return sprite, [0, 0, TILE_SIZE, SPRITE_HEIGHT]
+
+    side = min(min(box[0] for box in boxes), TILE_SIZE - max(box[2] for box in boxes))
+    top = min(box[1] for box in boxes)
+    bottom = max(box[3] for box in boxes)
+    width = TILE_SIZE - 2 * side
+    height = bottom - top
+
+    trimmed = Image.new('RGBA', (width * 2, height), (0, 0, 0, 0))
+    for i, frame in enumerate(frames):
+        trimmed.paste(frame.crop((side, top, side + width, bottom)), (i * width, 0))
+    return trimmed, [side, top, width, height]
 
 def create_debug_tile():
     tile = Image.new('RGBA', (SPRITE_WIDTH, SPRITE_HEIGHT), (255, 165, 0, 255))  # Orange, double-width
     return tile
 
-def create_atlas(sprite_groups):
-    """Create the sprite atlas and coordinate JSON."""
+def plan_character_tasks(png_files, allowed_sprite_names, cache_dir):
+    """Build (png_path, cells, cache_dir) tasks for the sheets that provide the allowed sprites."""
+    sheet_keys = {png_file: extract_character_name(png_file)[0] for png_file in png_files}
+    plan, unresolved = plan_sheet_cells(allowed_sprite_names, sheet_keys)
+
+    for sprite_name in unresolved:
+        print(f"Warning: No character sheet provides sprite {sprite_name}")
+
+    planned_cells = sum(len(cells) for cells in plan.values())
+    print(f"Planned {planned_cells} cells from {len(plan)} of {len(png_files)} sheets")
+    return [(png_file, plan[png_file], cache_dir) for png_file in sorted(plan)]
+
+def create_atlas(sprite_groups, allowed_sprite_names, packing, trim=False, indexed=False, low_memory=False,
+                 repack=False):
+    """
+    Create the sprite atlas and coordinate JSON.
+    With low_memory, double-width sprites are only created while they are measured and pasted
+    (see compose_atlas_streamed) instead of all being kept until the atlas is composed.
+    """
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
     # Prepare sprites for atlas
     atlas_sprites = []
-    coordinates = {}
-
-    allowed_sprite_names = read_allowed_sprite_names_from_csv()
 
     for sprite_name, frames in sorted(sprite_groups.items()):
         frames.sort(key=lambda x: x[0])
         if len(frames) == 2:
-            frame_0_path = frames[0][1]
-            frame_1_path = frames[1][1]
-            combined_sprite = create_double_width_sprite(frame_0_path, frame_1_path)
-            if SET_THIS_TO_FALSE_TO_GET_ALL_CHARACTERS and sprite_name not in allowed_sprite_names:
-                continue
-            print(f"Adding sprite: {sprite_name}")
-            atlas_sprites.append((sprite_name, combined_sprite))
+            frame_0 = frames[0][1]
+            frame_1 = frames[1][1]
         elif len(frames) == 1:
-            frame_path = frames[0][1]
-            combined_sprite = create_double_width_sprite(frame_path, frame_path)
-            if SET_THIS_TO_FALSE_TO_GET_ALL_CHARACTERS and sprite_name not in allowed_sprite_names:
-                continue
-            print(f"Adding sprite: {sprite_name}")
-            atlas_sprites.append((sprite_name, combined_sprite))
+            frame_0 = frame_1 = frames[0][1]
+        else:
+            continue
+        if SET_THIS_TO_FALSE_TO_GET_ALL_CHARACTERS and sprite_name not in allowed_sprite_names:
+            continue
+        print(f"Adding sprite: {sprite_name}")
+        load_sprite = partial(create_double_width_sprite, frame_0, frame_1)
+        atlas_sprites.append((sprite_name, load_sprite if low_memory else load_sprite()))
 
     # Add debug tile
-    debug_tile = create_debug_tile()
-    atlas_sprites.append(("debug", debug_tile))
-
-    atlas_width, atlas_height, sprites_per_row = calculate_optimal_atlas_size(len(atlas_sprites))
+    atlas_sprites.append(("debug", create_debug_tile if low_memory else create_debug_tile()))
 
     print(f"Creating character atlas with {len(atlas_sprites)} sprites")
-    print(f"Atlas dimensions: {atlas_width}x{atlas_height} ({sprites_per_row} sprites per row)")
-
-    atlas = Image.new('RGBA', (atlas_width, atlas_height), (0, 0, 0, 0))
-
-    for i, (sprite_name, sprite_image) in enumerate(atlas_sprites):
-        x = (i % sprites_per_row) * SPRITE_WIDTH
-        y = (i // sprites_per_row) * SPRITE_HEIGHT
-        atlas.paste(sprite_image, (x, y))
-        coordinates[sprite_name] = [x, y]
-
-    # Add watermark
-    from PIL import ImageDraw, ImageFont
-    draw = ImageDraw.Draw(atlas)
-    font = ImageFont.load_default()
-    text = WATERMARK
-    try:
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    except AttributeError:
-        text_w, text_h = font.getsize(text)
-    margin = 4
-    x = atlas_width - text_w - margin
-    y = atlas_height - text_h - margin
-    for dx in [-1, 0, 1]:
-        for dy in [-1, 0, 1]:
-            if dx or dy:
-                draw.text((x+dx, y+dy), text, font=font, fill=(0,0,0,255))
-    draw.text((x, y), text, font=font, fill=(255,255,255,255))
+    cell_size = (SPRITE_WIDTH, SPRITE_HEIGHT)
+    trims = None
+    if trim:
+        if low_memory:
+            atlas_sprites, trims = trim_sprite_loaders(atlas_sprites, trim_character_sprite)
+        else:
+            atlas_sprites, trims = trim_sprites(atlas_sprites, trim_character_sprite)
+        cell_size = TRIM_CELL_SIZE
 
     atlas_path = OUTPUT_DIR / "character_tiles.png"
-    atlas.save(atlas_path, 'PNG')
-
-    json_data = {
-        "tileWidth": SPRITE_WIDTH,
-        "tileHeight": SPRITE_HEIGHT,
-        "sprites": coordinates
-    }
     json_path = OUTPUT_DIR / "character_tiles.json"
-    with open(json_path, 'w') as f:
-        json.dump(json_data, f, indent=2)
-
-    print(f"Created atlas at {atlas_path}")
-    print(f"Created coordinate data at {json_path}")
+    try:
+        page_paths, coordinates, sprite_pages = compose_atlas_files(
+            atlas_sprites, atlas_path, json_path, cell_size, WATERMARK, packing, indexed, repack,
+            streamed=low_memory)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return False
+
+    index_path = OUTPUT_DIR / "character_tiles.bin"
+    write_atlas_data(json_path, index_path, {"tileWidth": SPRITE_WIDTH, "tileHeight": SPRITE_HEIGHT}, coordinates,
+                     sprite_pages, page_paths, cell_size, (SPRITE_WIDTH, SPRITE_HEIGHT), trims)
+
+    print(f"Created atlas at {', '.join(str(page_path) for page_path in page_paths)}")
+    print(f"Created coordinate data at {json_path} and {index_path}")
+
+    # Same TileSet gen_characters_tileset.gd builds: one tile per frame, so two per sprite,
+    # with one source per page
+    if trims is not None:
+        print("Skipped character_tiles.tres: trimmed atlases have no tile grid")
+    else:
+        tileset_path = OUTPUT_DIR / "character_tiles.tres"
+        frame_size = (TILE_SIZE, SPRITE_HEIGHT)
+        sources = grid_sources(coordinates, sprite_pages, page_paths, frame_size, frames=2)
+        write_tileset(tileset_path, atlas_path, frame_size, sources)
+        print(f"Created tileset at {tileset_path} with {sum(len(source['tiles']) for source in sources)} tiles")
     return True
 
-def main():
-    """Main function to process all character PNGs."""
-    print("DawnLike Character Tile Processor")
-    print("=" * 40)
+def get_build_settings(packing, trim, indexed, encoding):
+    """Settings that affect the generated atlas, recorded in the build manifest."""
+    return {
+        "packing": packing,
+        "indexed": indexed,
+        "encoding": encoding,
+        "trim": trim,
+        "TILE_SIZE": TILE_SIZE,
+        "TRANSPARENCY_THRESHOLD": TRANSPARENCY_THRESHOLD,
+        "SET_THIS_TO_FALSE_TO_GET_ALL_CHARACTERS": SET_THIS_TO_FALSE_TO_GET_ALL_CHARACTERS,
+        "SPRITE_WIDTH": SPRITE_WIDTH,
+        "SPRITE_HEIGHT": SPRITE_HEIGHT,
+        "WATERMARK": WATERMARK,
+    }
 
-    # Change to project root directory
-    change_to_project_root()
-    print()
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Process DawnLike character tilesets into a sprite atlas.")
+    add_pipeline_arguments(parser)
+    return parser.parse_args()
+
+def get_watch_paths():
+    """Files and directories whose changes trigger a rebuild in watch mode."""
+    return [CHARACTERS_DIR, MONSTERS_CSV]
 
+def get_build_outputs(trim):
+    """Files a build writes, including the extra atlas pages currently on disk."""
+    atlas_path = OUTPUT_DIR / "character_tiles.png"
+    build_outputs = [atlas_path, *extra_page_paths(atlas_path), OUTPUT_DIR / "character_tiles.json",
+                     OUTPUT_DIR / "character_tiles.bin"]
+    if not trim:
+        build_outputs.append(OUTPUT_DIR / "character_tiles.tres")
+    return build_outputs
+
+def build(args):
+    """Build the character atlas. Returns False if the build failed."""
     # Check if characters directory exists
     if not CHARACTERS_DIR.exists():
         print(f"Error: DawnLike Characters directory not found: {CHARACTERS_DIR}")
@@ -318,7 +291,7 @@ def main():
         print("Please follow the setup instructions in the main project README.md")
         print("to download and install the DawnLike tileset.")
         print()
-        sys.exit(1)
+        return False
 
     # Create output directory
     ensure_output_directory()
@@ -328,44 +301,86 @@ def main():
 
     if not png_files:
         print("No PNG files found in Characters directory")
-        return
+        return True
 
-    print(f"Found {len(png_files)} PNG files to process")
+    print(f"Found {len(png_files)} PNG files")
     print()
 
-    # Create temporary directory and process files
-    with tempfile.TemporaryDirectory() as temp_dir_str:
-        temp_dir = Path(temp_dir_str)
-        print(f"Using temporary directory: {temp_dir}")
-        print()
+    # Skip the whole run if no input, setting or output changed since the last build
+    build_inputs = png_files + [MONSTERS_CSV] + generator_sources(__file__)
+    packing = packing_options(args)
+    build_settings = get_build_settings(packing, args.trim, args.indexed, args.encoding)
+    set_encoding_profile(args.encoding)
+    use_sheet_cache(None if args.no_cache else CACHE_DIR)
+    if is_up_to_date("characters", build_inputs, build_settings, get_build_outputs(args.trim),
+                     args.force or args.repack):
+        return True
+    print()
+
+    cache_dir = None if args.no_cache else CACHE_DIR
 
-        # Process each PNG file
-        total_processed = 0
-        for png_file in sorted(png_files):
-            process_character_png(png_file, temp_dir)
-            total_processed += 1
-            print()
+    # Only crop the cells monsters.csv references, unless extracting everything
+    allowed_sprite_names = read_allowed_sprite_names_from_csv()
+    if SET_THIS_TO_FALSE_TO_GET_ALL_CHARACTERS:
+        tasks = plan_character_tasks(png_files, allowed_sprite_names, cache_dir)
+    else:
+        tasks = [(png_file, None, cache_dir) for png_file in sorted(png_files)]
+
+    print(f"Extracting with {resolve_jobs(args.jobs)} job(s)")
+    print()
 
-        print(f"Processing complete! Processed {total_processed} files.")
-        print(f"Individual tiles saved to: {temp_dir.absolute()}")
+    # Process each PNG file, keeping extracted tiles in memory
+    extracted_tiles = []
+    total_processed = 0
+    for sheet_tiles in run_jobs(process_character_sheet, tasks, args.jobs):
+        extracted_tiles.extend(sheet_tiles)
+        total_processed += 1
         print()
 
-        # Generate atlas from extracted tiles
-        print("Generating sprite atlas...")
-        sprite_groups = collect_sprite_pairs(temp_dir)
-
-        if sprite_groups:
-            success = create_atlas(sprite_groups)
-            if success:
-                print("Atlas generation complete!")
-                print("Temporary files cleaned up.")
-            else:
-                print("Atlas generation failed!")
-                sys.exit(1)
+    print(f"Processing complete! Processed {total_processed} files.")
+    print(f"Extracted {len(extracted_tiles)} tiles")
+    print()
+
+    # Generate atlas from extracted tiles
+    print("Generating sprite atlas...")
+    sprite_groups = collect_sprite_pairs(extracted_tiles)
+
+    if sprite_groups:
+        success = create_atlas(sprite_groups, allowed_sprite_names, packing, args.trim, args.indexed,
+                               args.low_memory, args.repack)
+        if success:
+            record_stage("characters", build_inputs, build_settings, get_build_outputs(args.trim))
+            report_output_changes()
+            print("Atlas generation complete!")
         else:
-            print("No sprite pairs found for atlas generation")
+            print("Atlas generation failed!")
+            return False
+    else:
+        print("No sprite pairs found for atlas generation")
+    return True
+
+def main():
+    """Main function to process all character PNGs."""
+    args = parse_args()
+
+    print("DawnLike Character Tile Processor")
+    print("=" * 40)
+
+    # Change to project root directory
+    change_to_project_root()
+    start_profiling(args)
+    print()
+
+    with profile_stage("characters"):
+        success = build(args)
+    report_profile()
+    if not success and not args.watch:
+        sys.exit(1)
 
-    # Temporary directory is automatically cleaned up here
+    if args.watch:
+        args.force = False
+        args.jobs = 1  # Extract in this process so decoded sheets stay resident
+        watch([("characters", get_watch_paths(), lambda: build(args))])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -30,6 +30,16 @@ func _run() -> void:
 		printerr("Failed to parse JSON data")
 		return
 
+	# Each page of a multi-page atlas needs its own source, which gen_characters.py writes itself
+	if json.has("pages"):
+		printerr("Character atlas has several pages; use the TileSet gen_characters.py writes")
+		return
+
+	# Trimmed atlases have no tile grid; the game reads them through CharacterTiles
+	if json.has("trim"):
+		printerr("Character atlas was generated with --trim and can't be turned into a TileSet")
+		return
+
 	var tile_width := json.tileWidth as int
 	var tile_height := json.tileHeight as int
 
@@ -5,22 +5,29 @@ Each PNG contains 16x16 tiles arranged in a grid.
 Extracts non-transparent tiles and saves them as individual files.
 """
 
-import os
 import sys
-import json
-import tempfile
+import argparse
 import shutil
 from pathlib import Path
 from PIL import Image
+from sheets import sheet_size, extract_tiles, use_sheet_cache
+from sprite_cache import CACHE_DIR, open_sprite_cache
+from planner import plan_sheet_cells
+from profiling import profile_stage, report_profile, start_profiling
+from pipeline import add_pipeline_arguments, change_to_project_root, resolve_jobs, run_jobs, watch
+from manifest import generator_sources, is_up_to_date, record_stage
+from atlas import TRIM_CELL_SIZE, compose_atlas_files, packing_options, trim_sprites, write_atlas_data
+from outputs import extra_page_paths, report_output_changes, save_shared_image, set_encoding_profile
+from tileset_resource import atlas_source, grid_sources, write_tileset
 import re
 from collections import defaultdict
-from PIL import ImageDraw, ImageFont
 import csv
 
 # Configuration
 TILE_SIZE = 16
 ITEMS_DIR = Path("art/DawnLike/Items")
 OUTPUT_DIR = Path("assets/generated")
+ITEMS_CSV = Path("assets/data/items.csv")
 TRANSPARENCY_THRESHOLD = 0.1  # Skip tiles with less than 10% non-transparent pixels
 
 # Sprite extraction limits
@@ -34,10 +41,9 @@ WATERMARK = "DawnLike tiles by DawnBringer"
 
 def read_allowed_sprite_names_from_csv():
     """Read items.csv and extract sprite names from the sprite column."""
-    items_csv_path = Path("assets/data/items.csv")
     allowed_sprite_names = set()
 
-    with open(items_csv_path, 'r', encoding='utf-8') as csvfile:
+    with open(ITEMS_CSV, 'r', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
             sprite = row.get('sprite', '').strip()
@@ -51,224 +57,174 @@ def read_allowed_sprite_names_from_csv():
 
     return allowed_sprite_names
 
-def find_project_root():
-    """Find the project root directory by looking for project.godot file."""
-    current_dir = Path.cwd()
-
-    # Check current directory and parent directories
-    for path in [current_dir] + list(current_dir.parents):
-        if (path / "project.godot").exists():
-            return path
-
-    # If not found, assume current directory is project root
-    print("Warning: Could not find project.godot file. Using current directory as project root.")
-    return current_dir
-
-def change_to_project_root():
-    """Change to the project root directory."""
-    project_root = find_project_root()
-    os.chdir(project_root)
-    print(f"Changed to project root: {project_root}")
-    return project_root
-
 def ensure_output_directory():
     """Create output directory if it doesn't exist."""
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     print(f"Using output directory: {OUTPUT_DIR}")
 
-def is_tile_transparent(image_tile):
-    """
-    Check if a tile is mostly transparent.
-    Returns True if the tile should be skipped.
-    """
-    # Convert to RGBA if not already
-    if image_tile.mode != 'RGBA':
-        image_tile = image_tile.convert('RGBA')
-
-    # Count non-transparent pixels
-    pixels = list(image_tile.getdata())
-    non_transparent_count = sum(1 for pixel in pixels if pixel[3] > 0)
-
-    # Calculate percentage of non-transparent pixels
-    total_pixels = len(pixels)
-    non_transparent_ratio = non_transparent_count / total_pixels
-
-    return non_transparent_ratio < TRANSPARENCY_THRESHOLD
-
 def extract_item_name(filename):
     """Extract item name from filename."""
     # Remove .png extension and use the base name
     name_without_ext = filename.stem
     return name_without_ext.lower()
 
-def process_item_png(png_path, temp_dir):
-    """Process a single item PNG file."""
+def process_item_png(png_path, cells=None, cache_dir=None):
+    """
+    Process a single item PNG file.
+    If cells is given, only those cell indices are cropped; otherwise every tile is scanned.
+    With a cache_dir, tiles extracted on earlier runs are reused from the sprite cache.
+    Returns a dict of sprite name to tile image for every non-transparent tile.
+    """
     print(f"Processing: {png_path}")
+    tiles = {}
 
     try:
-        # Load the image
-        image = Image.open(png_path)
-
         # Extract item name
         item_name = extract_item_name(png_path)
 
         # Calculate grid dimensions
-        width, height = image.size
+        width, height = sheet_size(png_path)
         cols = width // TILE_SIZE
         rows = height // TILE_SIZE
 
         print(f"  Item type: {item_name}")
         print(f"  Image size: {width}x{height}, Grid: {cols}x{rows}")
+        if cells is not None:
+            print(f"  Planned cells: {', '.join(str(cell) for cell in sorted(cells))}")
 
-        sprite_count = 0
-
-        # Extract each tile
-        for row in range(rows):
-            for col in range(cols):
-                # Calculate tile coordinates
-                left = col * TILE_SIZE
-                top = row * TILE_SIZE
-                right = left + TILE_SIZE
-                bottom = top + TILE_SIZE
-
-                # Extract tile
-                tile = image.crop((left, top, right, bottom))
-
-                # Check if tile is transparent
-                if is_tile_transparent(tile):
-                    sprite_count += 1
-                    continue
-
-                # Save non-transparent tile
-                output_filename = f"{item_name}-{sprite_count}.png"
-                output_path = temp_dir / output_filename
-
-                # Convert to RGBA to ensure proper transparency handling
-                if tile.mode != 'RGBA':
-                    tile = tile.convert('RGBA')
-
-                tile.save(output_path, 'PNG')
-                sprite_count += 1
-
+        # Keep every tile that isn't mostly transparent
+        cache = open_sprite_cache(cache_dir)
+        for sprite_index, tile in extract_tiles(png_path, TILE_SIZE, TRANSPARENCY_THRESHOLD, cells, cache):
+            tiles[f"{item_name}-{sprite_index}"] = tile
 
     except Exception as e:
         print(f"Error processing {png_path}: {e}")
 
-def collect_item_sprites(temp_dir):
-    """Collect all sprite files."""
-    sprite_files = list(temp_dir.glob("*.png"))
-    return sorted(sprite_files)
-
-def calculate_optimal_atlas_size(num_sprites):
-    """Calculate the optimal atlas size for the given number of sprites."""
-    import math
-
-    # Calculate how many sprites fit per row
-    # Start with a square-ish layout
-    sprites_per_row = math.ceil(math.sqrt(num_sprites))
-
-    # Calculate required dimensions
-    atlas_width = sprites_per_row * SPRITE_WIDTH
-    atlas_height = math.ceil(num_sprites / sprites_per_row) * SPRITE_HEIGHT
-
-    # Round up to next power of 2 for better GPU compatibility (optional)
-    def next_power_of_2(n):
-        return 1 << (n - 1).bit_length()
+    return tiles
 
-    atlas_width = next_power_of_2(atlas_width)
-    atlas_height = next_power_of_2(atlas_height)
+def process_item_sheet(task):
+    """Process one (png_path, cells, cache_dir) extraction task."""
+    png_path, cells, cache_dir = task
+    with profile_stage("extract", png_path):
+        return process_item_png(png_path, cells, cache_dir)
 
-    # Ensure minimum atlas size of 256x256
-    MIN_ATLAS_SIZE = 256
-    atlas_width = max(atlas_width, MIN_ATLAS_SIZE)
-    atlas_height = max(atlas_height, MIN_ATLAS_SIZE)
-
-    return atlas_width, atlas_height, sprites_per_row
+def collect_item_sprites(tiles):
+    """Collect all extracted sprites as (name, image) pairs sorted by name."""
+    return sorted(tiles.items())
 
 def create_debug_tile():
     tile = Image.new('RGBA', (SPRITE_WIDTH, SPRITE_HEIGHT), (255, 165, 0, 255))  # Orange
     return tile
 
-def create_atlas(sprite_files):
+def plan_item_tasks(png_files, allowed_sprite_names, cache_dir):
+    """Build (png_path, cells, cache_dir) tasks for the sheets that provide the allowed sprites."""
+    sheet_keys = {png_file: extract_item_name(png_file) for png_file in png_files}
+    plan, unresolved = plan_sheet_cells(allowed_sprite_names, sheet_keys)
+
+    for sprite_name in unresolved:
+        print(f"Warning: No item sheet provides sprite {sprite_name}")
+
+    planned_cells = sum(len(cells) for cells in plan.values())
+    print(f"Planned {planned_cells} cells from {len(plan)} of {len(png_files)} sheets")
+    return [(png_file, plan[png_file], cache_dir) for png_file in sorted(plan)]
+
+def get_tileset_sources(coordinates, trims, sprite_pages, page_paths):
+    """
+    TileSet sources for the atlas, as gen_items_tileset.gd builds them: one grid source per page,
+    or for trimmed atlases one source per sprite whose AtlasTexture margin pads it back to full size.
+    """
+    if trims is None:
+        return grid_sources(coordinates, sprite_pages, page_paths, (SPRITE_WIDTH, SPRITE_HEIGHT))
+
+    sources = []
+    for sprite_name, (x, y) in coordinates.items():
+        offset_x, offset_y, width, height = trims[sprite_name]
+        sources.append(atlas_source(
+            [(0, 0)], (SPRITE_WIDTH, SPRITE_HEIGHT), region=(x, y, width, height),
+            margin=(offset_x, offset_y, SPRITE_WIDTH - width, SPRITE_HEIGHT - height),
+            texture=page_paths[sprite_pages[sprite_name]]))
+    return sources
+
+def create_atlas(sprites, allowed_sprite_names, packing, trim=False, indexed=False, repack=False):
     """Create the sprite atlas and coordinate JSON."""
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    # Read allowed sprite names from CSV
-    allowed_sprite_names = read_allowed_sprite_names_from_csv()
-
-    # Filter sprite files to only include those used in items.csv
-    filtered_sprite_files = []
-    for sprite_file in sprite_files:
-        sprite_name = sprite_file.stem
+    # Filter sprites to only include those used in items.csv
+    filtered_sprites = []
+    for sprite_name, sprite_image in sprites:
         if SET_THIS_TO_FALSE_TO_GET_ALL_ITEMS and sprite_name not in allowed_sprite_names:
             continue
         print(f"Adding sprite: {sprite_name}")
-        filtered_sprite_files.append(sprite_file)
+        filtered_sprites.append((sprite_name, sprite_image))
 
     # Add debug tile
     debug_tile = create_debug_tile()
     debug_tile_path = OUTPUT_DIR / "debug.png"
-    debug_tile.save(debug_tile_path, 'PNG')
-    filtered_sprite_files.append(debug_tile_path)
-
-    atlas_width, atlas_height, sprites_per_row = calculate_optimal_atlas_size(len(filtered_sprite_files))
+    save_shared_image(debug_tile, debug_tile_path)
+    filtered_sprites.append(("debug", debug_tile))
 
-    print(f"Creating item atlas with {len(filtered_sprite_files)} sprites")
-    print(f"Atlas dimensions: {atlas_width}x{atlas_height} ({sprites_per_row} sprites per row)")
-
-    atlas = Image.new('RGBA', (atlas_width, atlas_height), (0, 0, 0, 0))
-    coordinates = {}
-
-    for i, sprite_file in enumerate(filtered_sprite_files):
-        sprite_image = Image.open(sprite_file).convert('RGBA')
-        x = (i % sprites_per_row) * SPRITE_WIDTH
-        y = (i // sprites_per_row) * SPRITE_HEIGHT
-        atlas.paste(sprite_image, (x, y))
-        sprite_name = sprite_file.stem
-        coordinates[sprite_name] = [x, y]
-
-    # Add watermark
-    draw = ImageDraw.Draw(atlas)
-    font = ImageFont.load_default()
-    text = WATERMARK
-    try:
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    except AttributeError:
-        text_w, text_h = font.getsize(text)
-    margin = 4
-    x = atlas_width - text_w - margin
-    y = atlas_height - text_h - margin
-    for dx in [-1, 0, 1]:
-        for dy in [-1, 0, 1]:
-            if dx or dy:
-                draw.text((x+dx, y+dy), text, font=font, fill=(0,0,0,255))
-    draw.text((x, y), text, font=font, fill=(255,255,255,255))
+    print(f"Creating item atlas with {len(filtered_sprites)} sprites")
+    cell_size = (SPRITE_WIDTH, SPRITE_HEIGHT)
+    trims = None
+    if trim:
+        filtered_sprites, trims = trim_sprites(filtered_sprites)
+        cell_size = TRIM_CELL_SIZE
 
     atlas_path = OUTPUT_DIR / "item_sprites.png"
-    atlas.save(atlas_path, 'PNG')
+    json_path = OUTPUT_DIR / "item_sprites.json"
+    try:
+        page_paths, coordinates, sprite_pages = compose_atlas_files(
+            filtered_sprites, atlas_path, json_path, cell_size, WATERMARK, packing, indexed, repack)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return False
+
+    index_path = OUTPUT_DIR / "item_sprites.bin"
+    write_atlas_data(json_path, index_path, {"spriteSize": SPRITE_WIDTH}, coordinates, sprite_pages, page_paths,
+                     cell_size, (SPRITE_WIDTH, SPRITE_HEIGHT), trims)
+
+    tileset_path = OUTPUT_DIR / "item_sprites.tres"
+    write_tileset(tileset_path, atlas_path, (SPRITE_WIDTH, SPRITE_HEIGHT),
+                  get_tileset_sources(coordinates, trims, sprite_pages, page_paths))
+
+    print(f"Created atlas at {', '.join(str(page_path) for page_path in page_paths)}")
+    print(f"Created coordinate data at {json_path} and {index_path}")
+    print(f"Created tileset at {tileset_path}")
+    return True
 
-    json_data = {
-        "spriteSize": SPRITE_WIDTH,
-        "sprites": coordinates
+def get_build_settings(packing, trim, indexed, encoding):
+    """Settings that affect the generated atlas, recorded in the build manifest."""
+    return {
+        "packing": packing,
+        "indexed": indexed,
+        "encoding": encoding,
+        "trim": trim,
+        "TILE_SIZE": TILE_SIZE,
+        "TRANSPARENCY_THRESHOLD": TRANSPARENCY_THRESHOLD,
+        "SET_THIS_TO_FALSE_TO_GET_ALL_ITEMS": SET_THIS_TO_FALSE_TO_GET_ALL_ITEMS,
+        "SPRITE_WIDTH": SPRITE_WIDTH,
+        "SPRITE_HEIGHT": SPRITE_HEIGHT,
+        "WATERMARK": WATERMARK,
     }
-    json_path = OUTPUT_DIR / "item_sprites.json"
-    with open(json_path, 'w') as f:
-        json.dump(json_data, f, indent=2)
 
-    print(f"Created atlas at {atlas_path}")
-    print(f"Created coordinate data at {json_path}")
-    return True
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Process DawnLike item tilesets into a sprite atlas.")
+    add_pipeline_arguments(parser)
+    return parser.parse_args()
 
-def main():
-    """Main function to process all item PNGs."""
-    print("DawnLike Item Tile Processor")
-    print("=" * 40)
+def get_watch_paths():
+    """Files and directories whose changes trigger a rebuild in watch mode."""
+    return [ITEMS_DIR, ITEMS_CSV]
 
-    # Change to project root directory
-    change_to_project_root()
-    print()
+def get_build_outputs():
+    """Files a build writes, including the extra atlas pages currently on disk."""
+    atlas_path = OUTPUT_DIR / "item_sprites.png"
+    return [atlas_path, *extra_page_paths(atlas_path), OUTPUT_DIR / "item_sprites.json",
+            OUTPUT_DIR / "item_sprites.bin", OUTPUT_DIR / "item_sprites.tres", OUTPUT_DIR / "debug.png"]
 
+def build(args):
+    """Build the item atlas. Returns False if the build failed."""
     # Check if items directory exists
     if not ITEMS_DIR.exists():
         print(f"Error: DawnLike Items directory not found: {ITEMS_DIR}")
@@ -277,7 +233,7 @@ def main():
         print("Please follow the setup instructions in the main project README.md")
         print("to download and install the DawnLike tileset.")
         print()
-        sys.exit(1)
+        return False
 
     # Create output directory
     ensure_output_directory()
@@ -287,44 +243,84 @@ def main():
 
     if not png_files:
         print("No PNG files found in Items directory")
-        return
+        return True
 
-    print(f"Found {len(png_files)} PNG files to process")
+    print(f"Found {len(png_files)} PNG files")
     print()
 
-    # Create temporary directory and process files
-    with tempfile.TemporaryDirectory() as temp_dir_str:
-        temp_dir = Path(temp_dir_str)
-        print(f"Using temporary directory: {temp_dir}")
-        print()
+    # Skip the whole run if no input, setting or output changed since the last build
+    build_inputs = png_files + [ITEMS_CSV] + generator_sources(__file__)
+    packing = packing_options(args)
+    build_settings = get_build_settings(packing, args.trim, args.indexed, args.encoding)
+    set_encoding_profile(args.encoding)
+    use_sheet_cache(None if args.no_cache else CACHE_DIR)
+    if is_up_to_date("items", build_inputs, build_settings, get_build_outputs(), args.force or args.repack):
+        return True
+    print()
+
+    cache_dir = None if args.no_cache else CACHE_DIR
+
+    # Only crop the cells items.csv references, unless extracting everything
+    allowed_sprite_names = read_allowed_sprite_names_from_csv()
+    if SET_THIS_TO_FALSE_TO_GET_ALL_ITEMS:
+        tasks = plan_item_tasks(png_files, allowed_sprite_names, cache_dir)
+    else:
+        tasks = [(png_file, None, cache_dir) for png_file in sorted(png_files)]
 
-        # Process each PNG file
-        total_processed = 0
-        for png_file in sorted(png_files):
-            process_item_png(png_file, temp_dir)
-            total_processed += 1
-            print()
+    print(f"Extracting with {resolve_jobs(args.jobs)} job(s)")
+    print()
 
-        print(f"Processing complete! Processed {total_processed} files.")
-        print(f"Individual tiles saved to: {temp_dir.absolute()}")
+    # Process each PNG file, keeping extracted tiles in memory
+    tiles = {}
+    total_processed = 0
+    for sheet_tiles in run_jobs(process_item_sheet, tasks, args.jobs):
+        tiles.update(sheet_tiles)
+        total_processed += 1
         print()
 
-        # Generate atlas from extracted tiles
-        print("Generating sprite atlas...")
-        sprite_files = collect_item_sprites(temp_dir)
-
-        if sprite_files:
-            success = create_atlas(sprite_files)
-            if success:
-                print("Atlas generation complete!")
-                print("Temporary files cleaned up.")
-            else:
-                print("Atlas generation failed!")
-                sys.exit(1)
+    print(f"Processing complete! Processed {total_processed} files.")
+    print(f"Extracted {len(tiles)} tiles")
+    print()
+
+    # Generate atlas from extracted tiles
+    print("Generating sprite atlas...")
+    sprites = collect_item_sprites(tiles)
+
+    if sprites:
+        success = create_atlas(sprites, allowed_sprite_names, packing, args.trim, args.indexed, args.repack)
+        if success:
+            record_stage("items", build_inputs, build_settings, get_build_outputs())
+            report_output_changes()
+            print("Atlas generation complete!")
         else:
-            print("No sprites found for atlas generation")
+            print("Atlas generation failed!")
+            return False
+    else:
+        print("No sprites found for atlas generation")
+    return True
+
+def main():
+    """Main function to process all item PNGs."""
+    args = parse_args()
+
+    print("DawnLike Item Tile Processor")
+    print("=" * 40)
+
+    # Change to project root directory
+    change_to_project_root()
+    start_profiling(args)
+    print()
+
+    with profile_stage("items"):
+        success = build(args)
+    report_profile()
+    if not success and not args.watch:
+        sys.exit(1)
 
-    # Temporary directory is automatically cleaned up here
+    if args.watch:
+        args.force = False
+        args.jobs = 1  # Extract in this process so decoded sheets stay resident
+        watch([("items", get_watch_paths(), lambda: build(args))])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
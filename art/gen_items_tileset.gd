@@ -30,32 +30,42 @@ func _run() -> void:
 		printerr("Failed to parse JSON data")
 		return
 
+	# Each page of a multi-page atlas needs its own source, which gen_items.py writes itself
+	if json.has("pages"):
+		printerr("Item atlas has several pages; use the TileSet gen_items.py writes")
+		return
+
 	var sprite_size := json.spriteSize as int
 
 	# Create the tileset resource
 	var tileset := TileSet.new()
 	tileset.tile_size = Vector2i(sprite_size, sprite_size)
 
-	# Create the atlas source
-	var atlas_source := TileSetAtlasSource.new()
-	atlas_source.texture = atlas_texture
-	atlas_source.texture_region_size = Vector2i(sprite_size, sprite_size)
-
-	# Add each sprite from the JSON coordinates
-	for sprite_name: String in json.sprites:
-		var coords := json.sprites[sprite_name] as Array
-		var atlas_coords := Vector2i(
-			int((coords[0] as float) / float(sprite_size)),
-			int((coords[1] as float) / float(sprite_size))
-		)
+	# Trimmed atlases have no tile grid, see _add_trimmed_sources
+	var trims := json.get("trim", {}) as Dictionary
+	if not trims.is_empty():
+		_add_trimmed_sources(tileset, atlas_texture, json.sprites as Dictionary, trims, sprite_size)
+	else:
+		# Create the atlas source
+		var atlas_source := TileSetAtlasSource.new()
+		atlas_source.texture = atlas_texture
+		atlas_source.texture_region_size = Vector2i(sprite_size, sprite_size)
 
-		# Create the tile at the atlas coordinates
-		if not atlas_source.has_tile(atlas_coords):
-			atlas_source.create_tile(atlas_coords)
+		# Add each sprite from the JSON coordinates
+		for sprite_name: String in json.sprites:
+			var coords := json.sprites[sprite_name] as Array
+			var atlas_coords := Vector2i(
+				int((coords[0] as float) / float(sprite_size)),
+				int((coords[1] as float) / float(sprite_size))
+			)
 
-	# Add the atlas source to the tileset
-	var source_id := 0  # First source
-	tileset.add_source(atlas_source, source_id)
+			# Create the tile at the atlas coordinates
+			if not atlas_source.has_tile(atlas_coords):
+				atlas_source.create_tile(atlas_coords)
+
+		# Add the atlas source to the tileset
+		var source_id := 0  # First source
+		tileset.add_source(atlas_source, source_id)
 
 	# Save the tileset resource
 	var err := ResourceSaver.save(tileset, OUTPUT_PATH)
@@ -64,5 +74,35 @@ func _run() -> void:
 		return
 
 	print("Successfully generated item tileset at ", OUTPUT_PATH)
-	print("Tileset contains ", atlas_source.get_tiles_count(), " tiles")
+	print("Tileset contains ", tileset.get_source_count(), " sources")
 	print("Tile size: ", tileset.tile_size)
+
+
+# Give every sprite of a trimmed atlas its own source, in JSON order like ItemTiles.get_source_id.
+# The source texture is an AtlasTexture whose margin pads the trimmed pixels back out to a
+# full sprite, so the single tile at (0, 0) draws exactly like an untrimmed one.
+func _add_trimmed_sources(
+	tileset: TileSet,
+	atlas_texture: Texture2D,
+	sprites: Dictionary,
+	trims: Dictionary,
+	sprite_size: int
+) -> void:
+	var source_id := 0
+	for sprite_name: String in sprites:
+		var coords := sprites[sprite_name] as Array
+		var trim := trims[sprite_name] as Array
+
+		var sprite_texture := AtlasTexture.new()
+		sprite_texture.atlas = atlas_texture
+		sprite_texture.region = Rect2(coords[0], coords[1], trim[2], trim[3])
+		sprite_texture.margin = Rect2(
+			trim[0], trim[1], sprite_size - (trim[2] as int), sprite_size - (trim[3] as int)
+		)
+
+		var sprite_source := TileSetAtlasSource.new()
+		sprite_source.texture = sprite_texture
+		sprite_source.texture_region_size = Vector2i(sprite_size, sprite_size)
+		sprite_source.create_tile(Vector2i.ZERO)
+		tileset.add_source(sprite_source, source_id)
+		source_id += 1
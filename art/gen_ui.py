@@ -3,9 +3,16 @@
 Script to copy and watermark the DawnLike GUI0.png tileset as ui.png for use in the game.
 Places a watermark in the lower right corner, matching the style of the world tileset atlas.
 """
-import os
+import sys
+import argparse
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
+from profiling import profile_stage, report_profile, start_profiling
+from pipeline import add_pipeline_arguments, change_to_project_root, watch
+from manifest import generator_sources, is_up_to_date, record_stage
+from watermark import draw_watermark
+from outputs import report_output_changes, save_atlas_image, set_encoding_profile
+from sheets import load_sheet
 
 SRC_IMAGE = Path("art/DawnLike/GUI/GUI0.png")
 DST_IMAGE = Path("assets/generated/ui.png")
@@ -15,67 +22,75 @@ MARGIN = 4
 TARGET_SIZE = (512, 512)
 
 
-def find_project_root():
-    """Find the project root directory by looking for project.godot file."""
-    current_dir = Path.cwd()
-
-    # Check current directory and parent directories
-    for path in [current_dir] + list(current_dir.parents):
-        if (path / "project.godot").exists():
-            return path
-
-    # If not found, assume current directory is project root
-    print("Warning: Could not find project.godot file. Using current directory as project root.")
-    return current_dir
-
-def change_to_project_root():
-    """Change to the project root directory."""
-    project_root = find_project_root()
-    os.chdir(project_root)
-    print(f"Changed to project root: {project_root}")
-    return project_root
-
-def add_watermark(image: Image.Image, text: str) -> Image.Image:
-    draw = ImageDraw.Draw(image)
-    font = ImageFont.load_default()
-    try:
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    except AttributeError:
-        text_w, text_h = font.getsize(text)
-    x = image.width - text_w - MARGIN
-    y = image.height - text_h - MARGIN
-    # Draw black outline
-    for dx in [-1, 0, 1]:
-        for dy in [-1, 0, 1]:
-            if dx or dy:
-                draw.text((x+dx, y+dy), text, font=font, fill=(0,0,0,255))
-    # Draw white text
-    draw.text((x, y), text, font=font, fill=(255,255,255,255))
-    return image
+def get_build_settings(indexed, encoding):
+    """Settings that affect the generated image, recorded in the build manifest."""
+    return {
+        "indexed": indexed,
+        "encoding": encoding,
+        "WATERMARK": WATERMARK,
+        "MARGIN": MARGIN,
+        "TARGET_SIZE": list(TARGET_SIZE),
+    }
 
-def main():
-    print("DawnLike GUI Processor")
-    print("=" * 40)
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Copy and watermark the DawnLike GUI tileset.")
+    add_pipeline_arguments(parser, extraction=False)
+    return parser.parse_args()
 
-    # Change to project root directory
-    change_to_project_root()
-    print()
+def get_watch_paths():
+    """Files whose changes trigger a rebuild in watch mode."""
+    return [SRC_IMAGE]
 
+def build(args):
+    """Build ui.png. Returns False if the build failed."""
     if not SRC_IMAGE.exists():
         print(f"Source image not found: {SRC_IMAGE}")
-        return
+        return True
+
+    # Skip the run if no input, setting or output changed since the last build
+    build_inputs = [SRC_IMAGE] + generator_sources(__file__)
+    build_settings = get_build_settings(args.indexed, args.encoding)
+    set_encoding_profile(args.encoding)
+    build_outputs = [DST_IMAGE]
+    if is_up_to_date("ui", build_inputs, build_settings, build_outputs, args.force):
+        return True
+
     DST_IMAGE.parent.mkdir(parents=True, exist_ok=True)
-    img = Image.open(SRC_IMAGE).convert("RGBA")
+    img = load_sheet(SRC_IMAGE)
 
     # Create new canvas and paste original image 1:1 in upper left
     print(f"Creating {TARGET_SIZE} canvas with original image {img.size} in upper left")
     canvas = Image.new('RGBA', TARGET_SIZE, (0, 0, 0, 0))
     canvas.paste(img, (0, 0))
 
-    canvas = add_watermark(canvas, WATERMARK)
-    canvas.save(DST_IMAGE)
+    canvas = draw_watermark(canvas, WATERMARK, MARGIN, antialias=not args.indexed)
+    save_atlas_image(canvas, DST_IMAGE, args.indexed)
+    record_stage("ui", build_inputs, build_settings, build_outputs)
     print(f"Copied and watermarked: {DST_IMAGE}")
+    report_output_changes()
+    return True
+
+def main():
+    args = parse_args()
+
+    print("DawnLike GUI Processor")
+    print("=" * 40)
+
+    # Change to project root directory
+    change_to_project_root()
+    start_profiling(args)
+    print()
+
+    with profile_stage("ui"):
+        success = build(args)
+    report_profile()
+    if not success and not args.watch:
+        sys.exit(1)
+
+    if args.watch:
+        args.force = False
+        watch([("ui", get_watch_paths(), lambda: build(args))])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
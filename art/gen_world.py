@@ -4,16 +4,22 @@ Script to process DawnLike world tilesets into individual sprite files.
 Each PNG contains 16x16 tiles arranged in a grid.
 """
 
-import os
 import sys
-import json
-import tempfile
+import argparse
 import shutil
 from pathlib import Path
 from PIL import Image
+from sheets import load_sheet, coverage_grid, use_sheet_cache
+from sprite_cache import CACHE_DIR
+from profiling import profile_stage, report_profile, start_profiling
+from pipeline import add_pipeline_arguments, change_to_project_root, resolve_jobs, run_jobs, watch
+from manifest import generator_sources, is_up_to_date, record_stage
+from atlas import compose_atlas_files, packing_options, write_atlas_data
+from outputs import extra_page_paths, report_output_changes, save_shared_image, set_encoding_profile
+from tileset_resource import grid_sources, write_tileset
+from tile_references import build_reference_index, reference_digest, reference_files
 import re
 from collections import defaultdict
-from PIL import ImageDraw, ImageFont
 
 # Configuration
 TILE_SIZE = 16
@@ -30,49 +36,32 @@ SPRITE_HEIGHT = 16
 
 WATERMARK = "DawnLike tiles by DawnBringer"
 
-def find_project_root():
-    """Find the project root directory by looking for project.godot file."""
-    current_dir = Path.cwd()
-
-    # Check current directory and parent directories
-    for path in [current_dir] + list(current_dir.parents):
-        if (path / "project.godot").exists():
-            return path
-
-    # If not found, assume current directory is project root
-    print("Warning: Could not find project.godot file. Using current directory as project root.")
-    return current_dir
-
-def change_to_project_root():
-    """Change to the project root directory."""
-    project_root = find_project_root()
-    os.chdir(project_root)
-    print(f"Changed to project root: {project_root}")
-    return project_root
-
-def extract_used_tile_names():
-    """Extract tile names from map_renderer.gd by finding StringName references like &"tile-name"."""
-    map_renderer_path = Path("src/map_renderer.gd")
-    used_tile_names = set()
-
-    if not map_renderer_path.exists():
-        print(f"Warning: {map_renderer_path} not found. Using all tiles.")
-        return None
+# Floor and Wall pieces are named <type>-<block>-<connectivity>, with blocks counted from 1
+AUTOTILE_TYPES = ("floor", "wall")
+AUTOTILE_NAME_PATTERN = re.compile(r"^(floor|wall)-([1-9][0-9]*)-([a-z]+)$")
+# Referring to a whole block (&"wall-5") keeps every piece of it, for the autotile tables
+AUTOTILE_BLOCK_PATTERN = re.compile(r"^(floor|wall)-([1-9][0-9]*)$")
 
-    # Regex pattern to match StringName references like &"tile-name"
-    pattern = r'&"([^"]+)"'
+# Autotile tables are indexed by a neighbor mask with bit i set for a neighbor in AUTOTILE_DIRECTIONS[i]
+AUTOTILE_DIRECTIONS = "nsew"
+# A piece the block doesn't have is replaced by the straight piece on the same axis,
+# then by the lone piece, then by the fully connected one, and finally by the debug tile
+AUTOTILE_FALLBACKS = {"n": "ns", "s": "ns", "e": "ew", "w": "ew"}
 
-    with open(map_renderer_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-        matches = re.findall(pattern, content)
-        used_tile_names.update(matches)
+def extract_used_tile_names(jobs=1, use_cache=True):
+    """
+    Find the StringName references like &"tile-name" in every script, scene and resource.
+    Returns {name: [files referring to it]}, or None to use all tiles when there are no such files.
+    """
+    reference_index = build_reference_index(jobs, use_cache, exclude=[OUTPUT_DIR])
+    if not reference_index:
+        print("Warning: No StringName references found in the project. Using all tiles.")
+        return None
+    reference_index = expand_autotile_blocks(reference_index)
 
-    print(f"Found {len(used_tile_names)} used tile names in map_renderer.gd:")
-    for tile_name in sorted(used_tile_names):
-        print(f"  {tile_name}")
+    print(f"Found {len(reference_index)} referenced names")
     print()
-
-    return used_tile_names
+    return reference_index
 
 def get_pattern_map_for_tile_type(tile_type):
     """Get the pattern mapping for a given tile type."""
@@ -102,37 +91,84 @@ def get_pattern_map_for_tile_type(tile_type):
         }
     return {}
 
+def expand_autotile_blocks(reference_index):
+    """Add every piece of the Floor/Wall blocks referred to by name, like &"wall-5", to the index."""
+    expanded = dict(reference_index)
+    for tile_name, files in reference_index.items():
+        match = AUTOTILE_BLOCK_PATTERN.match(tile_name)
+        if match is None:
+            continue
+        for pattern in get_pattern_map_for_tile_type(match.group(1)).values():
+            piece_files = expanded.get(f"{tile_name}-{pattern}", [])
+            expanded[f"{tile_name}-{pattern}"] = sorted(set(piece_files) | set(files))
+    return dict(sorted(expanded.items()))
+
+def autotile_pattern(mask):
+    """Connectivity pattern name for a neighbor mask, e.g. 0b0101 -> "ne"."""
+    directions = "".join(direction for bit, direction in enumerate(AUTOTILE_DIRECTIONS) if mask & (1 << bit))
+    return directions or "lone"
+
+def build_autotile_tables(sprite_names):
+    """
+    Map every Floor/Wall block in the atlas to the 16 sprite names its neighbor masks use.
+    Returns {"wall-5": [name for mask 0, ..., name for mask 15]}, sorted by type and block.
+    """
+    blocks = set()
+    for sprite_name in sprite_names:
+        match = AUTOTILE_NAME_PATTERN.match(sprite_name)
+        if match is not None:
+            blocks.add((match.group(1), int(match.group(2))))
+
+    tables = {}
+    for tile_type, block in sorted(blocks):
+        block_name = f"{tile_type}-{block}"
+        table = []
+        for mask in range(1 << len(AUTOTILE_DIRECTIONS)):
+            pattern = autotile_pattern(mask)
+            candidates = [pattern, AUTOTILE_FALLBACKS.get(pattern), "lone", "nsew"]
+            names = [f"{block_name}-{candidate}" for candidate in candidates if candidate is not None]
+            table.append(next((name for name in names if name in sprite_names), "debug"))
+        tables[block_name] = table
+    return tables
+
+def index_autotile_pieces(used_tile_names):
+    """
+    Parse the used Floor/Wall names once into {(tile_type, block_idx): {(col, row): pattern}},
+    so extraction visits only the referenced cells instead of probing every block.
+    Names that aren't a piece of the 7x3 layout are ignored.
+    """
+    cells_by_pattern = {}
+    for tile_type in AUTOTILE_TYPES:
+        pattern_map = get_pattern_map_for_tile_type(tile_type)
+        cells_by_pattern[tile_type] = {pattern: cell for cell, pattern in pattern_map.items()}
+
+    pieces = defaultdict(dict)
+    for tile_name in used_tile_names:
+        match = AUTOTILE_NAME_PATTERN.match(tile_name)
+        if match is None:
+            continue
+        tile_type, block, pattern = match.groups()
+        cell = cells_by_pattern[tile_type].get(pattern)
+        if cell is not None:
+            pieces[(tile_type, int(block) - 1)][cell] = pattern
+    return dict(pieces)
+
 def ensure_output_directory():
     """Create output directory if it doesn't exist."""
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     print(f"Using output directory: {OUTPUT_DIR}")
 
-def is_tile_transparent(image_tile):
+def process_ground_png(png_path):
     """
-    Check if a tile is mostly transparent.
-    Returns True if the tile should be skipped.
+    Process Ground0.png file - extract all tiles as individual sprites.
+    Returns a dict of sprite name to tile image.
     """
-    # Convert to RGBA if not already
-    if image_tile.mode != 'RGBA':
-        image_tile = image_tile.convert('RGBA')
-
-    # Count non-transparent pixels
-    pixels = list(image_tile.getdata())
-    non_transparent_count = sum(1 for pixel in pixels if pixel[3] > 0)
-
-    # Calculate percentage of non-transparent pixels
-    total_pixels = len(pixels)
-    non_transparent_ratio = non_transparent_count / total_pixels
-
-    return non_transparent_ratio < TRANSPARENCY_THRESHOLD
-
-def process_ground_png(png_path, temp_dir):
-    """Process Ground0.png file - extract all tiles as individual sprites."""
     print(f"Processing ground tiles: {png_path}")
+    tiles = {}
 
     try:
         # Load the image
-        image = Image.open(png_path)
+        image = load_sheet(png_path)
 
         # Calculate grid dimensions
         width, height = image.size
@@ -141,6 +177,9 @@ def process_ground_png(png_path, temp_dir):
 
         print(f"  Image size: {width}x{height}, Grid: {cols}x{rows}")
 
+        # Classify every tile in one pass over the alpha channel
+        coverage = coverage_grid(image, TILE_SIZE)
+
         sprite_count = 0
         saved_count = 0
 
@@ -153,23 +192,16 @@ def process_ground_png(png_path, temp_dir):
                 right = left + TILE_SIZE
                 bottom = top + TILE_SIZE
 
-                # Extract tile
-                tile = image.crop((left, top, right, bottom))
-
                 # Check if tile is transparent
-                if is_tile_transparent(tile):
+                if coverage[row][col] < TRANSPARENCY_THRESHOLD:
                     sprite_count += 1
                     continue
 
-                # Save non-transparent tile
-                output_filename = f"ground-{sprite_count}.png"
-                output_path = temp_dir / output_filename
-
-                # Convert to RGBA to ensure proper transparency handling
-                if tile.mode != 'RGBA':
-                    tile = tile.convert('RGBA')
+                # Extract tile
+                tile = image.crop((left, top, right, bottom))
 
-                tile.save(output_path, 'PNG')
+                # Keep non-transparent tile
+                tiles[f"ground-{sprite_count}"] = tile
                 saved_count += 1
                 sprite_count += 1
 
@@ -178,13 +210,20 @@ def process_ground_png(png_path, temp_dir):
     except Exception as e:
         print(f"Error processing {png_path}: {e}")
 
-def process_floor_wall_png(png_path, temp_dir, tile_type, used_tile_names=None):
-    """Process Floor.png or Wall.png file - extract tiles in 7x3 blocks with connectivity patterns."""
+    return tiles
+
+def process_floor_wall_png(png_path, tile_type, autotile_pieces=None):
+    """
+    Process Floor.png or Wall.png file - extract tiles in 7x3 blocks with connectivity patterns.
+    autotile_pieces comes from index_autotile_pieces; without it whole blocks are extracted.
+    Returns a dict of sprite name to tile image.
+    """
     print(f"Processing {tile_type} tiles: {png_path}")
+    tiles = {}
 
     try:
         # Load the image
-        image = Image.open(png_path)
+        image = load_sheet(png_path)
 
         # Calculate grid dimensions
         width, height = image.size
@@ -193,6 +232,9 @@ def process_floor_wall_png(png_path, temp_dir, tile_type, used_tile_names=None):
 
         print(f"  Image size: {width}x{height}, Grid: {cols}x{rows}")
 
+        # Classify every tile in one pass over the alpha channel
+        coverage = coverage_grid(image, TILE_SIZE)
+
         # Skip first 3 rows as requested
         start_row = 3
 
@@ -203,28 +245,13 @@ def process_floor_wall_png(png_path, temp_dir, tile_type, used_tile_names=None):
 
         print(f"  Available blocks: {total_blocks} (skipping first 3 rows)")
 
-        # Determine which blocks to process
-        blocks_to_process = []
-        if used_tile_names is not None:
-            # Only process blocks that contain tiles we actually use
-            for block_idx in range(total_blocks):
-                # Check if any tile in this block is used
-                block_used = False
-                pattern_map = get_pattern_map_for_tile_type(tile_type)
-                for local_row in range(3):
-                    for local_col in range(7):
-                        # Generate the expected tile name for this position
-                        pattern = pattern_map.get((local_col, local_row), "unknown")
-                        if pattern != "unknown" and pattern != "none":
-                            expected_tile_name = f"{tile_type}-{block_idx + 1}-{pattern}"
-                            if expected_tile_name in used_tile_names:
-                                block_used = True
-                                break
-                    if block_used:
-                        break
-
-                if block_used:
-                    blocks_to_process.append(block_idx)
+        # Determine which blocks to process, and which cells of each
+        pattern_map = get_pattern_map_for_tile_type(tile_type)
+        if autotile_pieces is not None:
+            # Only the blocks and cells that hold referenced pieces
+            blocks_to_process = sorted(
+                block_idx for piece_type, block_idx in autotile_pieces
+                if piece_type == tile_type and block_idx < total_blocks)
         elif SET_THIS_TO_FALSE_TO_GET_ALL_TILES:
             blocks_to_process = list(range(min(7, total_blocks)))
         else:
@@ -243,88 +270,51 @@ def process_floor_wall_png(png_path, temp_dir, tile_type, used_tile_names=None):
             block_name = f"{tile_type}-{block_idx + 1}"
             print(f"  Processing block {block_idx + 1}: {block_name}")
 
-            # Extract tiles from this 7x3 block and map to connectivity patterns
-            pattern_tiles = {}
-
-            # Map the 7x3 block to connectivity patterns
-            # Based on common autotile layouts
-            if tile_type == "wall":
-                pattern_map = {
-                    # Row 0
-                    (0, 0): "se", (1, 0): "ew", (2, 0): "sw",
-                    (3, 0): "lone", (4, 0): "sew",
-                    # Row 1
-                    (0, 1): "ns", (1, 1): "n",
-                    (3, 1): "nse", (4, 1): "nsew", (5, 1): "nsw",
-                    # Row 2
-                    (0, 2): "ne", (2, 2): "nw",
-                    (4, 2): "new",
-                }
-            elif tile_type == "floor":
-                pattern_map = {
-                    # Row 0
-                    (0, 0): "se", (1, 0): "sew", (2, 0): "sw",
-                    (3, 0): "s", (5, 0): "lone",
-                    # Row 1
-                    (0, 1): "nse", (1, 1): "nsew", (2, 1): "nsw", (3, 1): "ns",
-                    (4, 1): "e", (5, 1): "ew", (6, 1): "w",
-                    # Row 2
-                    (0, 2): "ne", (1, 2): "new", (2, 2): "nw",
-                    (3, 2): "n",
-                }
-
-            # Extract each tile in the block
-            for local_row in range(3):
-                for local_col in range(7):
-                    # Calculate absolute tile coordinates
-                    abs_row = block_row + local_row
-                    abs_col = block_col + local_col
-
-                    # Skip if outside image bounds
-                    if abs_row >= rows or abs_col >= cols:
-                        continue
-
-                    # Calculate tile coordinates
-                    left = abs_col * TILE_SIZE
-                    top = abs_row * TILE_SIZE
-                    right = left + TILE_SIZE
-                    bottom = top + TILE_SIZE
-
-                    # Extract tile
-                    tile = image.crop((left, top, right, bottom))
-
-                    # Check if tile is transparent
-                    if is_tile_transparent(tile):
-                        continue
-
-                    # Get pattern name for this position
-                    pattern = pattern_map.get((local_col, local_row), "unknown")
-                    if pattern == "none" or pattern == "unknown":
-                        continue
-
-                    # Save tile with pattern name
-                    output_filename = f"{block_name}-{pattern}.png"
-                    output_path = temp_dir / output_filename
-
-                    # Convert to RGBA to ensure proper transparency handling
-                    if tile.mode != 'RGBA':
-                        tile = tile.convert('RGBA')
-
-                    tile.save(output_path, 'PNG')
-                    saved_count += 1
+            if autotile_pieces is not None:
+                block_cells = autotile_pieces[(tile_type, block_idx)]
+            else:
+                block_cells = pattern_map
+
+            # Extract each cell of the block mapped to a connectivity pattern
+            for (local_col, local_row), pattern in sorted(block_cells.items(), key=lambda item: item[0][::-1]):
+                # Calculate absolute tile coordinates
+                abs_row = block_row + local_row
+                abs_col = block_col + local_col
+
+                # Skip if outside image bounds
+                if abs_row >= rows or abs_col >= cols:
+                    continue
+
+                # Check if tile is transparent
+                if coverage[abs_row][abs_col] < TRANSPARENCY_THRESHOLD:
+                    continue
+
+                # Calculate tile coordinates
+                left = abs_col * TILE_SIZE
+                top = abs_row * TILE_SIZE
+
+                # Keep tile with pattern name
+                tiles[f"{block_name}-{pattern}"] = image.crop((left, top, left + TILE_SIZE, top + TILE_SIZE))
+                saved_count += 1
 
         print(f"  Saved {saved_count} {tile_type} tiles")
 
     except Exception as e:
         print(f"Error processing {png_path}: {e}")
 
-def process_decor_png(png_path, temp_dir, used_tile_names=None):
-    """Process Decor0.png file - extract all tiles from rows 4-15."""
+    return tiles
+
+def process_decor_png(png_path, used_tile_names=None):
+    """
+    Process Decor0.png file - extract all tiles from rows 4-15.
+    Returns a dict of sprite name to tile image.
+    """
     print(f"Processing decor tiles: {png_path}")
+    tiles = {}
 
     try:
         # Load the image
-        image = Image.open(png_path)
+        image = load_sheet(png_path)
 
         # Calculate grid dimensions
         width, height = image.size
@@ -333,6 +323,9 @@ def process_decor_png(png_path, temp_dir, used_tile_names=None):
 
         print(f"  Image size: {width}x{height}, Grid: {cols}x{rows}")
 
+        # Classify every tile in one pass over the alpha channel
+        coverage = coverage_grid(image, TILE_SIZE)
+
         # Process rows 4-15 (inclusive)
         start_row = 4
         end_row = min(15, rows - 1)  # Ensure we don't exceed image bounds
@@ -351,29 +344,22 @@ def process_decor_png(png_path, temp_dir, used_tile_names=None):
                 right = left + TILE_SIZE
                 bottom = top + TILE_SIZE
 
-                # Extract tile
-                tile = image.crop((left, top, right, bottom))
-
                 # Check if tile is transparent
-                if is_tile_transparent(tile):
+                if coverage[row][col] < TRANSPARENCY_THRESHOLD:
                     sprite_count += 1
                     continue
 
+                # Extract tile
+                tile = image.crop((left, top, right, bottom))
+
                 # Check if this tile is used
                 expected_tile_name = f"decor-{sprite_count}"
                 if used_tile_names is not None and expected_tile_name not in used_tile_names:
                     sprite_count += 1
                     continue
 
-                # Save non-transparent tile
-                output_filename = f"decor-{sprite_count}.png"
-                output_path = temp_dir / output_filename
-
-                # Convert to RGBA to ensure proper transparency handling
-                if tile.mode != 'RGBA':
-                    tile = tile.convert('RGBA')
-
-                tile.save(output_path, 'PNG')
+                # Keep non-transparent tile
+                tiles[f"decor-{sprite_count}"] = tile
                 saved_count += 1
                 sprite_count += 1
 
@@ -382,13 +368,19 @@ def process_decor_png(png_path, temp_dir, used_tile_names=None):
     except Exception as e:
         print(f"Error processing {png_path}: {e}")
 
-def process_tile_png(png_path, temp_dir, used_tile_names=None):
-    """Process Tile.png file - extract all tiles regardless of SET_THIS_TO_FALSE_TO_GET_ALL_TILES."""
+    return tiles
+
+def process_tile_png(png_path, used_tile_names=None):
+    """
+    Process Tile.png file - extract all tiles regardless of SET_THIS_TO_FALSE_TO_GET_ALL_TILES.
+    Returns a dict of sprite name to tile image.
+    """
     print(f"Processing tile tiles: {png_path}")
+    tiles = {}
 
     try:
         # Load the image
-        image = Image.open(png_path)
+        image = load_sheet(png_path)
 
         # Calculate grid dimensions
         width, height = image.size
@@ -397,6 +389,9 @@ def process_tile_png(png_path, temp_dir, used_tile_names=None):
 
         print(f"  Image size: {width}x{height}, Grid: {cols}x{rows}")
 
+        # Classify every tile in one pass over the alpha channel
+        coverage = coverage_grid(image, TILE_SIZE)
+
         sprite_count = 0
         saved_count = 0
 
@@ -409,29 +404,22 @@ def process_tile_png(png_path, temp_dir, used_tile_names=None):
                 right = left + TILE_SIZE
                 bottom = top + TILE_SIZE
 
-                # Extract tile
-                tile = image.crop((left, top, right, bottom))
-
                 # Check if tile is transparent
-                if is_tile_transparent(tile):
+                if coverage[row][col] < TRANSPARENCY_THRESHOLD:
                     sprite_count += 1
                     continue
 
+                # Extract tile
+                tile = image.crop((left, top, right, bottom))
+
                 # Check if this tile is used
                 expected_tile_name = f"tile-{sprite_count}"
                 if used_tile_names is not None and expected_tile_name not in used_tile_names:
                     sprite_count += 1
                     continue
 
-                # Save non-transparent tile
-                output_filename = f"tile-{sprite_count}.png"
-                output_path = temp_dir / output_filename
-
-                # Convert to RGBA to ensure proper transparency handling
-                if tile.mode != 'RGBA':
-                    tile = tile.convert('RGBA')
-
-                tile.save(output_path, 'PNG')
+                # Keep non-transparent tile
+                tiles[f"tile-{sprite_count}"] = tile
                 saved_count += 1
                 sprite_count += 1
 
@@ -440,13 +428,19 @@ def process_tile_png(png_path, temp_dir, used_tile_names=None):
     except Exception as e:
         print(f"Error processing {png_path}: {e}")
 
-def process_doors_png(png_path, temp_dir, tile_type, used_tile_names=None):
-    """Process Door0.png or Door1.png file - extract all tiles."""
+    return tiles
+
+def process_doors_png(png_path, tile_type, used_tile_names=None):
+    """
+    Process Door0.png or Door1.png file - extract all tiles.
+    Returns a dict of sprite name to tile image.
+    """
     print(f"Processing door tiles: {png_path}")
+    tiles = {}
 
     try:
         # Load the image
-        image = Image.open(png_path)
+        image = load_sheet(png_path)
 
         # Calculate grid dimensions
         width, height = image.size
@@ -455,6 +449,9 @@ def process_doors_png(png_path, temp_dir, tile_type, used_tile_names=None):
 
         print(f"  Image size: {width}x{height}, Grid: {cols}x{rows}")
 
+        # Classify every tile in one pass over the alpha channel
+        coverage = coverage_grid(image, TILE_SIZE)
+
         sprite_count = 0
         saved_count = 0
 
@@ -467,29 +464,22 @@ def process_doors_png(png_path, temp_dir, tile_type, used_tile_names=None):
                 right = left + TILE_SIZE
                 bottom = top + TILE_SIZE
 
-                # Extract tile
-                tile = image.crop((left, top, right, bottom))
-
                 # Check if tile is transparent
-                if is_tile_transparent(tile):
+                if coverage[row][col] < TRANSPARENCY_THRESHOLD:
                     sprite_count += 1
                     continue
 
+                # Extract tile
+                tile = image.crop((left, top, right, bottom))
+
                 # Check if this tile is used
                 expected_tile_name = f"{tile_type}-{sprite_count}"
                 if used_tile_names is not None and expected_tile_name not in used_tile_names:
                     sprite_count += 1
                     continue
 
-                # Save non-transparent tile
-                output_filename = f"{tile_type}-{sprite_count}.png"
-                output_path = temp_dir / output_filename
-
-                # Convert to RGBA to ensure proper transparency handling
-                if tile.mode != 'RGBA':
-                    tile = tile.convert('RGBA')
-
-                tile.save(output_path, 'PNG')
+                # Keep non-transparent tile
+                tiles[f"{tile_type}-{sprite_count}"] = tile
                 saved_count += 1
                 sprite_count += 1
 
@@ -498,118 +488,115 @@ def process_doors_png(png_path, temp_dir, tile_type, used_tile_names=None):
     except Exception as e:
         print(f"Error processing {png_path}: {e}")
 
-def collect_world_sprites(temp_dir):
-    """Collect all sprite files."""
-    sprite_files = list(temp_dir.glob("*.png"))
-    return sorted(sprite_files)
-
-def calculate_optimal_atlas_size(num_sprites):
-    """Calculate the optimal atlas size for the given number of sprites."""
-    import math
-
-    # Calculate how many sprites fit per row
-    # Start with a square-ish layout
-    sprites_per_row = math.ceil(math.sqrt(num_sprites))
-
-    # Calculate required dimensions
-    atlas_width = sprites_per_row * SPRITE_WIDTH
-    atlas_height = math.ceil(num_sprites / sprites_per_row) * SPRITE_HEIGHT
-
-    # Round up to next power of 2 for better GPU compatibility (optional)
-    def next_power_of_2(n):
-        return 1 << (n - 1).bit_length()
-
-    atlas_width = next_power_of_2(atlas_width)
-    atlas_height = next_power_of_2(atlas_height)
+    return tiles
+
+def process_world_file(task):
+    """Process one entry of the world file list with the extractor for its tile type."""
+    file_path, tile_type, used_tile_names, autotile_pieces = task
+
+    with profile_stage("extract", file_path):
+        if tile_type == "ground":
+            return process_ground_png(file_path)
+        elif tile_type == "decor":
+            return process_decor_png(file_path, used_tile_names)
+        elif tile_type == "tile":
+            return process_tile_png(file_path, used_tile_names)
+        elif tile_type == "doors0" or tile_type == "doors1":
+            return process_doors_png(file_path, tile_type, used_tile_names)
+        else:
+            return process_floor_wall_png(file_path, tile_type, autotile_pieces)
 
-    return atlas_width, atlas_height, sprites_per_row
+def collect_world_sprites(tiles):
+    """Collect all extracted sprites as (name, image) pairs sorted by name."""
+    return sorted(tiles.items())
 
 def create_debug_tile():
     tile = Image.new('RGBA', (SPRITE_WIDTH, SPRITE_HEIGHT), (255, 165, 0, 255))  # Orange
     return tile
 
-def create_atlas(sprite_files, used_tile_names=None):
+def create_atlas(sprites, used_tile_names, packing, indexed=False, repack=False):
     """Create the sprite atlas and coordinate JSON."""
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    # Filter sprite files to only include those used in map_renderer.gd
-    filtered_sprite_files = []
-    for sprite_file in sprite_files:
-        sprite_name = sprite_file.stem
-        if used_tile_names is not None and sprite_name not in used_tile_names:
+    # Filter sprites to only include those referenced somewhere in the project
+    filtered_sprites = []
+    for sprite_name, sprite_image in sprites:
+        if used_tile_names is None:
+            print(f"Adding sprite: {sprite_name}")
+        elif sprite_name in used_tile_names:
+            print(f"Adding sprite: {sprite_name} ({', '.join(used_tile_names[sprite_name])})")
+        else:
             continue
-        print(f"Adding sprite: {sprite_name}")
-        filtered_sprite_files.append(sprite_file)
+        filtered_sprites.append((sprite_name, sprite_image))
 
     # Add debug tile
     debug_tile = create_debug_tile()
     debug_tile_path = OUTPUT_DIR / "debug.png"
-    debug_tile.save(debug_tile_path, 'PNG')
-    filtered_sprite_files.append(debug_tile_path)
-
-    atlas_width, atlas_height, sprites_per_row = calculate_optimal_atlas_size(len(filtered_sprite_files))
-
-    print(f"Creating world atlas with {len(filtered_sprite_files)} sprites")
-    print(f"Atlas dimensions: {atlas_width}x{atlas_height} ({sprites_per_row} sprites per row)")
-
-    atlas = Image.new('RGBA', (atlas_width, atlas_height), (0, 0, 0, 0))
-    coordinates = {}
-
-    for i, sprite_file in enumerate(filtered_sprite_files):
-        sprite_image = Image.open(sprite_file).convert('RGBA')
-        x = (i % sprites_per_row) * SPRITE_WIDTH
-        y = (i // sprites_per_row) * SPRITE_HEIGHT
-        atlas.paste(sprite_image, (x, y))
-        sprite_name = sprite_file.stem
-        coordinates[sprite_name] = [x, y]
-
-    # Add watermark
-    draw = ImageDraw.Draw(atlas)
-    font = ImageFont.load_default()
-    text = WATERMARK
-    try:
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    except AttributeError:
-        text_w, text_h = font.getsize(text)
-    margin = 4
-    x = atlas_width - text_w - margin
-    y = atlas_height - text_h - margin
-    # Draw black outline
-    for dx in [-1, 0, 1]:
-        for dy in [-1, 0, 1]:
-            if dx or dy:
-                draw.text((x+dx, y+dy), text, font=font, fill=(0,0,0,255))
-    # Draw white text
-    draw.text((x, y), text, font=font, fill=(255,255,255,255))
+    save_shared_image(debug_tile, debug_tile_path)
+    filtered_sprites.append(("debug", debug_tile))
 
+    print(f"Creating world atlas with {len(filtered_sprites)} sprites")
+    sprite_size = (SPRITE_WIDTH, SPRITE_HEIGHT)
     atlas_path = OUTPUT_DIR / "world_tiles.png"
-    atlas.save(atlas_path, 'PNG')
-
-    json_data = {
-        "tileSize": SPRITE_WIDTH,
-        "sprites": coordinates
-    }
     json_path = OUTPUT_DIR / "world_tiles.json"
-    with open(json_path, 'w') as f:
-        json.dump(json_data, f, indent=2)
-
-    print(f"Created atlas at {atlas_path}")
-    print(f"Created coordinate data at {json_path}")
+    try:
+        page_paths, coordinates, sprite_pages = compose_atlas_files(
+            filtered_sprites, atlas_path, json_path, sprite_size, WATERMARK, packing, indexed, repack)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return False
+
+    # Neighbor mask -> sprite tables for the renderer, resolved here so it needs no string building
+    autotile = build_autotile_tables(coordinates)
+
+    index_path = OUTPUT_DIR / "world_tiles.bin"
+    write_atlas_data(json_path, index_path, {"tileSize": SPRITE_WIDTH}, coordinates, sprite_pages, page_paths,
+                     sprite_size, sprite_size, autotile=autotile)
+
+    # Same TileSet gen_world_tileset.gd builds: one tile per distinct sprite position, with one source per page
+    tileset_path = OUTPUT_DIR / "world_tiles.tres"
+    sources = grid_sources(coordinates, sprite_pages, page_paths, sprite_size)
+    write_tileset(tileset_path, atlas_path, sprite_size, sources)
+
+    print(f"Created atlas at {', '.join(str(page_path) for page_path in page_paths)}")
+    print(f"Created coordinate data at {json_path} and {index_path}")
+    print(f"Created tileset at {tileset_path} with {sum(len(source['tiles']) for source in sources)} tiles")
     return True
 
-def main():
-    """Main function to process all world tile PNGs."""
-    print("DawnLike World Tile Processor")
-    print("=" * 40)
+def get_build_settings(packing, indexed, encoding, used_tile_names):
+    """Settings that affect the generated atlas, recorded in the build manifest."""
+    return {
+        "tile_references": reference_digest(used_tile_names) if used_tile_names is not None else None,
+        "packing": packing,
+        "indexed": indexed,
+        "encoding": encoding,
+        "TILE_SIZE": TILE_SIZE,
+        "TRANSPARENCY_THRESHOLD": TRANSPARENCY_THRESHOLD,
+        "SET_THIS_TO_FALSE_TO_GET_ALL_TILES": SET_THIS_TO_FALSE_TO_GET_ALL_TILES,
+        "SPRITE_WIDTH": SPRITE_WIDTH,
+        "SPRITE_HEIGHT": SPRITE_HEIGHT,
+        "WATERMARK": WATERMARK,
+    }
 
-    # Change to project root directory
-    change_to_project_root()
-    print()
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Process DawnLike world tilesets into a tile atlas.")
+    add_pipeline_arguments(parser)
+    return parser.parse_args()
+
+def get_watch_paths():
+    """Files and directories whose changes trigger a rebuild in watch mode."""
+    # Files that appear after watching started are picked up by the next run
+    return [OBJECTS_DIR, *reference_files(exclude=[OUTPUT_DIR])]
 
-    # Extract used tile names from map_renderer.gd
-    used_tile_names = extract_used_tile_names()
+def get_build_outputs():
+    """Files a build writes, including the extra atlas pages currently on disk."""
+    atlas_path = OUTPUT_DIR / "world_tiles.png"
+    return [atlas_path, *extra_page_paths(atlas_path), OUTPUT_DIR / "world_tiles.json",
+            OUTPUT_DIR / "world_tiles.bin", OUTPUT_DIR / "world_tiles.tres", OUTPUT_DIR / "debug.png"]
 
+def build(args):
+    """Build the world atlas. Returns False if the build failed."""
     # Check if objects directory exists
     if not OBJECTS_DIR.exists():
         print(f"Error: DawnLike Objects directory not found: {OBJECTS_DIR}")
@@ -618,7 +605,7 @@ def main():
         print("Please follow the setup instructions in the main project README.md")
         print("to download and install the DawnLike tileset.")
         print()
-        sys.exit(1)
+        return False
 
     # Create output directory
     ensure_output_directory()
@@ -643,52 +630,82 @@ def main():
     if missing_files:
         print(f"Error: Missing required files: {missing_files}")
         print(f"These files should be in: {OBJECTS_DIR}")
-        sys.exit(1)
+        return False
 
     print(f"Found all required world tile files")
     print()
 
-    # Create temporary directory and process files
-    with tempfile.TemporaryDirectory() as temp_dir_str:
-        temp_dir = Path(temp_dir_str)
-        print(f"Using temporary directory: {temp_dir}")
-        print()
+    # Skip the whole run if no input, setting or output changed since the last build
+    build_inputs = [OBJECTS_DIR / filename for filename, _ in world_files]
+    build_inputs += generator_sources(__file__)
 
-        # Process each world file
-        for filename, tile_type in world_files:
-            file_path = OBJECTS_DIR / filename
-
-            if tile_type == "ground":
-                process_ground_png(file_path, temp_dir)
-            elif tile_type == "decor":
-                process_decor_png(file_path, temp_dir, used_tile_names)
-            elif tile_type == "tile":
-                process_tile_png(file_path, temp_dir, used_tile_names)
-            elif tile_type == "doors0" or tile_type == "doors1":
-                process_doors_png(file_path, temp_dir, tile_type, used_tile_names)
-            else:
-                process_floor_wall_png(file_path, temp_dir, tile_type, used_tile_names)
-            print()
+    # Only the referenced names matter, so edits that don't change them keep the atlas up to date
+    used_tile_names = extract_used_tile_names(args.jobs, not args.no_cache)
+
+    packing = packing_options(args)
+    build_settings = get_build_settings(packing, args.indexed, args.encoding, used_tile_names)
+    set_encoding_profile(args.encoding)
+    use_sheet_cache(None if args.no_cache else CACHE_DIR)
+    if is_up_to_date("world", build_inputs, build_settings, get_build_outputs(), args.force or args.repack):
+        return True
+    print()
+
+    print(f"Extracting with {resolve_jobs(args.jobs)} job(s)")
+    print()
 
-        print("Processing complete!")
+    # Process each world file, keeping extracted tiles in memory
+    used_names = set(used_tile_names) if used_tile_names is not None else None
+    autotile_pieces = index_autotile_pieces(used_names) if used_names is not None else None
+    tasks = [(OBJECTS_DIR / filename, tile_type, used_names, autotile_pieces)
+             for filename, tile_type in world_files]
+    tiles = {}
+    for file_tiles in run_jobs(process_world_file, tasks, args.jobs):
+        tiles.update(file_tiles)
         print()
 
-        # Generate atlas from extracted tiles
-        print("Generating world atlas...")
-        sprite_files = collect_world_sprites(temp_dir)
+    print("Processing complete!")
+    print(f"Extracted {len(tiles)} tiles")
+    print()
 
-        if sprite_files:
-            success = create_atlas(sprite_files, used_tile_names)
-            if success:
-                print("Atlas generation complete!")
-                print("Temporary files cleaned up.")
-            else:
-                print("Atlas generation failed!")
-                sys.exit(1)
+    # Generate atlas from extracted tiles
+    print("Generating world atlas...")
+    sprites = collect_world_sprites(tiles)
+
+    if sprites:
+        success = create_atlas(sprites, used_tile_names, packing, args.indexed, args.repack)
+        if success:
+            record_stage("world", build_inputs, build_settings, get_build_outputs())
+            report_output_changes()
+            print("Atlas generation complete!")
         else:
-            print("No sprites found for atlas generation")
+            print("Atlas generation failed!")
+            return False
+    else:
+        print("No sprites found for atlas generation")
+    return True
+
+def main():
+    """Main function to process all world tile PNGs."""
+    args = parse_args()
+
+    print("DawnLike World Tile Processor")
+    print("=" * 40)
+
+    # Change to project root directory
+    change_to_project_root()
+    start_profiling(args)
+    print()
+
+    with profile_stage("world"):
+        success = build(args)
+    report_profile()
+    if not success and not args.watch:
+        sys.exit(1)
 
-    # Temporary directory is automatically cleaned up here
+    if args.watch:
+        args.force = False
+        args.jobs = 1  # Extract in this process so decoded sheets stay resident
+        watch([("world", get_watch_paths(), lambda: build(args))])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -30,6 +30,11 @@ func _run() -> void:
 		printerr("Failed to parse JSON data")
 		return
 
+	# Each page of a multi-page atlas needs its own source, which gen_world.py writes itself
+	if json.has("pages"):
+		printerr("World atlas has several pages; use the TileSet gen_world.py writes")
+		return
+
 	var tile_size := json.tileSize as int
 
 	# Create the tileset resource
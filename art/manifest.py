@@ -0,0 +1,140 @@
+"""
+Build manifest for the gen_*.py scripts.
+Records content hashes of every input, the script settings and the outputs of each
+generator, so a run can skip itself when nothing it depends on has changed.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from sprite_cache import CACHE_DIR
+
+# Hashes local files like the DawnLike sheets, so it stays next to the other untracked caches
+MANIFEST_PATH = CACHE_DIR / "build_manifest.json"
+MANIFEST_VERSION = 1
+STANDALONE_SCRIPTS = {"benchmark.py"}  # Scripts in art/ that no generator imports
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_files(paths):
+    """Hash every existing file, keyed by its path relative to the project root."""
+    hashes = {}
+    for path in sorted(Path(p) for p in paths):
+        if path.is_file():
+            hashes[path.as_posix()] = hash_file(path)
+    return hashes
+
+def generator_sources(script_file):
+    """
+    List the code a generator's output depends on: the script itself plus the
+    shared helper modules next to it (everything in art/ that isn't a gen_*.py script
+    or the benchmark).
+    """
+    script_path = Path(script_file).resolve()
+    sources = [script_path]
+    for module_path in sorted(script_path.parent.glob("*.py")):
+        if module_path.name.startswith("gen_") or module_path.name in STANDALONE_SCRIPTS:
+            continue
+        if module_path != script_path:
+            sources.append(module_path)
+
+    project_root = Path.cwd().resolve()
+    relative_sources = []
+    for source in sources:
+        try:
+            relative_sources.append(source.relative_to(project_root))
+        except ValueError:
+            relative_sources.append(source)
+    return relative_sources
+
+def load_manifest():
+    """Load the manifest, or return an empty one if it is missing or from another version."""
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION}
+    return manifest
+
+def _diff_hashes(kind, previous, current):
+    """Describe how two {path: hash} dicts differ."""
+    reasons = []
+    for path in sorted(set(previous) | set(current)):
+        if path not in previous:
+            reasons.append(f"{kind} added: {path}")
+        elif path not in current:
+            reasons.append(f"{kind} removed: {path}")
+        elif previous[path] != current[path]:
+            reasons.append(f"{kind} changed: {path}")
+    return reasons
+
+def check_stage(stage, inputs, settings, outputs):
+    """
+    Compare a generator's current inputs and settings with the last recorded build.
+    inputs and outputs are lists of paths, settings a JSON-serializable dict.
+    Returns a list of reasons to rebuild; an empty list means the outputs are up to date.
+    """
+    entry = load_manifest().get(stage)
+    if entry is None:
+        return ["no previous build recorded"]
+
+    reasons = _diff_hashes("input", entry.get("inputs", {}), hash_files(inputs))
+
+    previous_settings = entry.get("settings", {})
+    for key in sorted(set(previous_settings) | set(settings)):
+        if previous_settings.get(key) != settings.get(key):
+            reasons.append(f"setting changed: {key}")
+
+    # Outputs that were deleted or edited by hand need regenerating too
+    recorded_outputs = entry.get("outputs", {})
+    current_outputs = hash_files(outputs)
+    for path in sorted(recorded_outputs):
+        if path not in current_outputs:
+            reasons.append(f"output missing: {path}")
+        elif current_outputs[path] != recorded_outputs[path]:
+            reasons.append(f"output modified: {path}")
+    if not recorded_outputs:
+        reasons.append("no outputs recorded")
+
+    return reasons
+
+def record_stage(stage, inputs, settings, outputs):
+    """Store the hashes of a finished build so the next run can compare against them."""
+    manifest = load_manifest()
+    manifest[stage] = {
+        "inputs": hash_files(inputs),
+        "settings": settings,
+        "outputs": hash_files(outputs),
+    }
+
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = MANIFEST_PATH.with_name(MANIFEST_PATH.name + ".tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(temp_path, MANIFEST_PATH)
+
+def is_up_to_date(stage, inputs, settings, outputs, force=False):
+    """Check a stage and print why it needs rebuilding. Returns True if it can be skipped."""
+    if force:
+        print(f"Rebuilding {stage}: --force given")
+        return False
+
+    reasons = check_stage(stage, inputs, settings, outputs)
+    if not reasons:
+        print(f"{stage} is up to date, nothing to do (use --force to rebuild)")
+        return True
+
+    print(f"Rebuilding {stage}:")
+    for reason in reasons:
+        print(f"  {reason}")
+    return False
@@ -0,0 +1,236 @@
+"""
+Output helpers for the gen_*.py scripts.
+Files are written next to their destination under a temporary name and renamed over it,
+so the Godot editor never imports a half-written PNG or JSON. Files that already hold exactly
+the new content are left alone, so their mtime doesn't change and Godot doesn't reimport them.
+PNGs are compressed according to an encoding profile, from fast dev builds to small release builds.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import time
+from pathlib import Path
+from PIL import Image
+from profiling import profile_stage
+
+ENCODING_PROFILES = ("dev", "default", "release", "raw")
+DEFAULT_ENCODING_PROFILE = "default"
+# Pillow options tried per profile; release keeps the smallest result
+PNG_PROFILE_OPTIONS = {
+    "dev": [{"compress_level": 1}],
+    "default": [{}],
+    # compress_type is the zlib strategy: default, filtered, Huffman only, RLE, fixed
+    "release": [{"optimize": True, "compress_type": strategy} for strategy in range(5)],
+    "raw": [{"compress_level": 0}],
+}
+
+_encoding_profile = DEFAULT_ENCODING_PROFILE
+# Outputs written since the last report_output_changes, mapped to "changed", "unchanged" or "removed"
+_output_changes = {}
+
+def set_encoding_profile(profile):
+    """Choose how PNGs are compressed for the rest of the process."""
+    global _encoding_profile
+    if profile not in PNG_PROFILE_OPTIONS:
+        raise ValueError(f"Unknown encoding profile: {profile}")
+    _encoding_profile = profile
+
+@contextlib.contextmanager
+def atomic_output(path):
+    """Yield a temporary path next to path and move it into place if the block succeeds."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Godot skips files starting with a dot, so the temporary file is never imported
+    temp_path = path.with_name(f".{path.name}.tmp")
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+def _content_hash(data):
+    return hashlib.sha256(data).digest()
+
+def write_output(path, data):
+    """
+    Write bytes to path atomically, unless the file already holds exactly these bytes.
+    Returns True if the file was written.
+    """
+    path = Path(path)
+    try:
+        unchanged = path.stat().st_size == len(data) and _content_hash(path.read_bytes()) == _content_hash(data)
+    except OSError:
+        unchanged = False
+    _output_changes[path] = "unchanged" if unchanged else "changed"
+    if unchanged:
+        return False
+    with atomic_output(path) as temp_path:
+        temp_path.write_bytes(data)
+    return True
+
+def report_output_changes():
+    """Print which outputs were rewritten or removed since the last report, and start over."""
+    changed = [path for path, change in _output_changes.items() if change == "changed"]
+    removed = [path for path, change in _output_changes.items() if change == "removed"]
+    unchanged = len(_output_changes) - len(changed) - len(removed)
+    if changed:
+        print(f"Changed outputs: {', '.join(str(path) for path in changed)}")
+    if removed:
+        print(f"Removed outputs: {', '.join(str(path) for path in removed)}")
+    if not changed and not removed:
+        print("No output changed")
+    if unchanged:
+        print(f"Left {unchanged} unchanged output(s) untouched")
+    _output_changes.clear()
+    return changed + removed
+
+def encode_png(image, **params):
+    """Encode an image as PNG bytes with the current encoding profile."""
+    best = None
+    for options in PNG_PROFILE_OPTIONS[_encoding_profile]:
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG', **params, **options)
+        if best is None or buffer.tell() < len(best):
+            best = buffer.getvalue()
+    return best
+
+def save_image(image, path, format='PNG', **params):
+    """Save an image atomically, logging how long the PNG encode took and its size."""
+    if format != 'PNG':
+        with atomic_output(path) as temp_path:
+            image.save(temp_path, format, **params)
+        return
+
+    start = time.perf_counter()
+    with profile_stage("encode"):
+        data = encode_png(image, **params)
+    elapsed = time.perf_counter() - start
+    with profile_stage("write"):
+        written = write_output(path, data)
+    status = "" if written else ", unchanged"
+    print(f"Encoded {path}: {len(data)} bytes in {elapsed * 1000:.1f} ms ({_encoding_profile}{status})")
+    return len(data)
+
+def to_indexed(image):
+    """
+    Convert an RGBA image to a palette image without changing any visible pixel.
+    Fully transparent pixels all share palette index 0, and the palette's alpha values
+    go into the PNG transparency chunk.
+    Returns None when the image has more than 256 distinct colors.
+    """
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+
+    # Give every fully transparent pixel the same color so they count as one entry
+    alpha_mask = image.getchannel('A').point(lambda a: 255 if a > 0 else 0)
+    clean = Image.new('RGBA', image.size, (0, 0, 0, 0))
+    clean.paste(image, (0, 0), alpha_mask)
+
+    colors = clean.getcolors(256)
+    if colors is None:
+        return None
+
+    transparent = (0, 0, 0, 0)
+    palette = [transparent] + sorted(color for _, color in colors if color != transparent)
+
+    # With at most 256 colors, median cut gives every distinct RGB color its own exact entry.
+    # Quantizing to a fixed palette isn't exact: its color cache can pick a close neighbor
+    rgb_colors = sorted({color[:3] for color in palette})
+    rgb_image = clean.convert('RGB').quantize(len(rgb_colors), Image.Quantize.MEDIANCUT,
+                                              dither=Image.Dither.NONE)
+    rgb_palette = rgb_image.getpalette()
+    rgb_index = {tuple(rgb_palette[i * 3:i * 3 + 3]): i for i in range(len(rgb_colors))}
+    rgb_indices = Image.frombytes('L', image.size, rgb_image.tobytes())
+
+    # Colors that share RGB differ in alpha, so map each alpha level's pixels through its own table
+    alpha = clean.getchannel('A')
+    indexed = Image.new('L', image.size, 0)
+    for level in sorted({color[3] for color in palette} - {0}):
+        lookup = [0] * 256
+        for i, color in enumerate(palette):
+            if color[3] == level:
+                lookup[rgb_index[color[:3]]] = i
+        level_mask = alpha.point(lambda a, level=level: 255 if a == level else 0)
+        indexed.paste(rgb_indices.point(lookup), (0, 0), level_mask)
+    indexed = Image.frombytes('P', image.size, indexed.tobytes())
+    indexed.putpalette([channel for color in palette for channel in color[:3]])
+    indexed.info['transparency'] = bytes(color[3] for color in palette)
+    return indexed
+
+def save_atlas_image(image, path, indexed=False):
+    """
+    Save an atlas atomically, as a palette PNG when indexed is set and it has at most
+    256 colors, printing how much smaller it is than the RGBA encoding.
+    """
+    if not indexed:
+        save_image(image, path)
+        return
+
+    palette_image = to_indexed(image)
+    if palette_image is None:
+        print(f"{path} has more than 256 colors, saving it as RGBA")
+        save_image(image, path)
+        return
+
+    rgba_size = len(encode_png(image))
+    indexed_size = save_image(palette_image, path, transparency=palette_image.info['transparency'])
+    print(f"Indexed {path}: {indexed_size} bytes instead of {rgba_size} "
+          f"({1 - indexed_size / rgba_size:.0%} smaller)")
+
+def atlas_page_path(path, page):
+    """Path of an atlas page: page 0 keeps the atlas name, later pages get a _1, _2, ... suffix."""
+    path = Path(path)
+    if page == 0:
+        return path
+    return path.with_name(f"{path.stem}_{page}{path.suffix}")
+
+def extra_page_paths(path):
+    """Pages after the first of an atlas currently on disk, in page order."""
+    path = Path(path)
+    pages = []
+    for page_path in path.parent.glob(f"{path.stem}_*{path.suffix}"):
+        page = page_path.stem[len(path.stem) + 1:]
+        if page.isdigit() and int(page) > 0:
+            pages.append((int(page), page_path))
+    return [page_path for _, page_path in sorted(pages)]
+
+def save_atlas_pages(pages, path, indexed=False):
+    """
+    Save every page of an atlas with save_atlas_image and delete the pages a previous
+    build with more pages left behind. Returns the paths of the pages in order.
+    """
+    paths = [atlas_page_path(path, page) for page in range(len(pages))]
+    for image, page_path in zip(pages, paths):
+        save_atlas_image(image, page_path, indexed)
+
+    for stale_path in extra_page_paths(path):
+        if stale_path not in paths:
+            stale_path.unlink()
+            # Godot would keep trying to import the missing texture
+            Path(f"{stale_path}.import").unlink(missing_ok=True)
+            _output_changes[stale_path] = "removed"
+            print(f"Removed stale atlas page {stale_path}")
+    return paths
+
+def write_json(data, path, indent=2):
+    """Write JSON atomically, leaving the file alone when the text is unchanged."""
+    with profile_stage("write"):
+        return write_output(path, json.dumps(data, indent=indent).encode('utf-8'))
+
+_shared_images = {}
+
+def save_shared_image(image, path):
+    """
+    Save an image that several stages produce, such as debug.png.
+    When an identical image was already written to path by this process, it is not written again.
+    """
+    key = Path(path).resolve()
+    content = (image.mode, image.size, image.tobytes())
+    if _shared_images.get(key) == content and key.exists():
+        return
+    save_image(image, path)
+    _shared_images[key] = content
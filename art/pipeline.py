@@ -0,0 +1,199 @@
+"""
+Shared command line and orchestration helpers for the gen_*.py scripts.
+"""
+
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from sheets import keep_sheets_resident, sheet_cache_dir, use_sheet_cache
+from atlas import HEURISTICS, DEFAULT_HEURISTIC, DEFAULT_MAX_ATLAS_SIZE, DEFAULT_MAX_FRAGMENTATION
+from outputs import ENCODING_PROFILES, DEFAULT_ENCODING_PROFILE
+from profiling import profile_stage, report_profile
+
+WATCH_INTERVAL = 0.5  # Seconds between polls of the watched files
+
+def find_project_root():
+    """Find the project root directory by looking for project.godot file."""
+    current_dir = Path.cwd()
+
+    # Check current directory and parent directories
+    for path in [current_dir] + list(current_dir.parents):
+        if (path / "project.godot").exists():
+            return path
+
+    # If not found, assume current directory is project root
+    print("Warning: Could not find project.godot file. Using current directory as project root.")
+    return current_dir
+
+def change_to_project_root():
+    """Change to the project root directory."""
+    project_root = find_project_root()
+    os.chdir(project_root)
+    print(f"Changed to project root: {project_root}")
+    return project_root
+
+def add_pipeline_arguments(parser, extraction=True):
+    """
+    Add the options every generator understands to an argparse parser.
+    extraction adds the options for scripts that slice sheets into tiles.
+    """
+    parser.add_argument(
+        "-f", "--force", action="store_true",
+        help="Rebuild even if the build manifest says the outputs are up to date")
+    parser.add_argument(
+        "-w", "--watch", action="store_true",
+        help="Keep running and rebuild whenever an input changes")
+    parser.add_argument(
+        "--indexed", action="store_true",
+        help="Save atlases as 8-bit palette PNGs when they have at most 256 colors")
+    parser.add_argument(
+        "--encoding", choices=ENCODING_PROFILES, default=DEFAULT_ENCODING_PROFILE,
+        help="PNG compression: dev (fast), default, release (smallest, slow) "
+             f"or raw (uncompressed) (default: {DEFAULT_ENCODING_PROFILE})")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Record wall time, CPU time and peak memory per stage and sheet, print a summary "
+             "and write a Chrome trace to art/.profile/trace.json")
+    parser.add_argument(
+        "--cprofile", action="append", default=[], metavar="STAGE",
+        help="Also run every STAGE (e.g. extract, pack, encode) under cProfile and save "
+             "art/.profile/STAGE.prof; can be repeated")
+    if extraction:
+        parser.add_argument(
+            "-j", "--jobs", type=int, default=1,
+            help="Number of sheets to extract in parallel (0 = one per CPU core, default: 1)")
+        parser.add_argument(
+            "--no-cache", action="store_true",
+            help="Don't read or write the extracted tile, decoded sheet and tile reference caches in art/.cache")
+        parser.add_argument(
+            "--packer", choices=HEURISTICS, default=DEFAULT_HEURISTIC,
+            help=f"Heuristic for placing sprites in the atlas (default: {DEFAULT_HEURISTIC})")
+        parser.add_argument(
+            "--npot", action="store_true",
+            help="Allow atlas sizes that aren't powers of two")
+        parser.add_argument(
+            "--max-atlas-size", type=int, default=DEFAULT_MAX_ATLAS_SIZE,
+            help="Largest allowed atlas page width and height; sprites that don't fit "
+                 f"spill into further pages (default: {DEFAULT_MAX_ATLAS_SIZE})")
+        parser.add_argument(
+            "--repack", action="store_true",
+            help="Pack the atlas from scratch instead of keeping sprites where the previous build put them "
+                 "(implies --force)")
+        parser.add_argument(
+            "--max-fragmentation", type=float, default=DEFAULT_MAX_FRAGMENTATION,
+            help="Repack from scratch when keeping the previous layout needs more than this fraction of "
+                 f"extra atlas area (default: {DEFAULT_MAX_FRAGMENTATION})")
+        parser.add_argument(
+            "--trim", action="store_true",
+            help="Crop character and item sprites to their opaque area before packing")
+        parser.add_argument(
+            "--low-memory", action="store_true",
+            help="Create each double-width character sprite only while it is measured and pasted, "
+                 "instead of keeping them all until the atlas is composed (slower, same output)")
+    return parser
+
+def resolve_jobs(jobs):
+    """Turn a --jobs value into a worker count."""
+    if jobs is None or jobs < 0:
+        return 1
+    if jobs == 0:
+        return os.cpu_count() or 1
+    return jobs
+
+def _run_captured(func, item):
+    """Run func in a worker and hand its printed output back to the parent."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = func(item)
+    return output.getvalue(), result
+
+def run_jobs(func, items, jobs=1):
+    """
+    Yield func(item) for every item, in a process pool when jobs > 1.
+    Results (and anything the workers print) come back in the same order as items,
+    so merging them gives exactly the same output as a serial run.
+    """
+    items = list(items)
+    jobs = min(resolve_jobs(jobs), len(items))
+
+    if jobs <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    # Workers map the same decoded sheet cache as this process
+    with ProcessPoolExecutor(max_workers=jobs, initializer=use_sheet_cache,
+                             initargs=(sheet_cache_dir(),)) as executor:
+        for output, result in executor.map(partial(_run_captured, func), items):
+            print(output, end="")
+            yield result
+
+def snapshot_paths(paths):
+    """Record (mtime, size) for every file among the given files and directories."""
+    snapshot = {}
+    for path in map(Path, paths):
+        files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        for file_path in files:
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            snapshot[file_path.as_posix()] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+def _take_snapshots(stages):
+    return {name: snapshot_paths(paths) for name, paths, _ in stages}
+
+def watch(stages, interval=WATCH_INTERVAL):
+    """
+    Rebuild stages whenever one of their watched files changes, until interrupted.
+    stages is a list of (name, paths, build) where paths are files or directories to
+    watch and build() runs one incremental build, returning False on failure.
+    Decoded sheets stay resident between builds, so only changed sheets are decoded again.
+    """
+    keep_sheets_resident()
+    snapshots = _take_snapshots(stages)
+    watched = sorted({str(path) for _, paths, _ in stages for path in paths})
+    print()
+    print(f"Watching {', '.join(watched)} (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(interval)
+            current = _take_snapshots(stages)
+            if current == snapshots:
+                continue
+
+            # Wait for editors and downloads to finish writing before reading anything
+            while True:
+                time.sleep(interval)
+                settled = _take_snapshots(stages)
+                if settled == current:
+                    break
+                current = settled
+
+            for name, paths, build in stages:
+                if current[name] == snapshots[name]:
+                    continue
+                snapshots[name] = current[name]
+
+                print()
+                print(f"Change detected, rebuilding {name}")
+                start = time.perf_counter()
+                try:
+                    with profile_stage(name):
+                        success = build()
+                except Exception as e:
+                    print(f"Error rebuilding {name}: {e}")
+                    success = False
+                elapsed = time.perf_counter() - start
+                status = "done" if success is not False else "failed"
+                print(f"Rebuild of {name} {status} in {elapsed:.2f}s")
+                report_profile()
+    except KeyboardInterrupt:
+        print()
+        print("Stopped watching")
@@ -0,0 +1,38 @@
+"""
+Plans which sheet cells a filtered build needs, starting from the sprite names
+referenced by the game data (monsters.csv appearance, items.csv sprite).
+Sprite names are "<sheet key>-<cell index>", e.g. "pest-17" or "chest0-16".
+"""
+
+from collections import defaultdict
+
+def parse_sprite_name(sprite_name):
+    """Split a sprite name into its sheet key and cell index, or return None."""
+    key, separator, index = sprite_name.rpartition('-')
+    if not separator or not key or not index.isdigit():
+        return None
+    return key, int(index)
+
+def plan_sheet_cells(sprite_names, sheet_keys):
+    """
+    Turn sprite names into the cells each sheet has to provide.
+    sheet_keys maps every available sheet path to the key its sprites are named with.
+    Returns (plan, unresolved): plan maps sheet paths to sets of cell indices,
+    unresolved lists the names no sheet provides.
+    """
+    paths_by_key = defaultdict(list)
+    for path, key in sheet_keys.items():
+        paths_by_key[key].append(path)
+
+    plan = defaultdict(set)
+    unresolved = []
+    for sprite_name in sorted(sprite_names):
+        parsed = parse_sprite_name(sprite_name)
+        if parsed is None or parsed[0] not in paths_by_key:
+            unresolved.append(sprite_name)
+            continue
+        key, cell_index = parsed
+        for path in paths_by_key[key]:
+            plan[path].add(cell_index)
+
+    return dict(plan), unresolved
@@ -0,0 +1,194 @@
+"""
+Optional instrumentation for the gen_*.py scripts.
+With --profile, every profile_stage block records its wall time, CPU time and peak memory,
+and the run ends with a summary table and a Chrome trace (open it in chrome://tracing or
+ui.perfetto.dev). --cprofile STAGE additionally runs the named stage under cProfile.
+Without --profile, profile_stage costs a single check.
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+PROFILE_DIR = Path("art/.profile")
+TRACE_PATH = PROFILE_DIR / "trace.json"
+SLOWEST_SHEETS = 10
+
+class Profiler:
+    """Collects the stages of a run as complete events for the summary and the trace."""
+
+    def __init__(self, cprofile_stages=()):
+        self.events = []
+        self.stack = []
+        self.origin = time.perf_counter()
+        self.cprofile_stages = set(cprofile_stages)
+        self.cprofiles = {}
+        self.active_cprofile = None
+
+    def _max_rss(self):
+        """High-water mark of the process's resident memory in bytes, or None where unsupported."""
+        if resource is None:
+            return None
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        scale = 1 if os.uname().sysname == "Darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _propagate_peak(self):
+        """Fold the traced peak so far into every open stage before it gets reset."""
+        _, peak = tracemalloc.get_traced_memory()
+        for frame in self.stack:
+            frame["peak"] = max(frame["peak"], peak)
+        return peak
+
+    @contextlib.contextmanager
+    def stage(self, name, sheet=None):
+        self._propagate_peak()
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        frame = {"peak": current}
+        self.stack.append(frame)
+
+        profile = None
+        if name in self.cprofile_stages and self.active_cprofile is None:
+            # cProfile can't nest, so a stage inside another profiled stage is covered by the outer one
+            profile = self.cprofiles.setdefault(name, cProfile.Profile())
+            self.active_cprofile = profile
+            profile.enable()
+
+        start_rss = self._max_rss()
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - start_cpu
+            if profile is not None:
+                profile.disable()
+                self.active_cprofile = None
+            self._propagate_peak()
+            self.stack.pop()
+            max_rss = self._max_rss()
+            self.events.append({
+                "name": name,
+                "sheet": str(sheet) if sheet is not None else None,
+                "start": start - self.origin,
+                "wall": wall,
+                "cpu": cpu,
+                "peak_alloc": frame["peak"] - current,
+                "max_rss": max_rss,
+                "rss_growth": max_rss - start_rss if max_rss is not None else None,
+                "depth": len(self.stack),
+            })
+
+    def write_trace(self, path):
+        """Write the recorded stages in the Chrome trace event format."""
+        pid = os.getpid()
+        trace_events = []
+        for event in sorted(self.events, key=lambda event: event["start"]):
+            args = {key: event[key] for key in ("cpu", "peak_alloc", "max_rss", "rss_growth")}
+            if event["sheet"] is not None:
+                args["sheet"] = event["sheet"]
+            label = event["name"] if event["sheet"] is None else f"{event['name']} {Path(event['sheet']).name}"
+            trace_events.append({
+                "name": label, "cat": event["name"], "ph": "X", "pid": pid, "tid": 0,
+                "ts": event["start"] * 1e6, "dur": event["wall"] * 1e6, "args": args,
+            })
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+    def print_summary(self):
+        """Print totals per stage name, then the slowest sheets."""
+        totals = {}
+        for event in self.events:
+            total = totals.setdefault(event["name"], {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak_alloc": 0})
+            total["calls"] += 1
+            total["wall"] += event["wall"]
+            total["cpu"] += event["cpu"]
+            total["peak_alloc"] = max(total["peak_alloc"], event["peak_alloc"])
+
+        print()
+        print("Profile summary")
+        print("-" * 64)
+        print(f"  {'stage':<20} {'calls':>6} {'wall':>10} {'cpu':>10} {'peak alloc':>12}")
+        for name, total in totals.items():
+            print(f"  {name:<20} {total['calls']:>6} {total['wall']:>9.3f}s {total['cpu']:>9.3f}s "
+                  f"{format_bytes(total['peak_alloc']):>12}")
+
+        sheet_events = sorted((event for event in self.events if event["sheet"] is not None),
+                              key=lambda event: event["wall"], reverse=True)
+        if sheet_events:
+            print()
+            print(f"  {'slowest sheets':<30} {'stage':<10} {'wall':>10} {'cpu':>10} {'peak alloc':>12}")
+            for event in sheet_events[:SLOWEST_SHEETS]:
+                print(f"  {Path(event['sheet']).name:<30} {event['name']:<10} {event['wall']:>9.3f}s "
+                      f"{event['cpu']:>9.3f}s {format_bytes(event['peak_alloc']):>12}")
+
+        max_rss = self._max_rss()
+        if max_rss is not None:
+            print()
+            print(f"  Peak resident memory: {format_bytes(max_rss)} (Pillow's pixel buffers only show up here)")
+
+    def write_cprofiles(self, directory):
+        """Dump every cProfile run to <stage>.prof and print its top functions."""
+        for name, profile in self.cprofiles.items():
+            path = Path(directory) / f"{name}.prof"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profile.dump_stats(path)
+            output = io.StringIO()
+            pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(15)
+            print()
+            print(f"cProfile of {name} (saved to {path}):")
+            print(output.getvalue().rstrip())
+
+_profiler = None
+
+def format_bytes(size):
+    """Human readable byte count."""
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def start_profiling(args):
+    """Start recording stages if --profile or --cprofile was given."""
+    global _profiler
+    if not args.profile and not args.cprofile:
+        return
+    if getattr(args, "jobs", 1) != 1:
+        # Stages that run in worker processes can't be recorded
+        print("Profiling extracts sheets in this process (--jobs 1)")
+        args.jobs = 1
+    tracemalloc.start()
+    _profiler = Profiler(args.cprofile)
+
+def report_profile():
+    """Print the summary, write the trace and cProfile dumps, and start a fresh recording."""
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.print_summary()
+    _profiler.write_trace(TRACE_PATH)
+    _profiler.write_cprofiles(PROFILE_DIR)
+    print(f"Wrote trace to {TRACE_PATH}")
+    _profiler = Profiler(_profiler.cprofile_stages)
+
+def profile_stage(name, sheet=None):
+    """Context manager that records a stage of the build, optionally for one source sheet."""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.stage(name, sheet)
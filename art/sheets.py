@@ -0,0 +1,259 @@
+"""
+Shared helpers for slicing DawnLike sheets into tiles.
+Used by the gen_*.py scripts so every generator classifies tiles the same way.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from pathlib import Path
+from PIL import Image
+from manifest import hash_file
+from profiling import profile_stage
+
+# Decoded sheets are cached as raw RGBA behind a small header, named after the PNG's content hash
+SHEET_CACHE_SUBDIR = "sheets"
+SHEET_CACHE_SUFFIX = ".rgba"
+SHEET_HEADER = struct.Struct("<4sHII")  # magic, version, width, height
+SHEET_MAGIC = b"RGBA"
+SHEET_VERSION = 1
+MAX_SHEET_CACHE_BYTES = 256 * 1024 * 1024  # Delete least recently used sheets above this size
+
+# Decoded sheets and their hashes, kept between builds when running in watch mode
+_keep_resident = False
+_resident_sheets = {}
+_resident_hashes = {}
+_sheet_cache_dir = None
+
+def keep_sheets_resident(enabled=True):
+    """
+    Keep decoded sheets in memory between builds in this process.
+    A resident sheet is only decoded again once its file changes on disk.
+    """
+    global _keep_resident
+    _keep_resident = enabled
+    if not enabled:
+        _resident_sheets.clear()
+        _resident_hashes.clear()
+
+def use_sheet_cache(cache_dir):
+    """
+    Cache decoded sheets under cache_dir, or stop caching them when cache_dir is None.
+    Cached sheets are memory-mapped instead of decoded, so processes loading the same
+    sheet share one copy through the page cache.
+    """
+    global _sheet_cache_dir
+    _sheet_cache_dir = Path(cache_dir) / SHEET_CACHE_SUBDIR if cache_dir is not None else None
+
+def sheet_cache_dir():
+    """The cache directory passed to use_sheet_cache, for handing on to worker processes."""
+    return _sheet_cache_dir.parent if _sheet_cache_dir is not None else None
+
+def _file_stamp(png_path):
+    """Identify a version of a file on disk by its resolved path, mtime and size."""
+    stat = os.stat(png_path)
+    return Path(png_path).resolve(), (stat.st_mtime_ns, stat.st_size)
+
+def _map_cached_sheet(cache_path):
+    """Map a cached sheet as a read-only RGBA image, or return None if it is missing or damaged."""
+    try:
+        with open(cache_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # ValueError: empty file
+        return None
+
+    if len(mapped) < SHEET_HEADER.size:
+        return None
+    magic, version, width, height = SHEET_HEADER.unpack_from(mapped)
+    if magic != SHEET_MAGIC or version != SHEET_VERSION or len(mapped) != SHEET_HEADER.size + width * height * 4:
+        return None
+
+    # Mark the sheet as recently used for eviction
+    os.utime(cache_path)
+    # Shares the mapped pages; Pillow copies the image before anything writes to it
+    return Image.frombuffer('RGBA', (width, height), memoryview(mapped)[SHEET_HEADER.size:], 'raw', 'RGBA', 0, 1)
+
+def _store_cached_sheet(cache_path, image):
+    """Write a decoded sheet to the cache atomically, then trim the cache to its cap."""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # Parallel workers may store the same sheet, so each writes its own temporary file
+    with tempfile.NamedTemporaryFile(dir=cache_path.parent, suffix=".tmp", delete=False) as f:
+        f.write(SHEET_HEADER.pack(SHEET_MAGIC, SHEET_VERSION, image.width, image.height))
+        f.write(image.tobytes())
+    os.replace(f.name, cache_path)
+    _evict_cached_sheets(cache_path.parent, keep=cache_path)
+
+def _evict_cached_sheets(cache_dir, keep):
+    """Delete the least recently used cached sheets until the cache fits MAX_SHEET_CACHE_BYTES."""
+    entries = []
+    for path in cache_dir.glob(f"*{SHEET_CACHE_SUFFIX}"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= MAX_SHEET_CACHE_BYTES:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+
+def _decode_sheet(png_path):
+    with profile_stage("decode", png_path), Image.open(png_path) as image:
+        return image.convert('RGBA')
+
+def _load_uncached_sheet(png_path):
+    """Map the sheet from the decoded sheet cache, decoding and storing it on a miss."""
+    if _sheet_cache_dir is None:
+        return _decode_sheet(png_path)
+
+    cache_path = _sheet_cache_dir / f"{sheet_hash(png_path)}{SHEET_CACHE_SUFFIX}"
+    with profile_stage("map", png_path):
+        image = _map_cached_sheet(cache_path)
+    if image is None:
+        image = _decode_sheet(png_path)
+        try:
+            _store_cached_sheet(cache_path, image)
+        except OSError as e:
+            print(f"Warning: Could not cache decoded sheet {png_path}: {e}")
+    return image
+
+def load_sheet(png_path):
+    """
+    Load a sheet and convert it to RGBA once, so every crop is already RGBA.
+    The returned image may be a read-only mapping of the decoded sheet cache.
+    """
+    if not _keep_resident:
+        return _load_uncached_sheet(png_path)
+
+    path, stamp = _file_stamp(png_path)
+    entry = _resident_sheets.get(path)
+    if entry is None or entry[0] != stamp:
+        entry = (stamp, _load_uncached_sheet(png_path))
+        _resident_sheets[path] = entry
+    return entry[1]
+
+def sheet_hash(png_path):
+    """Return the content hash of a sheet, remembered while sheets are resident."""
+    if not _keep_resident:
+        return hash_file(png_path)
+
+    path, stamp = _file_stamp(png_path)
+    entry = _resident_hashes.get(path)
+    if entry is None or entry[0] != stamp:
+        entry = (stamp, hash_file(png_path))
+        _resident_hashes[path] = entry
+    return entry[1]
+
+def sheet_size(png_path):
+    """Read a sheet's dimensions from its header without decoding the pixels."""
+    with Image.open(png_path) as image:
+        return image.size
+
+def coverage_grid(image, tile_size):
+    """
+    Compute the ratio of non-transparent pixels for every tile in a sheet.
+    Returns a list of rows, each a list of ratios between 0.0 and 1.0.
+    Partial tiles at the right and bottom edges are ignored, like the crop loops do.
+    """
+    cols = image.width // tile_size
+    rows = image.height // tile_size
+    if cols == 0 or rows == 0:
+        return []
+
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    alpha = image.getchannel('A').crop((0, 0, cols * tile_size, rows * tile_size))
+
+    # Turn alpha into a 0/1 mask, then box-average each tile in a single C-level pass
+    with profile_stage("classify"):
+        mask = alpha.point(lambda a: 1 if a > 0 else 0).convert('F')
+        ratios = array('f', mask.reduce(tile_size).tobytes())
+
+    return [ratios[row * cols:(row + 1) * cols].tolist() for row in range(rows)]
+
+def tile_coverage(tile):
+    """Compute the ratio of non-transparent pixels in a single tile."""
+    if tile.mode != 'RGBA':
+        tile = tile.convert('RGBA')
+    transparent_count = tile.getchannel('A').histogram()[0]
+    return 1 - transparent_count / (tile.width * tile.height)
+
+def crop_tile(image, row, col, tile_size):
+    """Crop the tile at the given grid position."""
+    left = col * tile_size
+    top = row * tile_size
+    return image.crop((left, top, left + tile_size, top + tile_size))
+
+def iter_tiles(image, tile_size, threshold, cells=None):
+    """
+    Yield (cell_index, tile) for every tile whose coverage reaches the threshold.
+    Cell indices count every tile in row-major order, transparent or not, which is
+    how sprite numbers like "pest-17" are assigned.
+    If cells is given, only those cell indices are cropped and classified.
+    """
+    cols = image.width // tile_size
+    rows = image.height // tile_size
+
+    if cells is None:
+        coverage = coverage_grid(image, tile_size)
+        for row in range(rows):
+            for col in range(cols):
+                if coverage[row][col] >= threshold:
+                    yield row * cols + col, crop_tile(image, row, col, tile_size)
+        return
+
+    for cell_index in sorted(cells):
+        if cell_index >= rows * cols:
+            continue
+        row, col = divmod(cell_index, cols)
+        tile = crop_tile(image, row, col, tile_size)
+        if tile_coverage(tile) >= threshold:
+            yield cell_index, tile
+
+def extract_tiles(png_path, tile_size, threshold, cells=None, cache=None):
+    """
+    Return [(cell_index, tile)] for every tile of a sheet whose coverage reaches the threshold.
+    If cells is given, only those cell indices are considered.
+    With a SpriteCache, cells extracted on earlier runs are served from the cache, and the
+    sheet is only decoded when some requested cell has never been seen.
+    """
+    if cache is None:
+        return list(iter_tiles(load_sheet(png_path), tile_size, threshold, cells))
+
+    width, height = sheet_size(png_path)
+    cols = width // tile_size
+    rows = height // tile_size
+    if cells is None:
+        wanted = list(range(rows * cols))
+    else:
+        wanted = sorted(cell for cell in cells if cell < rows * cols)
+
+    digest = sheet_hash(png_path)
+    entries = cache.get_tiles(digest, tile_size, wanted)
+    missing = [cell for cell in wanted if cell not in entries]
+
+    if missing:
+        image = load_sheet(png_path)
+        # Classify the whole sheet in one pass when most of it is missing
+        coverage = coverage_grid(image, tile_size) if cells is None else None
+        new_entries = {}
+        for cell_index in missing:
+            row, col = divmod(cell_index, cols)
+            tile = crop_tile(image, row, col, tile_size)
+            ratio = coverage[row][col] if coverage is not None else tile_coverage(tile)
+            new_entries[cell_index] = (ratio, tile.tobytes())
+        cache.put_tiles(digest, tile_size, new_entries)
+        entries.update(new_entries)
+
+    tiles = []
+    for cell_index in wanted:
+        ratio, rgba_bytes = entries[cell_index]
+        if ratio >= threshold:
+            tiles.append((cell_index, Image.frombytes('RGBA', (tile_size, tile_size), rgba_bytes)))
+    return tiles
@@ -0,0 +1,122 @@
+"""
+Persistent cache of extracted tiles for the gen_*.py scripts.
+Tiles are keyed by (sheet content hash, cell index, tile size) and stored with their
+coverage ratio, so later runs only decode a sheet when it needs a cell not seen before.
+The cache lives in a single SQLite file and is trimmed least-recently-used first.
+"""
+
+import os
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+
+CACHE_DIR = Path("art/.cache")
+CACHE_FILENAME = "sprite_cache.sqlite"
+MAX_CACHE_BYTES = 64 * 1024 * 1024  # Evict least recently used tiles above this size
+
+# Keyed by process id too: forked workers must not reuse a connection inherited from their parent
+_open_caches = {}
+
+class SpriteCache:
+    """On-disk tile cache with a size cap and LRU eviction."""
+
+    def __init__(self, path, max_bytes=MAX_CACHE_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Worker processes share the file, so wait for locks instead of failing
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS tiles (
+                sheet_hash TEXT NOT NULL,
+                cell INTEGER NOT NULL,
+                tile_size INTEGER NOT NULL,
+                coverage REAL NOT NULL,
+                pixels BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (sheet_hash, cell, tile_size)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tiles_last_used ON tiles (last_used)")
+        self.connection.commit()
+
+    def get_tiles(self, sheet_hash, tile_size, cells):
+        """
+        Look up cached cells of a sheet.
+        Returns {cell: (coverage, rgba_bytes)} for the cells that are cached.
+        """
+        found = {}
+        cells = list(cells)
+        # Stay well below SQLite's limit on bound parameters
+        for start in range(0, len(cells), 500):
+            chunk = cells[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT cell, coverage, pixels FROM tiles "
+                f"WHERE sheet_hash = ? AND tile_size = ? AND cell IN ({placeholders})",
+                [sheet_hash, tile_size] + chunk)
+            for cell, coverage, pixels in rows:
+                found[cell] = (coverage, zlib.decompress(pixels))
+
+        if found:
+            now = time.time()
+            self.connection.executemany(
+                "UPDATE tiles SET last_used = ? WHERE sheet_hash = ? AND cell = ? AND tile_size = ?",
+                [(now, sheet_hash, cell, tile_size) for cell in found])
+            self.connection.commit()
+        return found
+
+    def put_tiles(self, sheet_hash, tile_size, entries):
+        """Store {cell: (coverage, rgba_bytes)} for a sheet, then trim the cache to its cap."""
+        now = time.time()
+        rows = []
+        for cell, (coverage, rgba_bytes) in entries.items():
+            pixels = zlib.compress(rgba_bytes, 1)
+            rows.append((sheet_hash, cell, tile_size, coverage, pixels, len(pixels), now))
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO tiles "
+            "(sheet_hash, cell, tile_size, coverage, pixels, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.connection.commit()
+        self.evict()
+
+    def total_bytes(self):
+        """Total size of the stored tile data."""
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used tiles until the cache is back under its size cap."""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+
+        evicted = 0
+        freed = 0
+        rows = self.connection.execute(
+            "SELECT sheet_hash, cell, tile_size, size FROM tiles ORDER BY last_used").fetchall()
+        doomed = []
+        for sheet_hash, cell, tile_size, size in rows:
+            if freed >= excess:
+                break
+            doomed.append((sheet_hash, cell, tile_size))
+            freed += size
+            evicted += 1
+        self.connection.executemany(
+            "DELETE FROM tiles WHERE sheet_hash = ? AND cell = ? AND tile_size = ?", doomed)
+        self.connection.commit()
+        return evicted
+
+    def close(self):
+        self.connection.close()
+
+def open_sprite_cache(cache_dir):
+    """Return this process's cache for a directory, or None when caching is disabled."""
+    if cache_dir is None:
+        return None
+    key = (os.getpid(), Path(cache_dir) / CACHE_FILENAME)
+    if key not in _open_caches:
+        _open_caches[key] = SpriteCache(key[1])
+    return _open_caches[key]
@@ -0,0 +1,82 @@
+"""
+Binary sprite index written next to each atlas JSON.
+The Godot autoloads load it through src/sprite_index.gd instead of parsing the JSON.
+Layout (little endian):
+  header:  "DLSI", u16 version, u16 flags, u16 cell width, u16 cell height,
+           u16 tile width, u16 tile height, u32 entry count, u32 string table size
+  entries: u32 name offset, u16 name length, s16 cell x, s16 cell y,
+           followed by s16 trim x, y, width, height when flags has FLAG_TRIM
+           and by u16 atlas page when flags has FLAG_PAGES
+  strings: the UTF-8 sprite names, in the same order as the entries
+  autotile (only when flags has FLAG_AUTOTILE): u16 table count, then per table
+           u16 name length, the UTF-8 block name and 16 u16 entry indices, one per neighbor mask
+"""
+
+import struct
+from outputs import write_output
+
+SPRITE_INDEX_MAGIC = b"DLSI"
+SPRITE_INDEX_VERSION = 1  # Bump together with src/sprite_index.gd when the layout changes
+FLAG_TRIM = 1
+FLAG_PAGES = 2  # Only set for atlases with more than one page
+FLAG_AUTOTILE = 4
+AUTOTILE_MASKS = 16
+
+HEADER = struct.Struct("<4sHHHHHHII")
+ENTRY = struct.Struct("<IHhh")
+TRIM = struct.Struct("<hhhh")
+PAGE = struct.Struct("<H")
+AUTOTILE_COUNT = struct.Struct("<H")
+AUTOTILE_TABLE = struct.Struct(f"<{AUTOTILE_MASKS}H")
+INT16_MIN, INT16_MAX = -32768, 32767
+
+def encode_autotile_tables(autotile, coordinates):
+    """Encode {block: [16 sprite names]} as tables of entry indices into coordinates."""
+    entry_indices = {sprite_name: i for i, sprite_name in enumerate(coordinates)}
+    data = bytearray(AUTOTILE_COUNT.pack(len(autotile)))
+    for block_name, sprite_names in autotile.items():
+        if len(sprite_names) != AUTOTILE_MASKS:
+            raise ValueError(f"Autotile table {block_name} has {len(sprite_names)} entries, not {AUTOTILE_MASKS}")
+        encoded_name = block_name.encode('utf-8')
+        data += AUTOTILE_COUNT.pack(len(encoded_name)) + encoded_name
+        data += AUTOTILE_TABLE.pack(*(entry_indices[sprite_name] for sprite_name in sprite_names))
+    return bytes(data)
+
+def encode_sprite_index(coordinates, cell_size, tile_size, trims=None, pages=None, autotile=None):
+    """
+    Encode a {name: [x, y]} pixel coordinate map as a binary sprite index.
+    Coordinates are stored in cell_size units, so they must lie on that grid.
+    trims maps names to [x, y, width, height] for trimmed atlases, pages maps
+    names to their page index for atlases with several pages, and autotile maps
+    block names to the sprite names of their 16 neighbor masks.
+    """
+    cell_w, cell_h = cell_size
+    entries = []
+    strings = bytearray()
+    for sprite_name, (x, y) in coordinates.items():
+        if x % cell_w or y % cell_h:
+            raise ValueError(f"Sprite {sprite_name} at {x}, {y} is not on the {cell_w}x{cell_h} grid")
+        values = [x // cell_w, y // cell_h] + (list(trims[sprite_name]) if trims is not None else [])
+        if not all(INT16_MIN <= value <= INT16_MAX for value in values):
+            raise ValueError(f"Sprite {sprite_name} doesn't fit in a 16-bit sprite index: {values}")
+
+        encoded_name = sprite_name.encode('utf-8')
+        entry = ENTRY.pack(len(strings), len(encoded_name), values[0], values[1])
+        if trims is not None:
+            entry += TRIM.pack(*values[2:])
+        if pages is not None:
+            entry += PAGE.pack(pages[sprite_name])
+        entries.append(entry)
+        strings += encoded_name
+
+    flags = (FLAG_TRIM if trims is not None else 0) | (FLAG_PAGES if pages is not None else 0)
+    flags |= FLAG_AUTOTILE if autotile else 0
+    header = HEADER.pack(SPRITE_INDEX_MAGIC, SPRITE_INDEX_VERSION, flags, cell_w, cell_h,
+                         tile_size[0], tile_size[1], len(entries), len(strings))
+    tables = encode_autotile_tables(autotile, coordinates) if autotile else b""
+    return header + b"".join(entries) + bytes(strings) + tables
+
+def write_sprite_index(path, coordinates, cell_size, tile_size, trims=None, pages=None, autotile=None):
+    """Write a binary sprite index atomically, unless it is unchanged."""
+    data = encode_sprite_index(coordinates, cell_size, tile_size, trims, pages, autotile)
+    return write_output(path, data)
@@ -0,0 +1,52 @@
+"""Tests for the atlas packer. Run with python -m pytest from the art directory."""
+
+from atlas import pack_pages, pack_pages_stable, pages_area
+
+CELL = (16, 16)
+
+def previous_positions(pages, count):
+    """(page, x, y) of every sprite index below count in a pack_pages result."""
+    positions = [None] * count
+    for page, (_, _, placements) in enumerate(pages):
+        for i, (x, y) in placements.items():
+            if i < count:
+                positions[i] = (page, x, y)
+    return positions
+
+def test_stable_pack_keeps_every_position():
+    sizes = [(16, 16)] * 5
+    pages = pack_pages(sizes, CELL)
+    stable_pages, kept = pack_pages_stable(sizes, previous_positions(pages, 5), [(64, 32)], CELL)
+    assert kept == 5
+    assert stable_pages == pages
+
+def test_stable_pack_shrinks_after_removal():
+    # Five sprites need a 64x32 page; the fifth sits alone in the right half
+    pages = pack_pages([(16, 16)] * 5, CELL)
+    assert [(width, height) for width, height, _ in pages] == [(64, 32)]
+    assert pages[0][2][4] == (32, 0)
+
+    sizes = [(16, 16)] * 4
+    fresh_pages = pack_pages(sizes, CELL)
+    stable_pages, kept = pack_pages_stable(sizes, previous_positions(pages, 4), [(64, 32)], CELL)
+    assert kept == 4
+    assert [(width, height) for width, height, _ in stable_pages] == [(32, 32)]
+    assert stable_pages[0][2] == {i: pages[0][2][i] for i in range(4)}
+    assert pages_area(stable_pages) == pages_area(fresh_pages)
+
+def test_stable_pack_drops_empty_last_page():
+    # The only sprite on the second page was removed
+    previous = [(0, 0, 0), None]
+    stable_pages, kept = pack_pages_stable([(16, 16)] * 2, previous, [(32, 32), (32, 32)], CELL)
+    assert kept == 1
+    assert len(stable_pages) == 1
+    assert stable_pages[0][2][0] == (0, 0)
+
+def test_stable_pack_shrink_keeps_watermark_corner_free():
+    # A 16x16 watermark corner would land on the sprite at (16, 16) in a 32x32 page
+    previous = [(0, 0, 0), (0, 16, 16)]
+    stable_pages, kept = pack_pages_stable([(16, 16)] * 2, previous, [(64, 64)], CELL, corner_size=(16, 16))
+    assert kept == 2
+    width, height, placements = stable_pages[0]
+    assert (width, height) != (32, 32)
+    assert placements == {0: (0, 0), 1: (16, 16)}
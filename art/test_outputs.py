@@ -0,0 +1,40 @@
+"""Tests for the output helpers. Run with python -m pytest from the art directory."""
+
+import random
+from PIL import Image
+from outputs import to_indexed
+
+def indexed_round_trip(image):
+    """The RGBA pixels a palette PNG written from to_indexed(image) decodes to."""
+    return to_indexed(image).convert('RGBA')
+
+def visible_pixels(image):
+    """RGBA pixels with every fully transparent pixel set to (0, 0, 0, 0)."""
+    data = image.tobytes()
+    pixels = [tuple(data[i:i + 4]) for i in range(0, len(data), 4)]
+    return [pixel if pixel[3] else (0, 0, 0, 0) for pixel in pixels]
+
+def test_indexed_keeps_close_colors_apart():
+    # Neighbors one step apart in each channel, plus colors that only differ in alpha
+    rng = random.Random(0)
+    colors = {(10, 10, 10, 255), (11, 10, 10, 255), (10, 11, 10, 255), (10, 10, 11, 255),
+              (10, 10, 10, 128), (10, 10, 10, 1), (200, 30, 40, 0), (0, 0, 0, 255)}
+    while len(colors) < 200:
+        colors.add(tuple(rng.randrange(256) for _ in range(3)) + (rng.choice((1, 64, 255)),))
+    colors = sorted(colors)
+    image = Image.new('RGBA', (64, 64))
+    image.putdata([colors[i % len(colors)] for i in range(64 * 64)])
+
+    assert visible_pixels(indexed_round_trip(image)) == visible_pixels(image)
+
+def test_indexed_puts_transparency_first():
+    image = Image.new('RGBA', (4, 1))
+    image.putdata([(255, 0, 0, 0), (0, 255, 0, 255), (0, 0, 255, 0), (0, 255, 0, 255)])
+    indexed = to_indexed(image)
+    assert indexed.tobytes() == bytes([0, 1, 0, 1])
+    assert indexed.info['transparency'] == bytes([0, 255])
+
+def test_indexed_gives_up_above_256_colors():
+    image = Image.new('RGBA', (257, 1))
+    image.putdata([(i % 256, i // 256, 0, 255) for i in range(257)])
+    assert to_indexed(image) is None
@@ -0,0 +1,28 @@
+"""Tests for the tile reference scanner. Run with python -m pytest from the art directory."""
+
+from tile_references import scan_file
+
+def scan(tmp_path, filename, source):
+    path = tmp_path / filename
+    path.write_text(source, encoding='utf-8')
+    return scan_file((path, None, None))[1]
+
+def test_scan_finds_string_names(tmp_path):
+    source = 'const WALL := &"wall-5"\nvar floor_tile = get_tile(&"floor-3")\n'
+    assert scan(tmp_path, "map.gd", source) == ["floor-3", "wall-5"]
+
+def test_scan_ignores_commented_out_references(tmp_path):
+    source = (
+        '## Cells of every autotile block, like &"wall-5"\n'
+        '# set_cell(&"floor-1")\n'
+        'var door := &"door-0"  # was &"door-1"\n'
+    )
+    assert scan(tmp_path, "map.gd", source) == ["door-0"]
+
+def test_scan_keeps_hashes_inside_strings(tmp_path):
+    source = 'var label := "#%d" % count; var tile := &"decor-2"\nvar text := """# not a comment &"pit-0" """\n'
+    assert scan(tmp_path, "map.gd", source) == ["decor-2", "pit-0"]
+
+def test_scan_reads_scenes_unchanged(tmp_path):
+    source = '[node name="Door"]\nmetadata/tile = &"door-0"\n'
+    assert scan(tmp_path, "door.tscn", source) == ["door-0"]
@@ -0,0 +1,114 @@
+"""
+Project-wide index of the names the game refers to with StringName literals (&"name").
+gen_world.py only packs the world tiles that appear in it, so a tile used from a map
+generator, a scene or a resource is kept just like one used from map_renderer.gd.
+Per-file results are cached in art/.cache, keyed by mtime and size with the content hash
+as a fallback, so a rescan only reads files that changed.
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+from sprite_cache import CACHE_DIR
+from outputs import atomic_output
+from pipeline import run_jobs
+
+REFERENCE_SUFFIXES = (".gd", ".tscn", ".tres")
+REFERENCE_CACHE_PATH = CACHE_DIR / "tile_references.json"
+REFERENCE_CACHE_VERSION = 2  # Bump when scanning changes, so cached names are rescanned
+STRING_NAME_PATTERN = re.compile(r'&"([^"]+)"')
+# GDScript strings (so a # inside one isn't taken for a comment) and comments
+GD_STRING_OR_COMMENT_PATTERN = re.compile(
+    r'"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|#[^\n]*')
+
+def reference_files(exclude=()):
+    """
+    Every .gd, .tscn and .tres file in the project, skipping hidden directories like .godot
+    and the directories in exclude (such as the generator's own output directory).
+    """
+    excluded = {Path(path) for path in exclude}
+    files = []
+    for directory, subdirectories, filenames in os.walk("."):
+        subdirectories[:] = sorted(
+            name for name in subdirectories
+            if not name.startswith(".") and Path(directory, name) not in excluded)
+        for filename in filenames:
+            if filename.endswith(REFERENCE_SUFFIXES):
+                files.append(Path(directory, filename))
+    return sorted(files)
+
+def strip_gd_comments(source):
+    """Remove # comments from GDScript source, leaving strings that contain # alone."""
+    return GD_STRING_OR_COMMENT_PATTERN.sub(
+        lambda match: "" if match.group(0).startswith("#") else match.group(0), source)
+
+def scan_file(task):
+    """
+    Scan one (path, cached_hash, cached_names) task for StringName literals.
+    Comments in .gd files are skipped, so commented-out references don't count.
+    The cached names are reused when the content hash still matches.
+    Returns (content_hash, sorted_names).
+    """
+    path, cached_hash, cached_names = task
+    data = Path(path).read_bytes()
+    content_hash = hashlib.sha256(data).hexdigest()
+    if content_hash == cached_hash:
+        return content_hash, cached_names
+    source = data.decode('utf-8', errors='replace')
+    if Path(path).suffix == ".gd":
+        source = strip_gd_comments(source)
+    names = set(STRING_NAME_PATTERN.findall(source))
+    return content_hash, sorted(names)
+
+def _load_cache():
+    try:
+        with open(REFERENCE_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != REFERENCE_CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
+
+def build_reference_index(jobs=1, use_cache=True, exclude=()):
+    """
+    Scan the project and return {name: [files referring to it]}, sorted by name and path.
+    Files whose mtime and size match the cache aren't opened; the rest are scanned in
+    jobs worker processes.
+    """
+    cached = _load_cache() if use_cache else {}
+    entries = {}
+    stale = []
+    for path in reference_files(exclude):
+        key = path.as_posix()
+        stat = path.stat()
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        entry = cached.get(key)
+        if entry is not None and entry["stamp"] == stamp:
+            entries[key] = entry
+        else:
+            stale.append((key, stamp, entry))
+
+    tasks = [(key, entry and entry["hash"], entry and entry["names"]) for key, _, entry in stale]
+    for (key, stamp, _), (content_hash, names) in zip(stale, run_jobs(scan_file, tasks, jobs)):
+        entries[key] = {"stamp": stamp, "hash": content_hash, "names": names}
+    print(f"Scanned {len(stale)} of {len(entries)} project files for tile references")
+
+    if use_cache and (stale or len(entries) != len(cached)):
+        REFERENCE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_output(REFERENCE_CACHE_PATH) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": REFERENCE_CACHE_VERSION, "files": entries}, f)
+
+    index = defaultdict(list)
+    for key in sorted(entries):
+        for name in entries[key]["names"]:
+            index[name].append(key)
+    return dict(sorted(index.items()))
+
+def reference_digest(index):
+    """Hash of the referenced names, for the build manifest."""
+    return hashlib.sha256("\n".join(index).encode('utf-8')).hexdigest()
@@ -0,0 +1,150 @@
+"""
+Godot TileSet (.tres) resources written straight from the gen_*.py scripts.
+The text matches what the gen_*_tileset.gd EditorScripts save through ResourceSaver,
+so an asset build no longer needs the Godot editor.
+Godot picks random resource ids; here they are derived from the output path so
+rebuilding an unchanged atlas writes an identical file.
+"""
+
+import hashlib
+import re
+from pathlib import Path
+from outputs import write_output
+from atlas import coordinates_by_page
+
+# Godot leaves TileSet.tile_size and TileSetAtlasSource.texture_region_size out of the file at this value
+DEFAULT_TILE_SIZE = (16, 16)
+UID_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789"
+UID_PATTERN = re.compile(r'uid="(uid://[a-z0-9]+)"')
+
+def res_path(path):
+    """Godot res:// path of a file given relative to the project root."""
+    return f"res://{Path(path).as_posix()}"
+
+def _digest(*parts):
+    """Integer hash of some strings, for deterministic ids."""
+    return int.from_bytes(hashlib.sha256("\0".join(parts).encode('utf-8')).digest()[:8], 'little')
+
+def _to_base36(value):
+    """Encode an integer with Godot's uid alphabet."""
+    text = ""
+    while value or not text:
+        value, digit = divmod(value, len(UID_CHARS))
+        text = UID_CHARS[digit] + text
+    return text
+
+def read_resource_uid(path):
+    """The uid in the header of a .tres or the [remap] section of a .import file, or None."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    match = UID_PATTERN.search(path.read_text(encoding='utf-8'))
+    return match.group(1) if match else None
+
+def resource_uid(path):
+    """Keep the uid of an existing resource so references to it survive, or derive a new one."""
+    uid = read_resource_uid(path)
+    if uid is None:
+        # Godot's ResourceUID ids are 63-bit
+        uid = "uid://" + _to_base36(_digest("uid", res_path(path)) >> 1)
+    return uid
+
+def scene_unique_id(*parts):
+    """Five character id like the ones Godot gives sub-resources."""
+    return _to_base36(_digest(*parts))[-5:]
+
+def atlas_source(tiles, region_size, region=None, margin=None, texture=None):
+    """
+    Describe a TileSetAtlasSource for format_tileset.
+    tiles lists (x, y) atlas coordinates in the order the tiles are created. region and margin
+    make the source's texture an AtlasTexture cut out of the atlas instead of the atlas itself.
+    texture is the atlas page the source uses, if not the TileSet's main texture.
+    """
+    return {"tiles": tiles, "region_size": tuple(region_size), "region": region, "margin": margin,
+            "texture": texture}
+
+def _rect2(rect):
+    """Rect2 literal in .tres syntax."""
+    return f"Rect2({', '.join(str(value) for value in rect)})"
+
+def _vector2i(size):
+    """Vector2i literal in .tres syntax."""
+    return f"Vector2i({size[0]}, {size[1]})"
+
+def format_tileset(tileset_path, texture_path, tile_size, sources):
+    """
+    Text of a TileSet .tres using texture_path as the atlas, with one source per entry of sources.
+    Sources with a texture of their own (further atlas pages) each add an external resource.
+    """
+    texture_ids = {}
+    ext_resources = []
+    for path in [texture_path] + [source["texture"] for source in sources if source["texture"] is not None]:
+        if res_path(path) in texture_ids:
+            continue
+        texture_id = f"{len(texture_ids) + 1}_{scene_unique_id(res_path(tileset_path), res_path(path))}"
+        texture_ids[res_path(path)] = texture_id
+        texture_uid = read_resource_uid(f"{path}.import")
+        texture_uid_attribute = f' uid="{texture_uid}"' if texture_uid else ""
+        ext_resources.append(
+            [f'[ext_resource type="Texture2D"{texture_uid_attribute} path="{res_path(path)}" id="{texture_id}"]'])
+
+    sub_resources = []
+    source_ids = []
+    for source_id, source in enumerate(sources):
+        texture_ref = f'ExtResource("{texture_ids[res_path(source["texture"] or texture_path)]}")'
+        if source["region"] is not None:
+            atlas_texture_id = f"AtlasTexture_{scene_unique_id(res_path(tileset_path), 'texture', str(source_id))}"
+            lines = [f'[sub_resource type="AtlasTexture" id="{atlas_texture_id}"]',
+                     f"atlas = {texture_ref}",
+                     f"region = {_rect2(source['region'])}"]
+            if source["margin"] is not None and any(source["margin"]):
+                lines.append(f"margin = {_rect2(source['margin'])}")
+            sub_resources.append(lines)
+            texture_ref = f'SubResource("{atlas_texture_id}")'
+
+        atlas_source_id = f"TileSetAtlasSource_{scene_unique_id(res_path(tileset_path), 'source', str(source_id))}"
+        lines = [f'[sub_resource type="TileSetAtlasSource" id="{atlas_source_id}"]',
+                 f"texture = {texture_ref}"]
+        if source["region_size"] != DEFAULT_TILE_SIZE:
+            lines.append(f"texture_region_size = {_vector2i(source['region_size'])}")
+        lines += [f"{x}:{y}/0 = 0" for x, y in source["tiles"]]
+        sub_resources.append(lines)
+        source_ids.append(atlas_source_id)
+
+    load_steps = len(ext_resources) + len(sub_resources) + 1
+    sections = [[f'[gd_resource type="TileSet" load_steps={load_steps} format=3 uid="{resource_uid(tileset_path)}"]']]
+    sections += ext_resources
+    sections += sub_resources
+
+    resource = ["[resource]"]
+    if tuple(tile_size) != DEFAULT_TILE_SIZE:
+        resource.append(f"tile_size = {_vector2i(tile_size)}")
+    resource += [f'sources/{source_id} = SubResource("{atlas_source_id}")'
+                 for source_id, atlas_source_id in enumerate(source_ids)]
+    sections.append(resource)
+    return "\n\n".join("\n".join(lines) for lines in sections) + "\n"
+
+def grid_tiles(coordinates, cell_size, frames=1):
+    """
+    Atlas coordinates of the tiles a TileSet needs for a {name: [x, y]} map, in creation order.
+    Each sprite spans frames tiles side by side; shared coordinates only create their tiles once.
+    """
+    cell_w, cell_h = cell_size
+    tiles = {}
+    for x, y in coordinates.values():
+        for frame in range(frames):
+            tiles.setdefault((x // cell_w + frame, y // cell_h), None)
+    return list(tiles)
+
+def grid_sources(coordinates, sprite_pages, page_paths, tile_size, frames=1):
+    """One grid atlas source per atlas page, as the gen_*_tileset.gd EditorScripts build them."""
+    sources = []
+    for page, page_coordinates in enumerate(coordinates_by_page(coordinates, sprite_pages, len(page_paths))):
+        tiles = grid_tiles(page_coordinates, tile_size, frames)
+        sources.append(atlas_source(tiles, tile_size, texture=page_paths[page]))
+    return sources
+
+def write_tileset(tileset_path, texture_path, tile_size, sources):
+    """Write a TileSet .tres atomically, unless it is unchanged."""
+    text = format_tileset(tileset_path, texture_path, tile_size, sources)
+    return write_output(tileset_path, text.encode('utf-8'))
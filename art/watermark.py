@@ -0,0 +1,45 @@
+"""
+Watermark drawing shared by the gen_*.py scripts.
+"""
+
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+WATERMARK_MARGIN = 4
+
+@lru_cache(maxsize=None)
+def load_watermark_font():
+    """Load the default font once per process."""
+    return ImageFont.load_default()
+
+def draw_watermark(image, text, margin=WATERMARK_MARGIN, antialias=True):
+    """
+    Draw white text with a black outline in the lower right corner of an image.
+    Without antialias the text only adds black and white, which keeps palette images small.
+    """
+    draw = ImageDraw.Draw(image)
+    if not antialias:
+        draw.fontmode = "1"
+    font = load_watermark_font()
+    try:
+        bbox = draw.textbbox((0, 0), text, font=font)
+        text_w, text_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    except AttributeError:
+        text_w, text_h = font.getsize(text)
+    x = image.width - text_w - margin
+    y = image.height - text_h - margin
+    # Draw black outline
+    for dx in [-1, 0, 1]:
+        for dy in [-1, 0, 1]:
+            if dx or dy:
+                draw.text((x+dx, y+dy), text, font=font, fill=(0,0,0,255))
+    # Draw white text
+    draw.text((x, y), text, font=font, fill=(255,255,255,255))
+    return image
+
+@lru_cache(maxsize=None)
+def watermark_extent(text, margin=WATERMARK_MARGIN, antialias=True):
+    """Width and height of the area a watermark covers, measured from the lower right corner."""
+    probe = draw_watermark(Image.new('RGBA', (1024, 256), (0, 0, 0, 0)), text, margin, antialias)
+    left, top, _, _ = probe.getbbox()
+    return probe.width - left, probe.height - top
@@ -27,6 +27,7 @@ var _last_health: float = -1  # Initialize to invalid value to force first updat
 @onready var health: Node2D = %Health
 @onready var health_bg: ColorRect = %HealthBG
 @onready var health_level: ColorRect = %HealthLevel
+@onready var _character_offset: Vector2 = character.offset
 
 
 func init(p_pos: Vector2i) -> void:
@@ -248,6 +249,7 @@ func _choose_initial_appearance() -> void:
 	assert(not appearances.is_empty())
 	var tile_name: String = appearances[monster.variant % appearances.size()]
 	character.region_rect = CharacterTiles.get_region(StringName(tile_name))
+	character.offset = _character_offset + CharacterTiles.get_trim_offset(StringName(tile_name))
 
 	character.flip_h = true
 	pmat.color = monster.hit_particles_color
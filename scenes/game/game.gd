@@ -594,7 +594,6 @@ func _animate_obstacle_push(from_pos: Vector2i, to_pos: Vector2i) -> Signal:
 
 	# Create a temporary sprite for animation
 	var sprite := Sprite2D.new()
-	sprite.texture = WorldTiles.TEXTURE
 	sprite.centered = false
 
 	# Get the obstacle tile coordinates from the renderer
@@ -608,16 +607,11 @@ func _animate_obstacle_push(from_pos: Vector2i, to_pos: Vector2i) -> Signal:
 		return get_tree().create_timer(0.0).timeout  # Return an immediately finished signal
 
 	var tile := map_renderer.get_obstacle_tile(obstacle)
-	var tile_coords := WorldTiles.get_coords(tile)
 
-	# Set up the sprite region to match the tile
+	# Set up the sprite region to match the tile, on whichever atlas page holds it
+	sprite.texture = WorldTiles.get_atlas(tile)
 	sprite.region_enabled = true
-	sprite.region_rect = Rect2(
-		tile_coords.x * Constants.TILE_SIZE,
-		tile_coords.y * Constants.TILE_SIZE,
-		Constants.TILE_SIZE,
-		Constants.TILE_SIZE
-	)
+	sprite.region_rect = WorldTiles.get_region(tile)
 
 	# Position the sprite and add it to the scene
 	sprite.position = Vector2(from_pos * Constants.TILE_SIZE)
@@ -2,13 +2,20 @@
 extends Node
 
 const JSON_PATH = &"res://assets/generated/character_tiles.json"
+const INDEX_PATH = &"res://assets/generated/character_tiles.bin"
 const TEXTURE = preload("res://assets/generated/character_tiles.png")
+## Further pages of an atlas that exceeded the maximum page size, see art/README.md
+const PAGE_PATH = "res://assets/generated/character_tiles_%d.png"
 
 var tile_width: int = 32
 var tile_height: int = 16
 const FRAMES_PER_TILE = 2
 
 var _tile_map: Dictionary[StringName, Vector2i] = {}
+var _regions: Dictionary[StringName, Rect2i] = {}
+var _trims: Dictionary[StringName, Rect2i] = {}
+var _pages: Dictionary[StringName, int] = {}
+var _page_textures: Array[Texture2D] = [TEXTURE]
 
 
 func _init() -> void:
@@ -16,6 +23,12 @@ func _init() -> void:
 
 
 func _load_tiles() -> void:
+	# The binary index needs no parsing; the JSON is the fallback for older generated files
+	var index := SpriteIndex.load_file(INDEX_PATH)
+	if index:
+		_load_index(index)
+		return
+
 	# Check if we need to reload by comparing modified times
 	var file := FileAccess.open(JSON_PATH, FileAccess.READ)
 	if not file:
@@ -33,13 +46,60 @@ func _load_tiles() -> void:
 	tile_width = json.tileWidth as int
 	tile_height = json.tileHeight as int
 	_tile_map.clear()
+	_regions.clear()
+	_trims.clear()
+	_pages.clear()
+
+	# Trimmed atlases crop both frames of a sprite to the same box, stored per frame
+	var trims: Dictionary = json.get("trim", {})
+	# Only atlases with more than one page list them
+	var pages: Dictionary = json.get("page", {})
+	_load_page_textures(maxi(1, (json.get("pages", []) as Array).size()))
 
 	# Populate tile map with StringNames
 	for tile_name: String in json.sprites:
 		var coords: Array = json.sprites[tile_name]
-		_tile_map[StringName(tile_name)] = Vector2i(
-			coords[0] / tile_width as int, coords[1] / tile_height as int
-		)
+		var key := StringName(tile_name)
+		_tile_map[key] = Vector2i(coords[0] / tile_width as int, coords[1] / tile_height as int)
+		var region := Rect2i(coords[0] as int, coords[1] as int, tile_width, tile_height)
+		if trims.has(tile_name):
+			var trim: Array = trims[tile_name]
+			_trims[key] = Rect2i(trim[0] as int, trim[1] as int, trim[2] as int, trim[3] as int)
+			region.size = Vector2i(_trims[key].size.x * FRAMES_PER_TILE, _trims[key].size.y)
+		_regions[key] = region
+		if pages.has(tile_name):
+			_pages[key] = pages[tile_name] as int
+
+
+func _load_index(p_index: SpriteIndex) -> void:
+	tile_width = p_index.tile_size.x
+	tile_height = p_index.tile_size.y
+	_tile_map.clear()
+	_regions.clear()
+	_trims.clear()
+	_pages.clear()
+	_load_page_textures(p_index.page_count)
+
+	for i in p_index.names.size():
+		var key := p_index.names[i]
+		var atlas_pos := p_index.cells[i] * p_index.cell_size
+		var region := Rect2i(atlas_pos, p_index.tile_size)
+		if not p_index.trims.is_empty():
+			# Trimmed atlases are indexed per pixel, see _load_tiles
+			_trims[key] = p_index.trims[i]
+			region.size = Vector2i(_trims[key].size.x * FRAMES_PER_TILE, _trims[key].size.y)
+			_tile_map[key] = atlas_pos / p_index.tile_size
+		else:
+			_tile_map[key] = p_index.cells[i]
+		_regions[key] = region
+		if not p_index.pages.is_empty():
+			_pages[key] = p_index.pages[i]
+
+
+func _load_page_textures(p_count: int) -> void:
+	_page_textures = [TEXTURE]
+	for page in range(1, p_count):
+		_page_textures.append(load(PAGE_PATH % page) as Texture2D)
 
 
 func get_coords(p_name: StringName) -> Vector2i:
@@ -48,24 +108,74 @@ func get_coords(p_name: StringName) -> Vector2i:
 	return ret as Vector2i
 
 
+func get_page(p_name: StringName) -> int:
+	return _pages.get(p_name, 0)
+
+
+func get_source_id(p_name: StringName) -> int:
+	# character_tiles.tres has one atlas source per page
+	return get_page(p_name)
+
+
+func get_atlas(p_name: StringName) -> Texture2D:
+	return _page_textures[get_page(p_name)]
+
+
 func get_all_names() -> Array[StringName]:
 	return _tile_map.keys()
 
 
 func get_region(p_name: StringName) -> Rect2:
-	var coords := get_coords(p_name)
-	return Rect2(coords.x * tile_width, coords.y * tile_height, tile_width, tile_height)
+	# Both frames side by side; only their opaque part for trimmed sprites
+	var ret: Variant = _regions.get(p_name)
+	assert(ret != null, "Character tile not found: %s" % p_name)
+	return Rect2(ret as Rect2i)
+
+
+func get_trim_offset(p_name: StringName) -> Vector2:
+	# Where a trimmed frame sits inside the full frame, to add to a Sprite2D's offset.
+	# Trimming is equal on the left and right, so the offset also holds for flipped sprites.
+	if not _trims.has(p_name):
+		return Vector2.ZERO
+	return Vector2(_trims[p_name].position)
+
+
+func get_logical_region(p_name: StringName) -> Rect2:
+	# The full untrimmed rect the sprite was cut from, anchored on its first frame
+	var region := get_region(p_name)
+	return Rect2(region.position - get_trim_offset(p_name), Vector2(tile_width, tile_height))
 
 
 func get_texture(p_name: StringName) -> AtlasTexture:
-	# Create atlas texture for the character tile
+	# Create atlas texture for the character tile, both frames side by side.
+	# One margin can't pad two trimmed frames, so trimmed sprites only get frame 0.
+	if _trims.has(p_name):
+		return get_frame_texture(p_name, 0)
 	var texture := AtlasTexture.new()
-	texture.atlas = TEXTURE
+	texture.atlas = get_atlas(p_name)
 	texture.region = get_region(p_name)
 	return texture
 
 
-func get_name_from_coords(p_coords: Vector2i) -> StringName:
-	var ret: Variant = _tile_map.find_key(p_coords)
-	assert(ret != null, "Character tile not found: %s" % p_coords)
-	return ret as StringName
+func get_frame_texture(p_name: StringName, p_frame: int) -> AtlasTexture:
+	# One frame, padded back out to the full frame size if the sprite was trimmed
+	var frame_size := Vector2(tile_width, tile_height) / Vector2(FRAMES_PER_TILE, 1)
+	var region := get_region(p_name)
+	var texture := AtlasTexture.new()
+	texture.atlas = get_atlas(p_name)
+	if _trims.has(p_name):
+		var trim_size := Vector2(_trims[p_name].size)
+		texture.region = Rect2(region.position + Vector2(trim_size.x * p_frame, 0), trim_size)
+		texture.margin = Rect2(get_trim_offset(p_name), frame_size - trim_size)
+	else:
+		texture.region = Rect2(region.position + Vector2(frame_size.x * p_frame, 0), frame_size)
+	return texture
+
+
+func get_name_from_coords(p_coords: Vector2i, p_source_id: int = 0) -> StringName:
+	# Identical sprites share coordinates, so this returns the first name using them
+	for tile_name: StringName in _tile_map:
+		if _tile_map[tile_name] == p_coords and get_page(tile_name) == p_source_id:
+			return tile_name
+	assert(false, "Character tile not found: %s" % p_coords)
+	return &""
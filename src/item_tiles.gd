@@ -2,10 +2,18 @@
 extends Node
 
 const JSON_PATH = &"res://assets/generated/item_sprites.json"
+const INDEX_PATH = &"res://assets/generated/item_sprites.bin"
 const TEXTURE = preload("res://assets/generated/item_sprites.png")
+## Further pages of an atlas that exceeded the maximum page size, see art/README.md
+const PAGE_PATH = "res://assets/generated/item_sprites_%d.png"
 
 var tile_size: int = 16
 var _tile_map: Dictionary[StringName, Vector2i] = {}
+var _regions: Dictionary[StringName, Rect2i] = {}
+var _trims: Dictionary[StringName, Rect2i] = {}
+var _source_ids: Dictionary[StringName, int] = {}
+var _pages: Dictionary[StringName, int] = {}
+var _page_textures: Array[Texture2D] = [TEXTURE]
 
 
 func _init() -> void:
@@ -13,6 +21,12 @@ func _init() -> void:
 
 
 func _load_tiles() -> void:
+	# The binary index needs no parsing; the JSON is the fallback for older generated files
+	var index := SpriteIndex.load_file(INDEX_PATH)
+	if index:
+		_load_index(index)
+		return
+
 	# Check if we need to reload by comparing modified times
 	var file := FileAccess.open(JSON_PATH, FileAccess.READ)
 	if not file:
@@ -29,13 +43,69 @@ func _load_tiles() -> void:
 	# Update sprite size and clear existing map
 	tile_size = json.spriteSize as int
 	_tile_map.clear()
+	_regions.clear()
+	_trims.clear()
+	_source_ids.clear()
+	_pages.clear()
+
+	# Trimmed atlases store only the opaque part of each sprite, so they have no tile grid
+	# and every sprite is its own source in the item TileSet (see gen_items_tileset.gd)
+	var trims: Dictionary = json.get("trim", {})
+	# Only atlases with more than one page list them; untrimmed ones have a source per page
+	var pages: Dictionary = json.get("page", {})
+	_load_page_textures(maxi(1, (json.get("pages", []) as Array).size()))
 
 	# Populate sprite map with StringNames
 	for sprite_name: String in json.sprites:
 		var coords: Array = json.sprites[sprite_name]
-		_tile_map[StringName(sprite_name)] = Vector2i(
-			int(coords[0] as float / float(tile_size)), int(coords[1] as float / float(tile_size))
-		)
+		var key := StringName(sprite_name)
+		var atlas_pos := Vector2i(coords[0] as int, coords[1] as int)
+		_pages[key] = pages.get(sprite_name, 0) as int
+		if trims.has(sprite_name):
+			var trim: Array = trims[sprite_name]
+			_trims[key] = Rect2i(trim[0] as int, trim[1] as int, trim[2] as int, trim[3] as int)
+			_regions[key] = Rect2i(atlas_pos, _trims[key].size)
+			_source_ids[key] = _source_ids.size()
+			_tile_map[key] = Vector2i.ZERO
+		else:
+			_regions[key] = Rect2i(atlas_pos, Vector2i(tile_size, tile_size))
+			_source_ids[key] = _pages[key]
+			_tile_map[key] = Vector2i(
+				int(coords[0] as float / float(tile_size)),
+				int(coords[1] as float / float(tile_size))
+			)
+
+
+func _load_index(p_index: SpriteIndex) -> void:
+	tile_size = p_index.tile_size.x
+	_tile_map.clear()
+	_regions.clear()
+	_trims.clear()
+	_source_ids.clear()
+	_pages.clear()
+	_load_page_textures(p_index.page_count)
+
+	var sprite_size := p_index.tile_size
+	for i in p_index.names.size():
+		var key := p_index.names[i]
+		var atlas_pos := p_index.cells[i] * p_index.cell_size
+		_pages[key] = 0 if p_index.pages.is_empty() else p_index.pages[i]
+		if not p_index.trims.is_empty():
+			# Trimmed atlases are indexed per pixel, see _load_tiles
+			_trims[key] = p_index.trims[i]
+			_regions[key] = Rect2i(atlas_pos, _trims[key].size)
+			_source_ids[key] = i
+			_tile_map[key] = Vector2i.ZERO
+		else:
+			_regions[key] = Rect2i(atlas_pos, sprite_size)
+			_source_ids[key] = _pages[key]
+			_tile_map[key] = p_index.cells[i]
+
+
+func _load_page_textures(p_count: int) -> void:
+	_page_textures = [TEXTURE]
+	for page in range(1, p_count):
+		_page_textures.append(load(PAGE_PATH % page) as Texture2D)
 
 
 func get_coords(p_name: StringName) -> Vector2i:
@@ -45,20 +115,51 @@ func get_coords(p_name: StringName) -> Vector2i:
 	return ret as Vector2i
 
 
+func get_source_id(p_name: StringName) -> int:
+	return _source_ids.get(p_name, 0)
+
+
+func get_page(p_name: StringName) -> int:
+	return _pages.get(p_name, 0)
+
+
+func get_atlas(p_name: StringName) -> Texture2D:
+	return _page_textures[get_page(p_name)]
+
+
 func get_all_names() -> Array[StringName]:
 	return _tile_map.keys()
 
 
 func get_region(p_name: StringName) -> Rect2:
-	var coords := get_coords(p_name)
-	return Rect2(coords.x * tile_size, coords.y * tile_size, tile_size, tile_size)
+	# The full sprite rect, rebuilt from the trim offset for trimmed sprites
+	var region := get_atlas_region(p_name)
+	if not _trims.has(p_name):
+		return region
+	return Rect2(region.position - Vector2(_trims[p_name].position), Vector2(tile_size, tile_size))
+
+
+func get_atlas_region(p_name: StringName) -> Rect2:
+	# The part of the atlas that actually holds the sprite's pixels
+	var ret: Variant = _regions.get(p_name)
+	assert(ret != null, "Sprite not found: %s" % p_name)
+	return Rect2(ret as Rect2i)
+
+
+func get_margin(p_name: StringName) -> Rect2:
+	# AtlasTexture margin that pads a trimmed sprite back out to its full size
+	if not _trims.has(p_name):
+		return Rect2()
+	var trim: Rect2i = _trims[p_name]
+	return Rect2(Vector2(trim.position), Vector2(tile_size, tile_size) - Vector2(trim.size))
 
 
 func get_texture(p_name: StringName) -> AtlasTexture:
 	# Create atlas texture for the sprite
 	var texture := AtlasTexture.new()
-	texture.atlas = TEXTURE
-	texture.region = get_region(p_name)
+	texture.atlas = get_atlas(p_name)
+	texture.region = get_atlas_region(p_name)
+	texture.margin = get_margin(p_name)
 	return texture
 
 
@@ -73,24 +174,28 @@ func get_preview(p_name: StringName) -> TextureRect:
 	return container
 
 
-func get_name_from_coords(p_coords: Vector2i) -> StringName:
-	var ret: Variant = _tile_map.find_key(p_coords)
-	assert(ret != null, "Item tile not found: %s" % p_coords)
-	return ret as StringName
+func get_name_from_coords(p_coords: Vector2i, p_source_id: int = 0) -> StringName:
+	# Identical sprites share coordinates, so this returns the first name using them
+	for sprite_name: StringName in _tile_map:
+		if _tile_map[sprite_name] == p_coords and get_source_id(sprite_name) == p_source_id:
+			return sprite_name
+	assert(false, "Item tile not found: %s" % p_coords)
+	return &""
 
 
 func get_bbcode_image(p_name: String) -> String:
-	var coords := get_coords(p_name)
-	# Return BBCode that references the atlas texture and specifies the region
+	var region := get_atlas_region(p_name)
+	# Return BBCode that references the atlas texture and specifies the region.
+	# [img] can't pad, so a trimmed item shows at its trimmed size rather than stretched to tile_size
 	return (
 		"[img=%dx%d region=%d,%d,%d,%d]%s[/img]"
 		% [
-			tile_size,
-			tile_size,  # Display size
-			coords.x * tile_size,
-			coords.y * tile_size,  # Region x,y
-			tile_size,
-			tile_size,  # Region width,height
-			TEXTURE.resource_path  # Texture path
+			region.size.x,
+			region.size.y,  # Display size
+			region.position.x,
+			region.position.y,  # Region x,y
+			region.size.x,
+			region.size.y,  # Region width,height
+			get_atlas(p_name).resource_path  # Texture path
 		]
 	)
@@ -5,6 +5,8 @@ extends Node2D
 
 const HINTS_LAYER_MODULATE := Color(0.0, 0.0, 0.0, 0.2)
 const VISION_LAYER_MODULATE := Color(0.0, 0.0, 0.0, 0.4)
+## Every piece of this block is packed into the world atlas, see get_wall_mask
+const WALL_BLOCK := &"wall-5"
 
 @export var terrain_mode: bool = false
 @export var god_mode: bool = false
@@ -174,6 +176,9 @@ func clear_layers() -> void:
 
 
 func render_ground(map: Map) -> void:
+	var wall_cells := WorldTiles.get_autotile_cells(WALL_BLOCK)
+	var wall_sources := WorldTiles.get_autotile_source_ids(WALL_BLOCK)
+
 	for x in range(map.width):
 		for y in range(map.height):
 			var pos := Vector2i(x, y)
@@ -188,7 +193,9 @@ func render_ground(map: Map) -> void:
 							var hint_pos := Vector2i(x + dx, y + dy)
 							if map.is_in_bounds(hint_pos):
 								hints_layer.set_cell(
-									hint_pos, 0, WorldTiles.get_coords(&"floor-7-nsew")
+									hint_pos,
+									WorldTiles.get_source_id(&"floor-7-nsew"),
+									WorldTiles.get_coords(&"floor-7-nsew")
 								)
 
 			if not god_mode and not map.was_seen(pos):
@@ -224,10 +231,13 @@ func render_ground(map: Map) -> void:
 					if terrain_mode:
 						tile = &"wall-5-lone"
 					else:
-						tile = get_wall_tile(pos, map)
+						var mask := get_wall_mask(pos, map)
+						terrain_layer.set_cell(pos, wall_sources[mask], wall_cells[mask])
 
 			if tile:
-				terrain_layer.set_cell(pos, 0, WorldTiles.get_coords(tile))
+				terrain_layer.set_cell(
+					pos, WorldTiles.get_source_id(tile), WorldTiles.get_coords(tile)
+				)
 
 	# New directional hint placement outside the main loop
 	for x in range(map.width):
@@ -238,7 +248,9 @@ func render_ground(map: Map) -> void:
 
 			# Use the debug tile, which is just a square and gets modulated to black
 			var tile := &"debug"
-			hints_layer.set_cell(Vector2i(x, y), 0, WorldTiles.get_coords(tile))
+			hints_layer.set_cell(
+				Vector2i(x, y), WorldTiles.get_source_id(tile), WorldTiles.get_coords(tile)
+			)
 
 
 func render_decorations(map: Map) -> void:
@@ -262,7 +274,9 @@ func render_decorations(map: Map) -> void:
 						var wall_data := terrain_layer.get_cell_tile_data(wall_pos)
 						if wall_data:  # If there's any wall tile above
 							decoration_layer.set_cell(
-								wall_pos, 0, WorldTiles.get_coords(&"decor-32")
+								wall_pos,
+								WorldTiles.get_source_id(&"decor-32"),
+								WorldTiles.get_coords(&"decor-32")
 							)
 				DecType.SOUTH_LIGHT:
 					# Only place south lights under horizontal walls
@@ -273,7 +287,8 @@ func render_decorations(map: Map) -> void:
 							wall_data
 							and (
 								WorldTiles.get_name_from_coords(
-									terrain_layer.get_cell_atlas_coords(wall_pos)
+									terrain_layer.get_cell_atlas_coords(wall_pos),
+									terrain_layer.get_cell_source_id(wall_pos)
 								)
 								== &"grey-wall-ew"
 							)
@@ -286,7 +301,9 @@ func render_decorations(map: Map) -> void:
 				DecType.WINDOW_3:
 					tile = &"grey-wall-window3"
 			if tile:
-				decoration_layer.set_cell(pos, 0, WorldTiles.get_coords(tile))
+				decoration_layer.set_cell(
+					pos, WorldTiles.get_source_id(tile), WorldTiles.get_coords(tile)
+				)
 
 
 func is_corner_wall(pos: Vector2i, map: Map) -> bool:
@@ -320,55 +337,19 @@ func is_vertical_wall(x: int, y: int, map: Map) -> bool:
 	return vertical_walls > 0
 
 
-func get_wall_tile(pos: Vector2i, map: Map) -> StringName:
-	# Count walls in cardinal directions (N, S, E, W)
-	var n: bool = pos.y > 0 and is_wall_like(map.get_terrain(Vector2i(pos.x, pos.y - 1)))
-	var s: bool = (
-		pos.y < map.height - 1 and is_wall_like(map.get_terrain(Vector2i(pos.x, pos.y + 1)))
-	)
-	var e: bool = (
-		pos.x < map.width - 1 and is_wall_like(map.get_terrain(Vector2i(pos.x + 1, pos.y)))
-	)
-	var w: bool = pos.x > 0 and is_wall_like(map.get_terrain(Vector2i(pos.x - 1, pos.y)))
-
-	var ret := &"wall-5-lone"
-
-	# All four directions
-	if n and s and e and w:
-		ret = &"wall-5-nsew"
-	# Three directions
-	elif n and s and e and !w:
-		ret = &"wall-5-nse"
-	elif n and s and !e and w:
-		ret = &"wall-5-nsw"
-	elif n and !s and e and w:
-		ret = &"wall-5-new"
-	elif !n and s and e and w:
-		ret = &"wall-5-sew"
-	# Two directions
-	elif n and s and !e and !w:
-		ret = &"wall-5-ns"
-	elif !n and !s and e and w:
-		ret = &"wall-5-ew"
-	elif n and e and !s and !w:
-		ret = &"wall-5-ne"
-	elif n and w and !s and !e:
-		ret = &"wall-5-nw"
-	elif s and e and !n and !w:
-		ret = &"wall-5-se"
-	elif s and w and !n and !e:
-		ret = &"wall-5-sw"
-	# One direction (other tilesets do this a little clearer)
-	elif !n and !s and !w and e:
-		ret = &"wall-5-ew"
-	elif !n and !s and w and !e:
-		ret = &"wall-5-ew"
-	elif n and !s and !e and !w:
-		ret = &"wall-5-n"
-	elif !n and s and !e and !w:
-		ret = &"wall-5-ns"
-
-	return ret
+func get_wall_mask(pos: Vector2i, map: Map) -> int:
+	# Walls in cardinal directions (N, S, E, W) as a mask into the WALL_BLOCK autotile table.
+	# gen_world.py fills the masks the block has no piece for, e.g. a lone east wall uses "ew".
+	var mask := 0
+	if pos.y > 0 and is_wall_like(map.get_terrain(Vector2i(pos.x, pos.y - 1))):
+		mask |= WorldTiles.AUTOTILE_N
+	if pos.y < map.height - 1 and is_wall_like(map.get_terrain(Vector2i(pos.x, pos.y + 1))):
+		mask |= WorldTiles.AUTOTILE_S
+	if pos.x < map.width - 1 and is_wall_like(map.get_terrain(Vector2i(pos.x + 1, pos.y))):
+		mask |= WorldTiles.AUTOTILE_E
+	if pos.x > 0 and is_wall_like(map.get_terrain(Vector2i(pos.x - 1, pos.y))):
+		mask |= WorldTiles.AUTOTILE_W
+	return mask
 
 
 func is_wall_like(terrain: Terrain) -> bool:
@@ -434,7 +415,9 @@ func render_obstacles(map: Map) -> void:
 				):
 					var tile := get_obstacle_tile(obstacle)
 					if tile:
-						obstacle_layer.set_cell(pos, 0, WorldTiles.get_coords(tile))
+						obstacle_layer.set_cell(
+							pos, WorldTiles.get_source_id(tile), WorldTiles.get_coords(tile)
+						)
 
 						# If this is the bottom part of a vertical multi-cell obstacle,
 						# also render the top part
@@ -445,7 +428,9 @@ func render_obstacles(map: Map) -> void:
 								var top_tile := get_obstacle_tile(top_obstacle)
 								if top_tile:
 									obstacle_layer.set_cell(
-										top_pos, 0, WorldTiles.get_coords(top_tile)
+										top_pos,
+										WorldTiles.get_source_id(top_tile),
+										WorldTiles.get_coords(top_tile)
 									)
 
 
@@ -473,13 +458,14 @@ func render_items(map: Map) -> void:
 			if not items.is_empty():
 				var item: Item = items[0]  # Show only the top item for now
 				var atlas_coords := ItemTiles.get_coords(item.sprite_name)
+				var source_id := ItemTiles.get_source_id(item.sprite_name)
 
 				if item.quantity <= 1:
-					item_layer.set_cell(pos, 0, atlas_coords)
+					item_layer.set_cell(pos, source_id, atlas_coords)
 				else:
 					# Render stacked items
-					item_stack_layer1.set_cell(pos, 0, atlas_coords)
-					item_stack_layer2.set_cell(pos, 0, atlas_coords)
+					item_stack_layer1.set_cell(pos, source_id, atlas_coords)
+					item_stack_layer2.set_cell(pos, source_id, atlas_coords)
 
 				# Add alert for armed items
 				if item.is_armed:
@@ -507,7 +493,9 @@ func render_vision(map: Map) -> void:
 				and map.was_seen(pos)
 				and map.get_terrain(pos).type != Terrain.Type.EMPTY
 			):
-				vision_layer.set_cell(pos, 0, WorldTiles.get_coords(&"debug"))
+				vision_layer.set_cell(
+					pos, WorldTiles.get_source_id(&"debug"), WorldTiles.get_coords(&"debug")
+				)
 
 	# Second pass: update tiles based on neighbors
 	for x in range(map.width):
@@ -556,7 +544,7 @@ func render_vision(map: Map) -> void:
 			else:
 				tile = WorldTiles.get_coords(&"debug")
 
-			vision_layer.set_cell(pos, 0, tile)
+			vision_layer.set_cell(pos, WorldTiles.get_source_id(&"debug"), tile)
 
 
 func spawn_dust_motes(map: Map) -> void:
@@ -18,4 +18,6 @@ func _init() -> void:
 # Update the region rect when the sprite name changes
 func _update_region() -> void:
 	if Engine.is_editor_hint() and sprite_name and ItemTiles:
-		region = ItemTiles.get_region(sprite_name)
+		atlas = ItemTiles.get_atlas(sprite_name)
+		region = ItemTiles.get_atlas_region(sprite_name)
+		margin = ItemTiles.get_margin(sprite_name)
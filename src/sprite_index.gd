@@ -0,0 +1,110 @@
+class_name SpriteIndex
+extends RefCounted
+## Binary sprite index written next to each atlas JSON by art/sprite_index.py.
+## Entries hold int16 coordinates in atlas cells, so loading needs no JSON parsing or division.
+
+const MAGIC = "DLSI"
+const VERSION = 1  # Must match SPRITE_INDEX_VERSION in art/sprite_index.py
+const FLAG_TRIM = 1
+const FLAG_PAGES = 2
+const FLAG_AUTOTILE = 4
+const HEADER_SIZE = 24
+const ENTRY_SIZE = 10
+const TRIM_SIZE = 8
+const PAGE_SIZE = 2
+const AUTOTILE_MASKS = 16
+
+var cell_size := Vector2i.ONE
+var tile_size := Vector2i.ONE
+var names: Array[StringName] = []
+var cells: Array[Vector2i] = []
+## Trim rect of every entry, empty unless the atlas was trimmed
+var trims: Array[Rect2i] = []
+## Atlas page of every entry, empty unless the atlas has more than one page
+var pages: Array[int] = []
+var page_count := 1
+## Entry indices for the 16 neighbor masks of every autotile block, empty unless exported
+var autotile: Dictionary[StringName, PackedInt32Array] = {}
+
+
+static func load_file(p_path: String) -> SpriteIndex:
+	# Returns null if the index is missing or unusable, so callers can fall back to the JSON
+	if not FileAccess.file_exists(p_path):
+		return null
+	var bytes := FileAccess.get_file_as_bytes(p_path)
+	if bytes.size() < HEADER_SIZE or bytes.slice(0, 4).get_string_from_ascii() != MAGIC:
+		printerr("Not a sprite index: ", p_path)
+		return null
+	if bytes.decode_u16(4) != VERSION:
+		printerr("Sprite index ", p_path, " has schema version ", bytes.decode_u16(4))
+		return null
+
+	var flags := bytes.decode_u16(6)
+	if flags & ~(FLAG_TRIM | FLAG_PAGES | FLAG_AUTOTILE):
+		printerr("Sprite index ", p_path, " has unknown flags ", flags)
+		return null
+	var has_trim := (flags & FLAG_TRIM) != 0
+	var has_pages := (flags & FLAG_PAGES) != 0
+	var count := bytes.decode_u32(16)
+	var entry_size := ENTRY_SIZE + (TRIM_SIZE if has_trim else 0) + (PAGE_SIZE if has_pages else 0)
+	var strings_start := HEADER_SIZE + count * entry_size
+	var strings_end := strings_start + bytes.decode_u32(20)
+	var has_autotile := (flags & FLAG_AUTOTILE) != 0
+	if bytes.size() < strings_end or (bytes.size() > strings_end and not has_autotile):
+		printerr("Truncated sprite index: ", p_path)
+		return null
+
+	var index := SpriteIndex.new()
+	index.cell_size = Vector2i(bytes.decode_u16(8), bytes.decode_u16(10))
+	index.tile_size = Vector2i(bytes.decode_u16(12), bytes.decode_u16(14))
+	index.names.resize(count)
+	index.cells.resize(count)
+	if has_trim:
+		index.trims.resize(count)
+	if has_pages:
+		index.pages.resize(count)
+
+	for i in count:
+		var offset := HEADER_SIZE + i * entry_size
+		var name_start := strings_start + bytes.decode_u32(offset)
+		var name_end := name_start + bytes.decode_u16(offset + 4)
+		index.names[i] = StringName(bytes.slice(name_start, name_end).get_string_from_utf8())
+		index.cells[i] = Vector2i(bytes.decode_s16(offset + 6), bytes.decode_s16(offset + 8))
+		if has_trim:
+			index.trims[i] = Rect2i(
+				bytes.decode_s16(offset + 10),
+				bytes.decode_s16(offset + 12),
+				bytes.decode_s16(offset + 14),
+				bytes.decode_s16(offset + 16)
+			)
+		if has_pages:
+			index.pages[i] = bytes.decode_u16(offset + entry_size - PAGE_SIZE)
+			index.page_count = maxi(index.page_count, index.pages[i] + 1)
+
+	if has_autotile and not index._load_autotile(bytes, strings_end, count):
+		printerr("Truncated sprite index: ", p_path)
+		return null
+	return index
+
+
+func _load_autotile(p_bytes: PackedByteArray, p_offset: int, p_count: int) -> bool:
+	# Tables follow the strings: a count, then a name and 16 entry indices per table
+	if p_bytes.size() < p_offset + 2:
+		return false
+	var table_count := p_bytes.decode_u16(p_offset)
+	var offset := p_offset + 2
+	for t in table_count:
+		if p_bytes.size() < offset + 2:
+			return false
+		var name_end := offset + 2 + p_bytes.decode_u16(offset)
+		if p_bytes.size() < name_end + AUTOTILE_MASKS * 2:
+			return false
+		var table := PackedInt32Array()
+		table.resize(AUTOTILE_MASKS)
+		for mask in AUTOTILE_MASKS:
+			table[mask] = p_bytes.decode_u16(name_end + mask * 2)
+			if table[mask] >= p_count:
+				return false
+		autotile[StringName(p_bytes.slice(offset + 2, name_end).get_string_from_utf8())] = table
+		offset = name_end + AUTOTILE_MASKS * 2
+	return offset == p_bytes.size()
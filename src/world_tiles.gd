@@ -2,10 +2,23 @@
 extends Node
 
 const JSON_PATH = &"res://assets/generated/world_tiles.json"
+const INDEX_PATH = &"res://assets/generated/world_tiles.bin"
 const TEXTURE = preload("res://assets/generated/world_tiles.png")
+## Further pages of an atlas that exceeded the maximum page size, see art/README.md
+const PAGE_PATH = "res://assets/generated/world_tiles_%d.png"
+## Bits of the neighbor masks that index the autotile tables gen_world.py exports
+const AUTOTILE_N = 1
+const AUTOTILE_S = 2
+const AUTOTILE_E = 4
+const AUTOTILE_W = 8
 
 var tile_size: int = 16
 var _tile_map: Dictionary[StringName, Vector2i] = {}
+var _pages: Dictionary[StringName, int] = {}
+var _page_textures: Array[Texture2D] = [TEXTURE]
+## Atlas cell and source id for every neighbor mask of each autotile block, like &"wall-5"
+var _autotile_cells: Dictionary[StringName, Array] = {}
+var _autotile_sources: Dictionary[StringName, PackedInt32Array] = {}
 
 
 func _init() -> void:
@@ -13,6 +26,12 @@ func _init() -> void:
 
 
 func _load_tiles() -> void:
+	# The binary index needs no parsing; the JSON is the fallback for older generated files
+	var index := SpriteIndex.load_file(INDEX_PATH)
+	if index:
+		_load_index(index)
+		return
+
 	# Check if we need to reload by comparing modified times
 	var file := FileAccess.open(JSON_PATH, FileAccess.READ)
 	if not file:
@@ -29,6 +48,11 @@ func _load_tiles() -> void:
 	# Update tile size and clear existing map
 	tile_size = json.tileSize as int
 	_tile_map.clear()
+	_pages.clear()
+
+	# Only atlases with more than one page list them
+	var pages: Dictionary = json.get("page", {})
+	_load_page_textures(maxi(1, (json.get("pages", []) as Array).size()))
 
 	# Populate tile map with StringNames
 	for tile_name: String in json.sprites:
@@ -36,6 +60,53 @@ func _load_tiles() -> void:
 		_tile_map[StringName(tile_name)] = Vector2i(
 			int(coords[0] as float / float(tile_size)), int(coords[1] as float / float(tile_size))
 		)
+		if pages.has(tile_name):
+			_pages[StringName(tile_name)] = pages[tile_name] as int
+
+	_autotile_cells.clear()
+	_autotile_sources.clear()
+	var autotile: Dictionary = json.get("autotile", {})
+	for block: String in autotile:
+		var names: Array[StringName] = []
+		for tile_name: String in autotile[block]:
+			names.append(StringName(tile_name))
+		_add_autotile(StringName(block), names)
+
+
+func _load_index(p_index: SpriteIndex) -> void:
+	tile_size = p_index.tile_size.x
+	_tile_map.clear()
+	_pages.clear()
+	_load_page_textures(p_index.page_count)
+	for i in p_index.names.size():
+		_tile_map[p_index.names[i]] = p_index.cells[i]
+		if not p_index.pages.is_empty():
+			_pages[p_index.names[i]] = p_index.pages[i]
+
+	_autotile_cells.clear()
+	_autotile_sources.clear()
+	for block: StringName in p_index.autotile:
+		var names: Array[StringName] = []
+		for entry in p_index.autotile[block]:
+			names.append(p_index.names[entry])
+		_add_autotile(block, names)
+
+
+func _add_autotile(p_block: StringName, p_names: Array[StringName]) -> void:
+	# Resolve the table once, so the renderer picks a piece with a single array index
+	var cells: Array[Vector2i] = []
+	var sources := PackedInt32Array()
+	for tile_name in p_names:
+		cells.append(_tile_map[tile_name])
+		sources.append(get_source_id(tile_name))
+	_autotile_cells[p_block] = cells
+	_autotile_sources[p_block] = sources
+
+
+func _load_page_textures(p_count: int) -> void:
+	_page_textures = [TEXTURE]
+	for page in range(1, p_count):
+		_page_textures.append(load(PAGE_PATH % page) as Texture2D)
 
 
 func get_coords(p_name: StringName) -> Vector2i:
@@ -45,6 +116,37 @@ func get_coords(p_name: StringName) -> Vector2i:
 	return ret as Vector2i
 
 
+func get_page(p_name: StringName) -> int:
+	return _pages.get(p_name, 0)
+
+
+func get_source_id(p_name: StringName) -> int:
+	# world_tiles.tres has one atlas source per page
+	return get_page(p_name)
+
+
+func get_atlas(p_name: StringName) -> Texture2D:
+	return _page_textures[get_page(p_name)]
+
+
+## Atlas cells of an autotile block's pieces, indexed by a mask of AUTOTILE_N/S/E/W bits
+func get_autotile_cells(p_block: StringName) -> Array[Vector2i]:
+	var cells: Array[Vector2i] = []
+	if not _autotile_cells.has(p_block):
+		Log.e("Autotile block not found: %s" % p_block)
+		return cells
+	cells.assign(_autotile_cells[p_block])
+	return cells
+
+
+## Source ids matching get_autotile_cells
+func get_autotile_source_ids(p_block: StringName) -> PackedInt32Array:
+	if not _autotile_sources.has(p_block):
+		Log.e("Autotile block not found: %s" % p_block)
+		return PackedInt32Array()
+	return _autotile_sources[p_block]
+
+
 func get_all_names() -> Array[StringName]:
 	return _tile_map.keys()
 
@@ -57,12 +159,15 @@ func get_region(p_name: StringName) -> Rect2:
 func get_texture(p_name: StringName) -> AtlasTexture:
 	# Create atlas texture for the tile
 	var texture := AtlasTexture.new()
-	texture.atlas = TEXTURE
+	texture.atlas = get_atlas(p_name)
 	texture.region = get_region(p_name)
 	return texture
 
 
-func get_name_from_coords(p_coords: Vector2i) -> StringName:
-	var ret: Variant = _tile_map.find_key(p_coords)
-	assert(ret != null, "Tile not found: %s" % p_coords)
-	return ret as StringName
+func get_name_from_coords(p_coords: Vector2i, p_source_id: int = 0) -> StringName:
+	# Identical sprites share coordinates, so this returns the first name using them
+	for tile_name: StringName in _tile_map:
+		if _tile_map[tile_name] == p_coords and get_page(tile_name) == p_source_id:
+			return tile_name
+	assert(false, "Tile not found: %s" % p_coords)
+	return &""